@@ -1,21 +1,142 @@
 """Victron USB Integration."""
+import voluptuous as vol
+from homeassistant.components import websocket_api
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, ServiceCall, callback
+import homeassistant.helpers.config_validation as cv
 import logging
 
-DOMAIN = "victronusb"
+from .capture import RING_SECONDS
+from .const import DOMAIN, SERVICE_START_CAPTURE, SERVICE_STOP_CAPTURE
+from .frames import DEFAULT_MAX_QUEUE
+from .hub import HUB_KEY
+from .sensor import RELOAD_OPTIONS, async_apply_options, entry_settings
 
 _LOGGER = logging.getLogger(__name__)
 
+ATTR_ENTRY_ID = "entry_id"
+ATTR_PRE_SECONDS = "pre_seconds"
+ATTR_MAX_SIZE = "max_size"
+ATTR_BACKUPS = "backups"
+
+START_CAPTURE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTRY_ID): cv.string,
+    vol.Optional(ATTR_PRE_SECONDS, default=RING_SECONDS): vol.All(
+        vol.Coerce(float), vol.Range(min=0, max=RING_SECONDS)
+    ),
+    vol.Optional(ATTR_MAX_SIZE, default=10): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    vol.Optional(ATTR_BACKUPS, default=3): vol.All(vol.Coerce(int), vol.Range(min=0)),
+})
+
+STOP_CAPTURE_SCHEMA = vol.Schema({
+    vol.Optional(ATTR_ENTRY_ID): cv.string,
+})
+
+
+def _capture_ports(hass: HomeAssistant, call: ServiceCall):
+    """Return the ports a capture service call applies to."""
+    hub = hass.data.get(HUB_KEY)
+    if hub is None:
+        return []
+    entry_id = call.data.get(ATTR_ENTRY_ID)
+    return [port for port in hub.ports.values() if entry_id is None or port.entry_id == entry_id]
+
+
+async def async_start_capture(hass: HomeAssistant, call: ServiceCall):
+    """Write the recent and all following frames of the selected ports to disk."""
+    for port in _capture_ports(hass, call):
+        port.capture.start(
+            hass.config.path(DOMAIN, "capture", f"{port.entry_id}.vecap"),
+            max_bytes=int(call.data[ATTR_MAX_SIZE] * 1024 * 1024),
+            backups=call.data[ATTR_BACKUPS],
+            pre_seconds=call.data[ATTR_PRE_SECONDS],
+        )
+
+
+async def async_stop_capture(hass: HomeAssistant, call: ServiceCall):
+    """Stop capturing frames of the selected ports."""
+    for port in _capture_ports(hass, call):
+        port.capture.stop()
+
+@websocket_api.websocket_command({
+    vol.Required("type"): f"{DOMAIN}/subscribe_frames",
+    vol.Optional(ATTR_ENTRY_ID): str,
+    vol.Optional("max_rate", default=0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional("max_queue", default=DEFAULT_MAX_QUEUE): vol.All(vol.Coerce(int), vol.Range(min=1)),
+})
+@callback
+def websocket_subscribe_frames(hass: HomeAssistant, connection, msg: dict):
+    """Send the decoded frames of one or all ports to a websocket client."""
+    hub = hass.data.get(HUB_KEY)
+    entry_id = msg.get(ATTR_ENTRY_ID)
+    ports = [
+        port for port in (hub.ports.values() if hub else ()) if entry_id is None or port.entry_id == entry_id
+    ]
+    if not ports:
+        connection.send_error(msg["id"], websocket_api.ERR_NOT_FOUND, "No VE.Direct port found")
+        return
+
+    def forward(port_entry_id):
+        @callback
+        def send_frames(frames):
+            connection.send_message(
+                websocket_api.event_message(msg["id"], {"entry_id": port_entry_id, "frames": frames})
+            )
+
+        return send_frames
+
+    @callback
+    def unsubscribe():
+        for unsub in unsubs:
+            unsub()
+
+    @callback
+    def port_closed():
+        # Ends the whole subscription, so the client knows to subscribe again
+        if connection.subscriptions.pop(msg["id"], None) is None:
+            return
+        unsubscribe()
+        connection.send_error(msg["id"], "unloaded", "The VE.Direct port was unloaded, subscribe again")
+
+    unsubs = [
+        port.frames.async_subscribe(forward(port.entry_id), msg["max_rate"], msg["max_queue"], port_closed)
+        for port in ports
+    ]
+    connection.subscriptions[msg["id"]] = unsubscribe
+    connection.send_result(msg["id"])
+
+
 async def update_listener(hass: HomeAssistant, entry: ConfigEntry):
-    """Handle options update."""
+    """Handle options update.
+
+    Most options are applied to the running port, so sensors and their
+    states are kept; only options that change which sensors exist reload
+    the entry. The new settings are compared with those the port was set
+    up or last updated with, so each change is applied once.
+    """
     _LOGGER.debug("Options for VictronUSB have been updated - applying changes")
-    # Reload the integration to apply changes
-    await hass.config_entries.async_reload(entry.entry_id)
+    data = entry_settings(entry)
+    hub = hass.data.get(HUB_KEY)
+    port = hub.ports.get(entry.entry_id) if hub is not None else None
+    if port is None or any(port.options.get(key) != data.get(key) for key in RELOAD_OPTIONS):
+        await hass.config_entries.async_reload(entry.entry_id)
+        return
+    if data != port.options:
+        async_apply_options(port, data)
 
 
 async def async_setup(hass: HomeAssistant, config: dict):
     _LOGGER.debug("Setting up VictronUSB integration")
+
+    async def start_capture(call: ServiceCall):
+        await async_start_capture(hass, call)
+
+    async def stop_capture(call: ServiceCall):
+        await async_stop_capture(hass, call)
+
+    hass.services.async_register(DOMAIN, SERVICE_START_CAPTURE, start_capture, schema=START_CAPTURE_SCHEMA)
+    hass.services.async_register(DOMAIN, SERVICE_STOP_CAPTURE, stop_capture, schema=STOP_CAPTURE_SCHEMA)
+    websocket_api.async_register_command(hass, websocket_subscribe_frames)
     return True
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
@@ -0,0 +1,293 @@
+"""Full-rate aggregation of numeric VE.Direct fields."""
+from array import array
+
+LABEL_VOLTAGE = b"V"
+LABEL_CURRENT = b"I"
+
+# Consecutive V/I samples further apart than this are not integrated
+# across, so a disconnect does not add a made-up slice of charge.
+MAX_GAP = 10
+
+# Ring buffer size per field, in samples per second of publish interval
+SAMPLES_PER_SECOND = 4
+
+STATS = ("min", "max", "mean")
+
+# (raw key, name, unit, device class, precision) of the integrated totals
+TOTALS = (
+    (b"CHARGED_AH", "Charged", "Ah", None, 3),
+    (b"DISCHARGED_AH", "Discharged", "Ah", None, 3),
+    (b"CHARGED_WH", "Charged energy", "Wh", "energy", 1),
+    (b"DISCHARGED_WH", "Discharged energy", "Wh", "energy", 1),
+)
+
+
+class AggregateDef:
+    """Describes one published aggregate the way FieldDef describes a field."""
+
+    __slots__ = (
+        "label",
+        "name",
+        "unit",
+        "device_class",
+        "state_class",
+        "options",
+        "precision",
+        "deadband",
+        "deadband_percent",
+        "priority",
+    )
+
+    def __init__(self, label, name, unit, device_class, state_class, precision):
+        self.label = label
+        self.name = name
+        self.unit = unit
+        self.device_class = device_class
+        self.state_class = state_class
+        self.options = None
+        self.precision = precision
+        self.deadband = None
+        self.deadband_percent = None
+        self.priority = False
+
+    def __repr__(self):
+        return f"AggregateDef({self.label!r}, unit={self.unit!r})"
+
+
+def aggregate_definitions(field_table):
+    """Return the aggregates published for a field table, keyed by raw label.
+
+    Every field marked ``aggregate`` gets a min, max and mean over the
+    publish interval. When the table has both ``V`` and ``I``, charge and
+    energy totals are added for each direction.
+    """
+    table = {}
+    for raw_label, field in field_table.items():
+        if not field.aggregate:
+            continue
+        for stat in STATS:
+            label = f"{field.label}_{stat}"
+            precision = (field.precision or 0) + 1 if stat == "mean" else field.precision
+            table[label.encode("ascii")] = AggregateDef(
+                label, f"{field.name} {stat}", field.unit, field.device_class, "measurement", precision
+            )
+
+    if LABEL_VOLTAGE in field_table and LABEL_CURRENT in field_table:
+        for raw_label, name, unit, device_class, precision in TOTALS:
+            table[raw_label] = AggregateDef(
+                raw_label.decode("ascii"), name, unit, device_class, "total_increasing", precision
+            )
+    return table
+
+
+class SampleRing:
+    """Fixed-capacity ring of ``(time, value)`` samples in two flat arrays.
+
+    Appending overwrites the oldest sample once full, so memory does not
+    grow with the frame rate.
+    """
+
+    __slots__ = ("_times", "_values", "_next", "_count")
+
+    def __init__(self, capacity):
+        self._times = array("d", bytes(8 * capacity))
+        self._values = array("d", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, when, value):
+        index = self._next
+        self._times[index] = when
+        self._values[index] = value
+        index += 1
+        self._next = 0 if index == len(self._times) else index
+        if self._count < len(self._times):
+            self._count += 1
+
+    def stats(self, since):
+        """Return ``(min, max, mean)`` of the samples taken at or after ``since``, or None."""
+        times = self._times
+        values = self._values
+        capacity = len(times)
+        low = high = None
+        total = 0.0
+        count = 0
+
+        # Walk back from the newest sample until the window is left
+        index = self._next
+        for _ in range(self._count):
+            index = index - 1 if index else capacity - 1
+            if times[index] < since:
+                break
+            value = values[index]
+            if count == 0:
+                low = high = value
+            elif value < low:
+                low = value
+            elif value > high:
+                high = value
+            total += value
+            count += 1
+
+        if not count:
+            return None
+        return low, high, total / count
+
+
+class RunningStats:
+    """Count, sum, min and max of the samples since the last ``take``."""
+
+    __slots__ = ("count", "total", "low", "high")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.low = None
+        self.high = None
+
+    def add(self, value):
+        if self.count == 0:
+            self.low = self.high = value
+        elif value < self.low:
+            self.low = value
+        elif value > self.high:
+            self.high = value
+        self.count += 1
+        self.total += value
+
+    def take(self):
+        """Return ``(min, max, mean)`` and start over, or None without samples."""
+        if not self.count:
+            return None
+        result = (self.low, self.high, self.total / self.count)
+        self.__init__()
+        return result
+
+
+class EnergyIntegrator:
+    """Integrate charge and energy from every V/I sample, split by direction.
+
+    Uses the trapezoid rule on current and on power (V x I). Positive
+    current charges the battery.
+    """
+
+    __slots__ = ("charged_ah", "discharged_ah", "charged_wh", "discharged_wh", "_last")
+
+    def __init__(self):
+        self.charged_ah = 0.0
+        self.discharged_ah = 0.0
+        self.charged_wh = 0.0
+        self.discharged_wh = 0.0
+        self._last = None
+
+    def add(self, when, voltage, current):
+        power = voltage * current
+        last = self._last
+        self._last = (when, current, power)
+        if last is None:
+            return
+
+        last_when, last_current, last_power = last
+        elapsed = when - last_when
+        if elapsed <= 0 or elapsed > MAX_GAP:
+            return
+
+        hours = elapsed / 3600
+        charge = (last_current + current) / 2 * hours
+        energy = (last_power + power) / 2 * hours
+        if charge >= 0:
+            self.charged_ah += charge
+        else:
+            self.discharged_ah -= charge
+        if energy >= 0:
+            self.charged_wh += energy
+        else:
+            self.discharged_wh -= energy
+
+
+class DeviceAggregator:
+    """Aggregate every frame of one device, before any throttling.
+
+    ``add_frame`` is called with each validated frame and only decodes the
+    aggregated fields. ``summary`` returns the values to publish, keyed
+    like ``aggregate_definitions``. With ``long_term``, running statistics
+    are also kept per field until collected with ``take_long_term``.
+    """
+
+    __slots__ = ("_fields", "_definitions", "_voltage", "_current", "integrator")
+
+    def __init__(self, field_table, definitions, interval, long_term=False):
+        capacity = max(16, int(interval * SAMPLES_PER_SECOND))
+        self._fields = [
+            (raw_label, field, SampleRing(capacity), RunningStats() if long_term else None)
+            for raw_label, field in field_table.items()
+            if field.aggregate
+        ]
+        self._definitions = definitions
+        self._voltage = field_table.get(LABEL_VOLTAGE)
+        self._current = field_table.get(LABEL_CURRENT)
+        self.integrator = EnergyIntegrator() if self._voltage and self._current else None
+
+    def add_frame(self, frame, now):
+        for raw_label, field, ring, running in self._fields:
+            raw = frame.get(raw_label)
+            if raw is None:
+                continue
+            try:
+                value = field.decode(raw)
+            except ValueError:
+                continue
+            ring.append(now, value)
+            if running is not None:
+                running.add(value)
+
+        integrator = self.integrator
+        if integrator is not None:
+            voltage = frame.get(LABEL_VOLTAGE)
+            current = frame.get(LABEL_CURRENT)
+            if voltage is not None and current is not None:
+                try:
+                    integrator.add(now, self._voltage.decode(voltage), self._current.decode(current))
+                except ValueError:
+                    pass
+
+    def summary(self, since):
+        """Return the aggregates of the samples since ``since`` and the running totals."""
+        definitions = self._definitions
+        values = {}
+        for raw_label, field, ring, _ in self._fields:
+            stats = ring.stats(since)
+            if stats is None:
+                continue
+            for stat, value in zip(STATS, stats):
+                key = raw_label + b"_" + stat.encode("ascii")
+                definition = definitions.get(key)
+                if definition is None:
+                    continue
+                precision = definition.precision
+                values[key] = round(value) if precision is None else round(value, precision)
+
+        integrator = self.integrator
+        if integrator is not None:
+            totals = (
+                integrator.charged_ah,
+                integrator.discharged_ah,
+                integrator.charged_wh,
+                integrator.discharged_wh,
+            )
+            for (key, _, _, _, precision), value in zip(TOTALS, totals):
+                values[key] = round(value, precision)
+        return values
+
+    def take_long_term(self):
+        """Return ``{raw label: (field, (min, max, mean))}`` since the last call and start over."""
+        results = {}
+        for raw_label, field, _, running in self._fields:
+            if running is not None:
+                stats = running.take()
+                if stats is not None:
+                    results[raw_label] = (field, stats)
+        return results
@@ -0,0 +1,214 @@
+"""Compact capture of validated VE.Direct frames for post-mortem analysis.
+
+A capture file starts with ``MAGIC`` and a header holding the wall clock
+and monotonic time it was opened at, followed by one record per frame:
+the monotonic time (float64) and body length (uint32), little endian,
+then the body, which is the frame's ``label<TAB>value`` pairs joined by
+newlines.
+"""
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+MAGIC = b"VECAP\x01\n"
+_HEADER = struct.Struct("<dd")
+_RECORD = struct.Struct("<dI")
+
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUPS = 3
+
+# Recent frames kept in memory, to be written out when a capture starts
+RING_SECONDS = 60
+RING_MAX_FRAMES = 4096
+# Frames waiting for the writer; room for the ring plus as many more
+MAX_QUEUED_FRAMES = 2 * RING_MAX_FRAMES
+
+
+def encode_frame(frame):
+    """Encode ``{label: value}`` as a capture record body."""
+    return b"\n".join(label + b"\t" + value for label, value in frame.items())
+
+
+def decode_frame(body):
+    """Decode a capture record body back into ``{label: value}``."""
+    return dict(line.split(b"\t", 1) for line in body.split(b"\n")) if body else {}
+
+
+def read_capture_start(path):
+    """Return the ``(wall clock, monotonic)`` time a capture file was opened at.
+
+    Raises ValueError if the file is not a capture.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a VE.Direct capture")
+        header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise ValueError(f"{path} is not a VE.Direct capture")
+    return _HEADER.unpack(header)
+
+
+def read_capture(path):
+    """Yield ``(monotonic time, frame)`` for every record of a capture file.
+
+    Raises ValueError if the file is not a capture. A record cut short by
+    a crash ends the iteration.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a VE.Direct capture")
+        file.read(_HEADER.size)
+        while True:
+            head = file.read(_RECORD.size)
+            if len(head) < _RECORD.size:
+                return
+            when, length = _RECORD.unpack(head)
+            body = file.read(length)
+            if len(body) < length:
+                return
+            yield when, decode_frame(body)
+
+
+def _rotate(path, backups):
+    for index in range(backups - 1, 0, -1):
+        source = f"{path}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index + 1}")
+    if os.path.exists(path):
+        if backups:
+            os.replace(path, f"{path}.1")
+        else:
+            os.remove(path)
+
+
+class CaptureWriter(threading.Thread):
+    """Write frames to a size-bounded set of rotated files from a thread.
+
+    ``put`` only queues the frame, so the event loop never waits for the
+    disk; encoding and writing happen here. The file is flushed whenever
+    the queue runs empty. When ``max_queue`` frames are waiting, e.g.
+    because the disk stalls, new frames are dropped and counted.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS, max_queue=MAX_QUEUED_FRAMES):
+        super().__init__(name=f"victronusb capture {os.path.basename(path)}", daemon=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.frames = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closing = False
+        self._file = None
+
+    def put(self, when, frame):
+        try:
+            self._queue.put_nowait((when, frame))
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Stop after writing what is already queued."""
+        self._closing = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            # The writer stops once it has emptied the queue instead
+            pass
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _rotate(self.path, self.backups)
+        self._file = open(self.path, "wb", buffering=64 * 1024)
+        self._file.write(MAGIC + _HEADER.pack(time.time(), time.monotonic()))
+
+    def run(self):
+        try:
+            self._open()
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    break
+                when, frame = item
+                body = encode_frame(frame)
+                self._file.write(_RECORD.pack(when, len(body)))
+                self._file.write(body)
+                self.frames += 1
+
+                if self._file.tell() >= self.max_bytes:
+                    self._file.close()
+                    self._open()
+                elif self._queue.empty():
+                    if self._closing:
+                        break
+                    self._file.flush()
+        except OSError as exc:
+            _LOGGER.error("Frame capture to %s failed: %s", self.path, exc)
+        finally:
+            if self._file is not None:
+                self._file.close()
+
+
+class FrameCapture:
+    """Recent frames of one port, and the capture file they go to when active.
+
+    Frames are kept by reference in a ring covering the last
+    ``RING_SECONDS``, so the idle cost is one deque append per frame.
+    """
+
+    __slots__ = ("_ring", "writer")
+
+    def __init__(self):
+        self._ring = deque(maxlen=RING_MAX_FRAMES)
+        self.writer = None
+
+    @property
+    def active(self):
+        return self.writer is not None
+
+    def add(self, when, frame):
+        ring = self._ring
+        ring.append((when, frame))
+        cutoff = when - RING_SECONDS
+        while ring[0][0] < cutoff:
+            ring.popleft()
+
+        if self.writer is not None:
+            self.writer.put(when, frame)
+
+    def start(self, path, max_bytes=DEFAULT_MAX_BYTES, backups=DEFAULT_BACKUPS, pre_seconds=RING_SECONDS):
+        """Start capturing to ``path``, beginning with the last ``pre_seconds`` of frames."""
+        self.stop()
+        writer = self.writer = CaptureWriter(path, max_bytes, backups)
+        if self._ring and pre_seconds:
+            cutoff = self._ring[-1][0] - pre_seconds
+            for when, frame in self._ring:
+                if when >= cutoff:
+                    writer.put(when, frame)
+        writer.start()
+        _LOGGER.info("Capturing VE.Direct frames to %s", path)
+
+    def stop(self):
+        """Stop capturing; queued frames are still written."""
+        if self.writer is not None:
+            self.writer.close()
+            _LOGGER.info("Stopped capturing VE.Direct frames to %s", self.writer.path)
+            if self.writer.dropped:
+                _LOGGER.warning(
+                    "Dropped %d frames the capture to %s could not keep up with",
+                    self.writer.dropped,
+                    self.writer.path,
+                )
+            self.writer = None
+
+    def diagnostics(self):
+        writer = self.writer
+        if writer is None:
+            return None
+        return {"path": writer.path, "frames": writer.frames, "dropped": writer.dropped}
@@ -2,39 +2,144 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
 import logging
+import os
+
+from .const import (
+    CONF_AGGREGATE_INTERVAL,
+    CONF_AVAILABILITY_TIMEOUT,
+    CONF_BAUDRATE,
+    CONF_FAST_INTERVAL,
+    CONF_FIELD_INTERVALS,
+    CONF_FRAME_EVENT_INTERVAL,
+    CONF_HEARTBEAT_INTERVAL,
+    CONF_HISTORY_INTERVAL,
+    CONF_MAX_PUBLISH_RATE,
+    CONF_NORMAL_INTERVAL,
+    CONF_READER_THREAD,
+    CONF_SERIAL_PORT,
+    CONF_STATISTICS,
+    CONF_STATISTICS_ONLY_FAST,
+    DEFAULT_AGGREGATE_INTERVAL,
+    DEFAULT_AVAILABILITY_TIMEOUT,
+    DEFAULT_BAUDRATE,
+    DEFAULT_FAST_INTERVAL,
+    DEFAULT_FRAME_EVENT_INTERVAL,
+    DEFAULT_HEARTBEAT_INTERVAL,
+    DEFAULT_HISTORY_INTERVAL,
+    DEFAULT_MAX_PUBLISH_RATE,
+    DEFAULT_NORMAL_INTERVAL,
+)
+from .connection import validate_url
+from .definitions import load_registry
+from .discovery import async_discover
+from .scheduler import parse_field_intervals
 
 _LOGGER = logging.getLogger(__name__)
 
+# Baud rates the ports accept; VE.Direct itself is always 19200
+BAUDRATE_SCHEMA = vol.All(vol.Coerce(int), vol.Range(min=300, max=4000000))
+
+
+def _validate_port(user_input, errors):
+    """Add an error for a serial port or URL that cannot be opened as entered."""
+    try:
+        validate_url(user_input[CONF_SERIAL_PORT])
+    except ValueError as exc:
+        _LOGGER.debug("Invalid serial port %s: %s", user_input[CONF_SERIAL_PORT], exc)
+        errors[CONF_SERIAL_PORT] = "invalid_url"
+
+
+# Choices in the list of discovered ports besides the devices found
+MANUAL_ENTRY = "manual"
+PROBE_ALL = "probe_all"
+
 class Smart0183SERIALConfigFlow(config_entries.ConfigFlow, domain="victronusb"):
     VERSION = 1
 
+    def __init__(self):
+        self._discovered = {}
+        self._probed_all = False
+
+    def _name_taken(self, name):
+        existing_names = {entry.data.get("name") for entry in self._async_current_entries()}
+        _LOGGER.debug("Existing names in the integration: %s", existing_names)
+        return name in existing_names
+
     async def async_step_user(self, user_input=None):
+        """Offer the VE.Direct devices found on the local serial ports."""
         _LOGGER.debug("async_step_user called with user_input: %s", user_input)
         errors = {}
-        
-        if user_input is not None:
-            # Check if name already exists
-            existing_names = {entry.data.get("name") for entry in self._async_current_entries()}
-            _LOGGER.debug("Existing names in the integration: %s", existing_names) 
-            
-            if user_input["name"] in existing_names:
-                
-                _LOGGER.debug("Name exists error") 
 
+        if user_input is not None and user_input[CONF_SERIAL_PORT] == PROBE_ALL:
+            # Opted in to probing ports that are not VE.Direct cables
+            self._probed_all = True
+            devices = await async_discover(self.hass, probe_all=True)
+            self._discovered = {device.port: device for device in devices}
+        elif user_input is not None:
+            if user_input[CONF_SERIAL_PORT] == MANUAL_ENTRY:
+                return await self.async_step_manual()
+
+            if self._name_taken(user_input["name"]):
+                _LOGGER.debug("Name exists error")
                 errors["name"] = "name_exists"
             else:
+                device = self._discovered[user_input[CONF_SERIAL_PORT]]
+                data = {
+                    "name": user_input["name"],
+                    CONF_SERIAL_PORT: device.port,
+                    CONF_BAUDRATE: device.baudrate,
+                }
+                _LOGGER.debug("Creating entry for discovered device: %s", device)
+                return self.async_create_entry(title=user_input["name"], data=data)
+        else:
+            devices = await async_discover(self.hass)
+            self._discovered = {device.port: device for device in devices}
+
+        if not self._discovered and self._probed_all:
+            _LOGGER.debug("No VE.Direct devices found, asking for the port")
+            return await self.async_step_manual()
+
+        registry = await self.hass.async_add_executor_job(load_registry)
+        ports = {}
+        for device in self._discovered.values():
+            family = registry.family_for(device.pid) or device.pid.decode("ascii", "replace")
+            serial = f" {device.serial.decode('ascii', 'replace')}" if device.serial else ""
+            ports[device.port] = f"{family}{serial} ({os.path.basename(device.port)}, {device.baudrate} baud)"
+        if not self._probed_all:
+            ports[PROBE_ALL] = "Search all serial ports"
+        ports[MANUAL_ENTRY] = "Enter the port manually"
+
+        first = next(iter(self._discovered.values()), None)
+        default_name = first.serial.decode("ascii", "replace") if first and first.serial else "Victron"
+        return self.async_show_form(
+            step_id="user",
+            data_schema=vol.Schema({
+                vol.Required("name", default=default_name): str,
+                vol.Required(CONF_SERIAL_PORT, default=first.port if first else PROBE_ALL): vol.In(ports),
+            }),
+            errors=errors,
+        )
+
+    async def async_step_manual(self, user_input=None):
+        """Ask for the port and baud rate, for ports that were not found or are remote."""
+        _LOGGER.debug("async_step_manual called with user_input: %s", user_input)
+        errors = {}
+
+        if user_input is not None:
+            _validate_port(user_input, errors)
+            if self._name_taken(user_input["name"]):
+                _LOGGER.debug("Name exists error")
+                errors["name"] = "name_exists"
+            elif not errors:
                 _LOGGER.debug("User input is not None, creating entry with name: %s", user_input.get('name'))
                 return self.async_create_entry(title=user_input.get('name'), data=user_input)
 
-        if not errors:
-            _LOGGER.debug("No user input or errors, showing form")
-            
         return self.async_show_form(
-            step_id="user",
+            step_id="manual",
             data_schema=vol.Schema({
-                vol.Required("name"): str,  
-                vol.Required("serial_port", default="/dev/ttyUSB0"): str,
-                vol.Required("baudrate", default=4800): int,
+                vol.Required("name"): str,
+                vol.Required(CONF_SERIAL_PORT, default="/dev/ttyUSB0"): str,
+                vol.Required(CONF_BAUDRATE, default=DEFAULT_BAUDRATE): BAUDRATE_SCHEMA,
             }),
             errors=errors,
         )
@@ -52,20 +157,36 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
 
     async def async_step_init(self, user_input=None):
         _LOGGER.debug("OptionsFlowHandler.async_step_init called with user_input: %s", user_input)
+        errors = {}
+
         if user_input is not None:
-            _LOGGER.debug("User input is not None, updating options")
-            # Update the config entry with new options
-            self.hass.config_entries.async_update_entry(
-                self.config_entry,
-                data={**self.config_entry.data, **user_input}
-            )
+            _validate_port(user_input, errors)
+            try:
+                parse_field_intervals(user_input.get(CONF_FIELD_INTERVALS, ""))
+            except ValueError:
+                errors[CONF_FIELD_INTERVALS] = "invalid_field_intervals"
 
-            await self.hass.config_entries.async_reload(self.config_entry.entry_id)
+        if user_input is not None and not errors:
+            _LOGGER.debug("User input is not None, updating options")
+            # Stored as the entry's options; the update listener applies them
             return self.async_create_entry(title="", data=user_input)
 
-        # Use current values as defaults
-        serial_port = self.config_entry.data.get("serial_port")
-        baudrate = self.config_entry.data.get("baudrate")
+        # Use current values as defaults; options override the data of older entries
+        settings = {**self.config_entry.data, **self.config_entry.options}
+        serial_port = settings.get("serial_port")
+        baudrate = settings.get("baudrate")
+        max_publish_rate = settings.get(CONF_MAX_PUBLISH_RATE, DEFAULT_MAX_PUBLISH_RATE)
+        heartbeat_interval = settings.get(CONF_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_INTERVAL)
+        fast_interval = settings.get(CONF_FAST_INTERVAL, DEFAULT_FAST_INTERVAL)
+        normal_interval = settings.get(CONF_NORMAL_INTERVAL, DEFAULT_NORMAL_INTERVAL)
+        history_interval = settings.get(CONF_HISTORY_INTERVAL, DEFAULT_HISTORY_INTERVAL)
+        field_intervals = settings.get(CONF_FIELD_INTERVALS, "")
+        availability_timeout = settings.get(CONF_AVAILABILITY_TIMEOUT, DEFAULT_AVAILABILITY_TIMEOUT)
+        aggregate_interval = settings.get(CONF_AGGREGATE_INTERVAL, DEFAULT_AGGREGATE_INTERVAL)
+        reader_thread = settings.get(CONF_READER_THREAD, False)
+        statistics = settings.get(CONF_STATISTICS, False)
+        statistics_only_fast = settings.get(CONF_STATISTICS_ONLY_FAST, False)
+        frame_event_interval = settings.get(CONF_FRAME_EVENT_INTERVAL, DEFAULT_FRAME_EVENT_INTERVAL)
 
         _LOGGER.debug("Showing options form with serial_port: %s and baudrate: %s", serial_port, baudrate)
 
@@ -73,6 +194,35 @@ class OptionsFlowHandler(config_entries.OptionsFlow):
             step_id="init",
             data_schema=vol.Schema({
                 vol.Required("serial_port", default=serial_port): str,
-                vol.Required("baudrate", default=baudrate): int,
+                vol.Required("baudrate", default=baudrate): BAUDRATE_SCHEMA,
+                vol.Required(CONF_MAX_PUBLISH_RATE, default=max_publish_rate): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Required(CONF_HEARTBEAT_INTERVAL, default=heartbeat_interval): vol.All(
+                    vol.Coerce(int), vol.Range(min=1)
+                ),
+                vol.Required(CONF_FAST_INTERVAL, default=fast_interval): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Required(CONF_NORMAL_INTERVAL, default=normal_interval): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Required(CONF_HISTORY_INTERVAL, default=history_interval): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Optional(CONF_FIELD_INTERVALS, default=field_intervals): str,
+                vol.Required(CONF_AVAILABILITY_TIMEOUT, default=availability_timeout): vol.All(
+                    vol.Coerce(float), vol.Range(min=1)
+                ),
+                vol.Required(CONF_AGGREGATE_INTERVAL, default=aggregate_interval): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
+                vol.Required(CONF_READER_THREAD, default=reader_thread): bool,
+                vol.Required(CONF_STATISTICS, default=statistics): bool,
+                vol.Required(CONF_STATISTICS_ONLY_FAST, default=statistics_only_fast): bool,
+                vol.Required(CONF_FRAME_EVENT_INTERVAL, default=frame_event_interval): vol.All(
+                    vol.Coerce(float), vol.Range(min=0)
+                ),
             }),
+            errors=errors,
         )
@@ -0,0 +1,269 @@
+"""Serial transport for VE.Direct devices."""
+import asyncio
+import functools
+import logging
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import serial
+
+from .vedirect import VEDirectTextParser
+
+_LOGGER = logging.getLogger(__name__)
+
+# Blocking reads of the reader thread return after this many seconds
+# without data, so closing the port is noticed even on platforms where a
+# read cannot be cancelled.
+READ_TIMEOUT = 0.5
+READ_SIZE = 4096
+
+# Raw TCP, as served by ser2net and similar; socket:// is pyserial's name for it
+TCP_SCHEMES = ("tcp", "socket")
+RFC2217_SCHEME = "rfc2217"
+CONNECT_TIMEOUT = 10
+# A silent link is probed after KEEPALIVE_IDLE seconds and dropped when
+# KEEPALIVE_COUNT probes KEEPALIVE_INTERVAL apart go unanswered
+KEEPALIVE_IDLE = 10
+KEEPALIVE_INTERVAL = 5
+KEEPALIVE_COUNT = 3
+
+
+def url_scheme(url):
+    """Return the scheme of a port URL, or None for a device path."""
+    scheme, separator, _ = url.partition("://")
+    return scheme.lower() if separator else None
+
+
+def validate_url(url):
+    """Raise ValueError unless ``url`` is a device path or a host:port URL of a supported scheme."""
+    scheme = url_scheme(url)
+    if scheme is None:
+        if not url.strip():
+            raise ValueError("Expected a serial port")
+        return
+    if scheme not in TCP_SCHEMES and scheme != RFC2217_SCHEME:
+        raise ValueError(f"Unsupported URL scheme {scheme}://")
+    parts = urlsplit(url)
+    # .port raises ValueError itself for ports that are not a number or out of range
+    if not parts.hostname or not parts.port:
+        raise ValueError(f"Expected {scheme}://host:port, got {url}")
+
+
+def configure_socket(sock):
+    """Disable Nagle and enable keepalive so a dead link is noticed.
+
+    Without keepalive a TCP connection to a device server that lost power
+    stays open forever, as the VE.Direct text protocol never writes.
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (
+        ("TCP_KEEPIDLE", KEEPALIVE_IDLE),
+        ("TCP_KEEPINTVL", KEEPALIVE_INTERVAL),
+        ("TCP_KEEPCNT", KEEPALIVE_COUNT),
+        # Unacknowledged writes, e.g. HEX requests, time out just as fast
+        ("TCP_USER_TIMEOUT", (KEEPALIVE_IDLE + KEEPALIVE_INTERVAL * KEEPALIVE_COUNT) * 1000),
+    ):
+        if hasattr(socket, option):
+            sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+
+
+class VEDirectProtocol(asyncio.Protocol):
+    """asyncio protocol that turns received bytes into validated text blocks.
+
+    Data is handed to a VEDirectTextParser as it arrives, without line
+    splitting or decoding, and ``on_frame`` is called with every block that
+    passes its checksum. HEX records found in the stream go to ``on_hex``.
+    ``closed`` resolves with the exception (or None) once the transport
+    goes away. When ``stats`` is given, received bytes and the time spent
+    per received chunk are counted on it.
+    """
+
+    def __init__(self, on_frame, on_hex=None, stats=None):
+        self._on_frame = on_frame
+        self._stats = stats
+        self.on_hex = on_hex
+        self.parser = VEDirectTextParser(self._hex_received)
+        self.transport = None
+        self.closed = asyncio.get_running_loop().create_future()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def _hex_received(self, record):
+        if self.on_hex is not None:
+            self.on_hex(record)
+
+    def data_received(self, data):
+        started = time.perf_counter_ns()
+        on_frame = self._on_frame
+        for frame in self.parser.feed(data):
+            on_frame(frame)
+
+        stats = self._stats
+        if stats is not None:
+            stats.bytes += len(data)
+            stats.record_parse(time.perf_counter_ns() - started)
+
+    def frames_received(self, frames, hex_records):
+        """Take a batch of frames and HEX records parsed off the loop."""
+        for record in hex_records:
+            self._hex_received(record)
+        on_frame = self._on_frame
+        for frame in frames:
+            on_frame(frame)
+
+    def connection_lost(self, exc):
+        self.transport = None
+        if not self.closed.done():
+            self.closed.set_result(exc)
+
+
+class ThreadedSerialTransport(asyncio.Transport):
+    """Read and parse a serial port in its own thread.
+
+    The thread owns the protocol's parser from the moment it starts. Frames
+    and HEX records are collected as they are parsed, and handed to
+    ``protocol.frames_received`` on the event loop in batches: one
+    ``call_soon_threadsafe`` is pending at most, however many reads
+    complete before the loop gets to it. Writes go straight to the port
+    from the loop; HEX requests are a few bytes and the tty buffers them.
+    """
+
+    def __init__(self, loop, protocol, port, stats=None):
+        super().__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = port
+        self._stats = stats
+        self._closing = False
+        self._lock = threading.Lock()
+        self._frames = []
+        self._hex_records = []
+        self._scheduled = False
+        self._thread = threading.Thread(target=self._read_loop, name=f"victronusb reader {port.name}", daemon=True)
+
+    def start(self):
+        self._protocol.connection_made(self)
+        self._thread.start()
+
+    @property
+    def serial(self):
+        return self._serial
+
+    def get_extra_info(self, name, default=None):
+        return self._serial if name == "serial" else default
+
+    def is_closing(self):
+        return self._closing
+
+    def write(self, data):
+        if self._closing:
+            return
+        try:
+            self._serial.write(data)
+        except serial.SerialException as exc:
+            _LOGGER.debug("Write to %s failed: %s", self._serial.name, exc)
+
+    def close(self):
+        """Stop the reader thread; connection_lost follows once it has exited."""
+        if self._closing:
+            return
+        self._closing = True
+        cancel_read = getattr(self._serial, "cancel_read", None)
+        if cancel_read is not None:
+            try:
+                cancel_read()
+            except (OSError, serial.SerialException):
+                pass
+
+    abort = close
+
+    def _read_loop(self):
+        parser = self._protocol.parser
+        hex_records = []
+        parser.on_hex = hex_records.append
+        stats = self._stats
+        exc = None
+
+        try:
+            while not self._closing:
+                data = self._serial.read(max(1, min(READ_SIZE, self._serial.in_waiting)))
+                if not data:
+                    continue
+
+                started = time.perf_counter_ns()
+                frames = parser.feed(data)
+                if stats is not None:
+                    stats.bytes += len(data)
+                    stats.record_parse(time.perf_counter_ns() - started)
+
+                if frames or hex_records:
+                    self._hand_off(frames, hex_records)
+                    hex_records.clear()
+        except (OSError, serial.SerialException) as err:
+            if not self._closing:
+                exc = err
+        finally:
+            self._closing = True
+            try:
+                self._serial.close()
+            finally:
+                self._loop.call_soon_threadsafe(self._protocol.connection_lost, exc)
+
+    def _hand_off(self, frames, hex_records):
+        with self._lock:
+            self._frames.extend(frames)
+            self._hex_records.extend(hex_records)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._deliver)
+
+    def _deliver(self):
+        with self._lock:
+            frames = self._frames
+            hex_records = self._hex_records
+            self._frames = []
+            self._hex_records = []
+            self._scheduled = False
+        if not self._closing:
+            self._protocol.frames_received(frames, hex_records)
+
+
+async def create_threaded_serial_connection(loop, protocol_factory, url, stats=None, **serial_options):
+    """Open ``url`` and serve it from a reader thread; returns ``(transport, protocol)``.
+
+    Same contract as serial_asyncio.create_serial_connection, including
+    raising SerialException when the port cannot be opened.
+    """
+    port = await loop.run_in_executor(
+        None, functools.partial(serial.serial_for_url, url, timeout=READ_TIMEOUT, **serial_options)
+    )
+    sock = getattr(port, "_socket", None)
+    if sock is not None:
+        # rfc2217:// and socket:// ports
+        configure_socket(sock)
+    protocol = protocol_factory()
+    transport = ThreadedSerialTransport(loop, protocol, port, stats)
+    transport.start()
+    return transport, protocol
+
+
+async def create_tcp_connection(loop, protocol_factory, url):
+    """Connect to a raw TCP device server at ``tcp://host:port`` or ``socket://host:port``.
+
+    The socket is served by the event loop directly, which reads whatever
+    has arrived in one call. Raises OSError (including TimeoutError) when
+    the server cannot be reached.
+    """
+    parts = urlsplit(url)
+    if not parts.hostname or parts.port is None:
+        raise OSError(f"Expected {parts.scheme}://host:port, got {url}")
+    transport, protocol = await asyncio.wait_for(
+        loop.create_connection(protocol_factory, parts.hostname, parts.port), CONNECT_TIMEOUT
+    )
+    configure_socket(transport.get_extra_info("socket"))
+    return transport, protocol
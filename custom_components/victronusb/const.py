@@ -0,0 +1,42 @@
+"""Constants for the Victron USB integration."""
+
+DOMAIN = "victronusb"
+
+CONF_BAUDRATE = "baudrate"
+CONF_SERIAL_PORT = "serial_port"
+CONF_MAX_PUBLISH_RATE = "max_publish_rate"
+CONF_HEARTBEAT_INTERVAL = "heartbeat_interval"
+CONF_FAST_INTERVAL = "fast_interval"
+CONF_NORMAL_INTERVAL = "normal_interval"
+CONF_HISTORY_INTERVAL = "history_interval"
+CONF_FIELD_INTERVALS = "field_intervals"
+CONF_AVAILABILITY_TIMEOUT = "availability_timeout"
+CONF_AGGREGATE_INTERVAL = "aggregate_interval"
+CONF_READER_THREAD = "reader_thread"
+CONF_STATISTICS = "statistics"
+CONF_STATISTICS_ONLY_FAST = "statistics_only_fast"
+CONF_FRAME_EVENT_INTERVAL = "frame_event_interval"
+
+SERVICE_START_CAPTURE = "start_capture"
+SERVICE_STOP_CAPTURE = "stop_capture"
+
+# Fired when an alarm, relay or device state field changes
+EVENT_STATE_CHANGE = f"{DOMAIN}_state_change"
+# Fired with batches of decoded frames, when enabled
+EVENT_FRAME = f"{DOMAIN}_frame"
+
+DEFAULT_BAUDRATE = 19200
+# State flushes per second per config entry; 0 disables the limit
+DEFAULT_MAX_PUBLISH_RATE = 1.0
+# Seconds after which an unchanged value is published again
+DEFAULT_HEARTBEAT_INTERVAL = 300
+# Minimum seconds between updates of a field, per rate group
+DEFAULT_FAST_INTERVAL = 1
+DEFAULT_NORMAL_INTERVAL = 5
+DEFAULT_HISTORY_INTERVAL = 60
+# Seconds without a frame before a device's sensors become unavailable
+DEFAULT_AVAILABILITY_TIMEOUT = 30
+# Seconds between published min/max/mean and energy aggregates; 0 disables them
+DEFAULT_AGGREGATE_INTERVAL = 60
+# Seconds between batched frame events; 0 disables them
+DEFAULT_FRAME_EVENT_INTERVAL = 0
@@ -0,0 +1,263 @@
+"""Compiled VE.Direct field definitions."""
+import json
+import logging
+import os
+from functools import lru_cache
+
+from .derived import compile_derived
+from .hexproto import HexRegister
+from .states import FLAG_TABLES, STATE_TABLES
+
+_LOGGER = logging.getLogger(__name__)
+
+# Shipped with the integration, next to this module
+DEFINITIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Victronusb.json")
+
+# Raw VE.Direct unit -> (native unit, scale, device class, state class)
+UNITS = {
+    "mV": ("V", 0.001, "voltage", "measurement"),
+    "mA": ("A", 0.001, "current", "measurement"),
+    "cV": ("V", 0.01, "voltage", "measurement"),
+    "dA": ("A", 0.1, "current", "measurement"),
+    "VA": ("VA", 1, "apparent_power", "measurement"),
+    "W": ("W", 1, "power", "measurement"),
+    "P": ("%", 0.1, None, "measurement"),  # per mille
+    "Dc": ("°C", 1, "temperature", "measurement"),
+    "mAh": ("Ah", 0.001, None, "measurement"),
+    "Ah": ("Ah", 1, None, "measurement"),
+    "ckWh": ("kWh", 0.01, "energy", "total_increasing"),
+    "MIN": ("min", 1, "duration", "measurement"),
+    "SEC": ("s", 1, "duration", "measurement"),
+}
+
+ON_OFF_OPTIONS = ["ON", "OFF"]
+_ON_OFF = {b"ON": "ON", b"OFF": "OFF"}
+
+
+def _precision(scale):
+    """Number of decimals a scale factor such as 0.001 introduces."""
+    return len(repr(scale).partition(".")[2])
+
+
+def _int_decoder(scale):
+    if scale == 1:
+        return int
+
+    precision = _precision(scale)
+
+    def decode(value):
+        return round(int(value) * scale, precision)
+
+    return decode
+
+
+def _onoff_decoder(value):
+    try:
+        return _ON_OFF[value]
+    except KeyError:
+        raise ValueError(value) from None
+
+
+def _string_decoder(value):
+    return value.decode("ascii")
+
+
+class FieldDef:
+    """One VE.Direct text field with its decoder resolved up front.
+
+    ``decode`` turns the raw value bytes into the native value (already
+    scaled to ``unit``) and raises ValueError for values that do not parse.
+    Deadbands are kept in native units.
+
+    Fields with ``states`` decode to the name of their code and fields
+    with ``flags`` to the names of their set bits; ``flags`` keeps the
+    FlagTable for the individual bits. ``priority`` fields (alarms, relay
+    and device state) skip throttling and are written without delay.
+    """
+
+    __slots__ = (
+        "label",
+        "name",
+        "group",
+        "unit",
+        "scale",
+        "device_class",
+        "state_class",
+        "options",
+        "precision",
+        "decode",
+        "deadband",
+        "deadband_percent",
+        "rate_group",
+        "aggregate",
+        "register",
+        "flags",
+        "priority",
+    )
+
+    def __init__(self, label, group, spec):
+        self.label = label
+        self.name = spec["full_description"]
+        self.group = group
+        self.options = None
+        self.precision = None
+
+        raw_unit = spec.get("unit_of_measurement")
+        field_type = spec.get("type", "int" if raw_unit else "string")
+
+        if raw_unit is not None and raw_unit not in UNITS:
+            _LOGGER.warning("Unknown unit %s for field %s", raw_unit, label)
+
+        unit, scale, device_class, state_class = UNITS.get(raw_unit, (raw_unit, 1, None, None))
+
+        if field_type == "int":
+            self.decode = _int_decoder(scale)
+            if scale != 1:
+                self.precision = _precision(scale)
+        elif field_type == "onoff":
+            self.decode = _onoff_decoder
+            device_class = "enum"
+            state_class = None
+            self.options = ON_OFF_OPTIONS
+        elif field_type == "string":
+            self.decode = _string_decoder
+            state_class = None
+        else:
+            raise ValueError(f"Unknown type {field_type} for field {label}")
+
+        self.flags = None
+        if "states" in spec:
+            table = STATE_TABLES[spec["states"]]
+            self.decode = table.decode
+            device_class = "enum"
+            state_class = None
+            self.options = table.options
+        elif "flags" in spec:
+            self.flags = FLAG_TABLES[spec["flags"]]
+            self.decode = self.flags.decode
+            state_class = None
+
+        self.unit = unit
+        self.scale = scale
+        self.device_class = spec.get("device_class", device_class)
+        self.state_class = spec.get("state_class", state_class)
+
+        deadband = spec.get("deadband")
+        self.deadband = deadband * scale if deadband else None
+        self.deadband_percent = spec.get("deadband_percent")
+        self.rate_group = spec.get("rate_group", "normal")
+        # Numeric fields to keep full-rate min/max/mean aggregates for
+        self.aggregate = spec.get("aggregate", False) and field_type == "int"
+
+        # Fields not in the text protocol can be polled over HEX instead
+        register = spec.get("register")
+        self.register = HexRegister(register) if register else None
+        self.priority = spec.get("priority", False)
+
+    def __repr__(self):
+        return f"FieldDef({self.label!r}, unit={self.unit!r})"
+
+
+def compile_definitions(smart_data):
+    """Compile the parsed Victronusb.json structure into one FieldDef table.
+
+    The table is keyed by the label as raw bytes, so fields coming off the
+    wire are matched without decoding them first. It holds the fields of
+    every product family; when families define the same label, the first
+    definition wins.
+    """
+    table = {}
+    for sentence in smart_data:
+        group = sentence["group"]  # Capture the group for all fields within this sentence
+        for field in sentence["fields"]:
+            label = field["unique_id"]
+            raw_label = label.encode("ascii")
+            if raw_label not in table:
+                table[raw_label] = FieldDef(label, group, field)
+    return table
+
+
+def _parse_products(products):
+    """Turn ``["0x203", "0xA381-0xA383"]`` into inclusive ``(low, high)`` PID ranges."""
+    ranges = []
+    for product in products:
+        low, _, high = product.partition("-")
+        ranges.append((int(low, 16), int(high or low, 16)))
+    return ranges
+
+
+class ProductRegistry:
+    """Field tables per product family, selected by the PID a device reports.
+
+    Every group of Victronusb.json is a product family with the PIDs it
+    covers and its own compiled table, so a device only gets sensors for
+    fields its product actually has. The family's ``derived`` fields are
+    compiled into a dependency graph over its table. Devices with an
+    unknown PID get the combined table and graph of all families. Lookups
+    are cached per raw PID value.
+    """
+
+    def __init__(self, smart_data):
+        self.fallback = compile_definitions(smart_data)
+        self.fallback_derived = compile_derived(smart_data, self.fallback)
+        self.families = {}
+        self.derived = {}
+        self._ranges = []
+        self._by_pid = {}
+
+        for sentence in smart_data:
+            group = sentence["group"]
+            table = self.families[group] = {}
+            for field in sentence["fields"]:
+                label = field["unique_id"]
+                table[label.encode("ascii")] = FieldDef(label, group, field)
+            self.derived[group] = compile_derived([sentence], table)
+            for low, high in _parse_products(sentence.get("products", [])):
+                self._ranges.append((low, high, group))
+
+    def family_for(self, pid):
+        """Return the family name for a raw PID such as ``b"0xA389"``, or None."""
+        try:
+            value = int(pid, 16)
+        except ValueError:
+            return None
+        for low, high, group in self._ranges:
+            if low <= value <= high:
+                return group
+        return None
+
+    def _cached_family(self, pid):
+        try:
+            return self._by_pid[pid]
+        except KeyError:
+            family = self._by_pid[pid] = self.family_for(pid)
+            if family is None:
+                _LOGGER.info("Unknown VE.Direct product %s, using all field definitions", pid.decode("ascii", "replace"))
+            return family
+
+    def table_for(self, pid):
+        """Return the field table for a raw PID value."""
+        family = self._cached_family(pid)
+        return self.fallback if family is None else self.families[family]
+
+    def derived_for(self, pid):
+        """Return the DerivedGraph for a raw PID value."""
+        family = self._cached_family(pid)
+        return self.fallback_derived if family is None else self.derived[family]
+
+
+def hex_registers(field_table):
+    """Return the ``(raw label, HexRegister)`` pairs to poll for a field table."""
+    return [(raw_label, field.register) for raw_label, field in field_table.items() if field.register]
+
+
+def read_registry(json_path):
+    """Load and compile a product registry from a definition file. Blocking."""
+    with open(json_path, "r") as file:
+        return ProductRegistry(json.load(file))
+
+
+@lru_cache(maxsize=None)
+def load_registry():
+    """Return the shipped product registry, compiled once per process. Blocking, run in an executor."""
+    return read_registry(DEFINITIONS_PATH)
@@ -0,0 +1,182 @@
+"""Derived fields computed in-process from other fields."""
+import ast
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+_FUNCTIONS = {"min": min, "max": max, "abs": abs}
+
+_ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.IfExp,
+    ast.Compare,
+    ast.Call,
+    ast.Name,
+    ast.Load,
+    ast.Constant,
+    ast.Add,
+    ast.Sub,
+    ast.Mult,
+    ast.Div,
+    ast.UAdd,
+    ast.USub,
+    ast.Lt,
+    ast.LtE,
+    ast.Gt,
+    ast.GtE,
+    ast.Eq,
+    ast.NotEq,
+)
+
+
+def compile_expression(expression):
+    """Compile an arithmetic expression over field labels.
+
+    Only numbers, field names, ``+ - * /``, comparisons, ``a if c else b``
+    and ``min``/``max``/``abs`` are allowed. Returns the code object and
+    the set of field labels it reads. Raises ValueError for anything else.
+    """
+    try:
+        tree = ast.parse(expression, mode="eval")
+    except SyntaxError as exc:
+        raise ValueError(f"Invalid expression {expression!r}: {exc}") from None
+
+    names = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED_NODES):
+            raise ValueError(f"{type(node).__name__} is not allowed in {expression!r}")
+        if isinstance(node, ast.Call) and not (isinstance(node.func, ast.Name) and node.func.id in _FUNCTIONS):
+            raise ValueError(f"Only {', '.join(_FUNCTIONS)} can be called in {expression!r}")
+        if isinstance(node, ast.Name) and node.id not in _FUNCTIONS:
+            names.add(node.id)
+    return compile(tree, expression, "eval"), names
+
+
+class DerivedField:
+    """A field computed from other fields, described like a FieldDef.
+
+    ``inputs`` are the raw labels the expression reads. ``evaluate``
+    returns None while an input is missing or the result is undefined,
+    e.g. a division by zero.
+    """
+
+    __slots__ = (
+        "label",
+        "name",
+        "group",
+        "unit",
+        "device_class",
+        "state_class",
+        "options",
+        "precision",
+        "deadband",
+        "deadband_percent",
+        "priority",
+        "inputs",
+        "_code",
+        "_names",
+    )
+
+    def __init__(self, label, group, spec):
+        self.label = label
+        self.name = spec["full_description"]
+        self.group = group
+        self.unit = spec.get("unit")
+        self.device_class = spec.get("device_class")
+        self.state_class = spec.get("state_class", "measurement")
+        self.options = None
+        self.precision = spec.get("precision")
+        self.deadband = spec.get("deadband")
+        self.deadband_percent = spec.get("deadband_percent")
+        self.priority = False
+        self._code, names = compile_expression(spec["expression"])
+        self._names = tuple((name, name.encode("ascii")) for name in sorted(names))
+        self.inputs = frozenset(raw for _, raw in self._names)
+
+    def evaluate(self, values):
+        env = {}
+        for name, raw in self._names:
+            value = values.get(raw)
+            if value is None:
+                return None
+            env[name] = value
+        env.update(_FUNCTIONS)
+        try:
+            result = eval(self._code, {"__builtins__": {}}, env)
+        except (ZeroDivisionError, TypeError):
+            return None
+        if result is None or self.precision is None:
+            return result
+        return round(result, self.precision)
+
+    def __repr__(self):
+        return f"DerivedField({self.label!r}, inputs={sorted(self.inputs)!r})"
+
+
+class DerivedGraph:
+    """The derived fields of a product family in dependency order.
+
+    Fields may read other derived fields. ``update`` recomputes a field
+    only when one of its inputs changed in the current frame, and a field
+    whose result changed in turn marks its own dependants, so one pass in
+    topological order covers every chain.
+    """
+
+    __slots__ = ("fields", "inputs", "_order")
+
+    def __init__(self, fields, known_labels):
+        self.fields = fields
+        pending = dict(fields)
+        order = []
+        done = set(known_labels)
+
+        while pending:
+            ready = [raw_label for raw_label, field in pending.items() if field.inputs <= done]
+            if not ready:
+                unresolved = ", ".join(sorted(field.label for field in pending.values()))
+                raise ValueError(f"Derived fields with unknown or circular inputs: {unresolved}")
+            for raw_label in ready:
+                order.append((raw_label, pending.pop(raw_label)))
+                done.add(raw_label)
+
+        self._order = order
+        # Every label a derived field reads, so callers only track those
+        self.inputs = frozenset().union(*(field.inputs for field in fields.values()))
+
+    def __bool__(self):
+        return bool(self._order)
+
+    def update(self, values, changed):
+        """Recompute the fields affected by ``changed`` and return the new results.
+
+        ``values`` holds the latest value of every input label and is
+        updated with the results; ``changed`` is the set of labels whose
+        value changed in this frame and is extended with the derived
+        fields whose result changed.
+        """
+        results = {}
+        for raw_label, field in self._order:
+            if field.inputs.isdisjoint(changed):
+                continue
+            value = field.evaluate(values)
+            if value != values.get(raw_label):
+                values[raw_label] = value
+                changed.add(raw_label)
+                results[raw_label] = value
+        return results
+
+
+def compile_derived(groups, known_labels):
+    """Compile the ``derived`` entries of definition groups into a DerivedGraph.
+
+    When several groups define the same label, the first definition wins.
+    """
+    fields = {}
+    for sentence in groups:
+        for spec in sentence.get("derived", []):
+            raw_label = spec["unique_id"].encode("ascii")
+            if raw_label not in fields:
+                fields[raw_label] = DerivedField(spec["unique_id"], sentence["group"], spec)
+    return DerivedGraph(fields, known_labels)
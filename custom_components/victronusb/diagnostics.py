@@ -0,0 +1,16 @@
+"""Diagnostics support for the Victron USB integration."""
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .hub import HUB_KEY
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return diagnostics for a config entry."""
+    hub = hass.data.get(HUB_KEY)
+    port = hub.ports.get(entry.entry_id) if hub else None
+    return {
+        "entry": dict(entry.data),
+        "options": dict(entry.options),
+        "port": port.diagnostics() if port else None,
+    }
@@ -0,0 +1,143 @@
+"""Find VE.Direct devices on the local serial ports."""
+import asyncio
+import glob
+import logging
+import os
+import time
+
+import serial
+
+from .const import DEFAULT_BAUDRATE
+from .hotplug import BY_ID_DIR
+from .vedirect import LABEL_PID, LABEL_SERIAL, VEDirectTextParser
+
+_LOGGER = logging.getLogger(__name__)
+
+# VE.Direct is 19200 baud; the others are tried on ports that send
+# something at 19200 but never a valid block
+BAUDRATES = (DEFAULT_BAUDRATE, 9600, 38400, 57600, 115200, 4800)
+
+# Devices send a block every second, so a few seconds find one even when
+# the first block read is cut off or is a BMV history block without PID
+PROBE_TIMEOUT = 2.5
+# A port that sent nothing within this time at all is not tried at other rates
+SILENT_TIMEOUT = 1.5
+READ_TIMEOUT = 0.1
+
+# By-id names of Victron's own VE.Direct USB cables; other ports, which
+# may be Zigbee or Z-Wave sticks in use, are only probed on request
+VEDIRECT_ID_PATTERNS = ("VictronEnergy", "VE_Direct")
+
+
+class DiscoveredDevice:
+    """A VE.Direct device found on a serial port."""
+
+    __slots__ = ("port", "baudrate", "pid", "serial")
+
+    def __init__(self, port, baudrate, pid, serial):
+        self.port = port
+        self.baudrate = baudrate
+        self.pid = pid
+        self.serial = serial
+
+    def __repr__(self):
+        return f"DiscoveredDevice({self.port!r}, {self.baudrate}, pid={self.pid!r}, serial={self.serial!r})"
+
+
+def list_ports(probe_all=False):
+    """Return the serial ports to probe, by their stable by-id names. Blocking.
+
+    Only VE.Direct cables are returned, unless ``probe_all`` is set; then
+    all ports are, falling back to the ttyUSB/ttyACM names when there are
+    no by-id names.
+    """
+    names = sorted(os.listdir(BY_ID_DIR)) if os.path.isdir(BY_ID_DIR) else []
+    if not probe_all:
+        names = [name for name in names if any(pattern in name for pattern in VEDIRECT_ID_PATTERNS)]
+    ports = [os.path.join(BY_ID_DIR, name) for name in names]
+    if probe_all and not ports:
+        ports = sorted(glob.glob("/dev/ttyUSB*") + glob.glob("/dev/ttyACM*"))
+    return ports
+
+
+def claimed_ports(entries):
+    """Return the device paths found in the data and options of config entries, of any integration."""
+    ports = set()
+
+    def collect(value):
+        if isinstance(value, str):
+            if value.startswith("/dev/"):
+                ports.add(value)
+        elif isinstance(value, dict):
+            for item in value.values():
+                collect(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                collect(item)
+
+    for entry in entries:
+        collect(dict(entry.data))
+        collect(dict(entry.options))
+    return ports
+
+
+def _unclaimed_ports(exclude, probe_all):
+    claimed = {os.path.realpath(port) for port in exclude if port and port.startswith("/dev/")}
+    return [port for port in list_ports(probe_all) if os.path.realpath(port) not in claimed]
+
+
+def _probe_rate(port, baudrate, timeout):
+    """Read ``port`` at ``baudrate``; return ``(bytes received, PID frame or None)``."""
+    parser = VEDirectTextParser()
+    received = 0
+    # Fails rather than sharing a port another process holds; pending input
+    # is left alone, the parser skips to the next block anyway
+    with serial.serial_for_url(port, baudrate=baudrate, timeout=READ_TIMEOUT, exclusive=True) as connection:
+        started = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= timeout or (not received and elapsed >= SILENT_TIMEOUT):
+                break
+            data = connection.read(max(1, connection.in_waiting))
+            if not data:
+                continue
+            received += len(data)
+            for frame in parser.feed(data):
+                if LABEL_PID in frame:
+                    return received, frame
+    return received, None
+
+
+def probe_port(port, baudrates=BAUDRATES, timeout=PROBE_TIMEOUT):
+    """Return the DiscoveredDevice on ``port``, or None. Blocking, run in an executor.
+
+    The first rate is always tried. Further rates are only tried while the
+    port sends data that never forms a valid block, as a silent port will
+    not start talking at another rate.
+    """
+    for baudrate in baudrates:
+        try:
+            received, frame = _probe_rate(port, baudrate, timeout)
+        except (OSError, serial.SerialException) as exc:
+            _LOGGER.debug("Cannot probe %s: %s", port, exc)
+            return None
+        if frame is not None:
+            return DiscoveredDevice(port, baudrate, frame[LABEL_PID], frame.get(LABEL_SERIAL))
+        if not received:
+            return None
+    return None
+
+
+async def async_discover(hass, probe_all=False):
+    """Probe the local serial ports concurrently; return the devices found.
+
+    Only VE.Direct cables are probed unless ``probe_all`` is set. Ports of
+    any config entry, of this or another integration, are skipped under
+    any of their names, as they are already open.
+    """
+    exclude = claimed_ports(hass.config_entries.async_entries())
+    ports = await hass.async_add_executor_job(_unclaimed_ports, exclude, probe_all)
+    results = await asyncio.gather(*(hass.async_add_executor_job(probe_port, port) for port in ports))
+    devices = [device for device in results if device is not None]
+    _LOGGER.debug("Probed %d serial ports, found %s", len(ports), devices)
+    return devices
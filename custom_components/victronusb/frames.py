@@ -0,0 +1,191 @@
+"""Decoded frames for consumers other than the integration's own sensors."""
+import logging
+import time
+from collections import deque
+
+from homeassistant.core import callback
+
+from .const import EVENT_FRAME
+
+_LOGGER = logging.getLogger(__name__)
+
+# Frames a subscriber may fall behind by before the oldest are dropped
+DEFAULT_MAX_QUEUE = 64
+# Frames per second of event interval the bus event keeps, enough for a few devices
+EVENT_QUEUE_RATE = 4
+
+
+def decode_frame(device, frame):
+    """Return a frame as a JSON-friendly message.
+
+    Fields defined for the device's product are decoded to their native
+    values; other labels keep their raw value as a string. Values that do
+    not decode are left out.
+    """
+    values = {}
+    field_table = device.field_table
+    for label, raw in frame.items():
+        field = field_table.get(label)
+        if field is None:
+            values[label.decode("ascii", "replace")] = raw.decode("ascii", "replace")
+            continue
+        try:
+            values[field.label] = field.decode(raw)
+        except ValueError:
+            continue
+    return {
+        "device": device.key,
+        "pid": device.pid.decode("ascii", "replace"),
+        "time": time.time(),
+        "values": values,
+    }
+
+
+class FrameSubscription:
+    """One consumer of a port's frames, with its own queue and rate limit.
+
+    Frames are queued and handed to ``callback`` as a list, from a
+    separate event loop callback, never from the reader. Deliveries are
+    spaced out to at most ``max_rate`` per second (0 for every loop
+    iteration); frames arriving in between are delivered together. When
+    ``max_queue`` frames are waiting the oldest are dropped and counted,
+    so a slow consumer loses frames instead of holding up the port.
+    """
+
+    __slots__ = (
+        "_loop",
+        "_callback",
+        "_min_interval",
+        "_queue",
+        "_handle",
+        "_last_delivery",
+        "on_close",
+        "delivered",
+        "dropped",
+    )
+
+    def __init__(self, loop, callback, max_rate=0, max_queue=DEFAULT_MAX_QUEUE, on_close=None):
+        self._loop = loop
+        self._callback = callback
+        self.on_close = on_close
+        self._min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._queue = deque(maxlen=max_queue)
+        self._handle = None
+        self._last_delivery = 0.0
+        self.delivered = 0
+        self.dropped = 0
+
+    def put(self, message):
+        queue = self._queue
+        if len(queue) == queue.maxlen:
+            self.dropped += 1
+        queue.append(message)
+        if self._handle is None:
+            delay = self._last_delivery + self._min_interval - self._loop.time()
+            if delay > 0:
+                self._handle = self._loop.call_later(delay, self._async_deliver)
+            else:
+                self._handle = self._loop.call_soon(self._async_deliver)
+
+    @callback
+    def _async_deliver(self):
+        self._handle = None
+        self._last_delivery = self._loop.time()
+        frames = list(self._queue)
+        self._queue.clear()
+        self.delivered += len(frames)
+        try:
+            self._callback(frames)
+        except Exception:  # Catch all exception types
+            _LOGGER.exception("Error in VE.Direct frame subscriber %s", self._callback)
+
+    def cancel(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._queue.clear()
+
+
+class FrameBroker:
+    """Share a port's validated frames with in-process subscribers.
+
+    Each frame is decoded once, and only while there are subscribers.
+    The optional ``victronusb_frame`` bus event is one more subscriber,
+    firing batches of frames every ``event_interval`` seconds.
+    """
+
+    def __init__(self, hass, entry_id):
+        self._hass = hass
+        self._entry_id = entry_id
+        self._subscriptions = []
+        self._event_unsub = None
+        self.event_interval = 0
+
+    def __bool__(self):
+        return bool(self._subscriptions)
+
+    @callback
+    def async_subscribe(self, frame_callback, max_rate=0, max_queue=DEFAULT_MAX_QUEUE, on_close=None):
+        """Call ``frame_callback`` with lists of decoded frames; return the unsubscribe function.
+
+        The callback runs in the event loop and must not block. ``on_close``
+        is called when the port closes for good, e.g. because its entry is
+        unloaded or reloaded, and the subscription has ended.
+        """
+        subscription = FrameSubscription(self._hass.loop, frame_callback, max_rate, max_queue, on_close)
+        self._subscriptions.append(subscription)
+
+        @callback
+        def unsubscribe():
+            subscription.cancel()
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+        return unsubscribe
+
+    @callback
+    def async_set_event_interval(self, event_interval):
+        """Fire ``victronusb_frame`` events every ``event_interval`` seconds; 0 stops them."""
+        if event_interval == self.event_interval:
+            return
+        self.event_interval = event_interval
+        if self._event_unsub is not None:
+            self._event_unsub()
+            self._event_unsub = None
+        if event_interval:
+            self._event_unsub = self.async_subscribe(
+                self._async_fire_event,
+                max_rate=1.0 / event_interval,
+                max_queue=max(DEFAULT_MAX_QUEUE, int(event_interval * EVENT_QUEUE_RATE)),
+            )
+
+    @callback
+    def _async_fire_event(self, frames):
+        self._hass.bus.async_fire(EVENT_FRAME, {"entry_id": self._entry_id, "frames": frames})
+
+    def publish(self, device, frame):
+        message = decode_frame(device, frame)
+        for subscription in self._subscriptions:
+            subscription.put(message)
+
+    @callback
+    def async_close(self):
+        """End all subscriptions and tell their subscribers."""
+        subscriptions = self._subscriptions
+        self._subscriptions = []
+        for subscription in subscriptions:
+            subscription.cancel()
+            if subscription.on_close is not None:
+                try:
+                    subscription.on_close()
+                except Exception:  # Catch all exception types
+                    _LOGGER.exception("Error closing VE.Direct frame subscriber %s", subscription.on_close)
+        self._event_unsub = None
+        self.event_interval = 0
+
+    def diagnostics(self):
+        return {
+            "subscribers": len(self._subscriptions),
+            "delivered": sum(subscription.delivered for subscription in self._subscriptions),
+            "dropped": sum(subscription.dropped for subscription in self._subscriptions),
+        }
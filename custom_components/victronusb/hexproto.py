@@ -0,0 +1,247 @@
+"""VE.Direct HEX protocol engine."""
+import asyncio
+import binascii
+import heapq
+import logging
+from collections import deque
+
+_LOGGER = logging.getLogger(__name__)
+
+# Commands (host -> device)
+CMD_PING = 0x1
+CMD_APP_VERSION = 0x3
+CMD_PRODUCT_ID = 0x4
+CMD_RESTART = 0x6
+CMD_GET = 0x7
+CMD_SET = 0x8
+
+# Responses (device -> host)
+RSP_DONE = 0x1
+RSP_UNKNOWN = 0x3
+RSP_ERROR = 0x4
+RSP_PING = 0x5
+RSP_GET = 0x7
+RSP_SET = 0x8
+RSP_ASYNC = 0xA
+
+# Response flags of get/set/async messages
+FLAG_UNKNOWN_ID = 0x01
+FLAG_NOT_SUPPORTED = 0x02
+FLAG_PARAMETER_ERROR = 0x04
+
+_CHECKSUM_TARGET = 0x55
+
+DEFAULT_TIMEOUT = 1.0
+DEFAULT_RETRIES = 2
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+class VEDirectHexError(Exception):
+    """A HEX request failed or was rejected by the device."""
+
+
+class VEDirectHexTimeout(VEDirectHexError):
+    """A HEX request got no response within its timeout and retries."""
+
+
+def encode_record(command, payload=b""):
+    """Encode a HEX record, e.g. ``encode_record(CMD_PING)`` -> ``b":154\\n"``."""
+    checksum = (_CHECKSUM_TARGET - command - sum(payload)) & 0xFF
+    return b":%X%s%02X\n" % (command, binascii.hexlify(payload).upper(), checksum)
+
+
+def decode_record(record):
+    """Decode a raw ``:...\\n`` record into ``(command, payload)``.
+
+    Raises ValueError if the record is malformed or its checksum is wrong.
+    """
+    body = record.strip()
+    if body[:1] != b":" or len(body) < 4 or len(body) % 2:
+        raise ValueError(f"Malformed HEX record {record!r}")
+
+    command = int(body[1:2], 16)
+    data = binascii.unhexlify(body[2:])
+    if (command + sum(data)) & 0xFF != _CHECKSUM_TARGET:
+        raise ValueError(f"HEX record checksum mismatch {record!r}")
+    return command, data[:-1]
+
+
+def encode_register_request(command, register, value=b""):
+    """Encode a get/set request: register id (LE), zero flags, then the value."""
+    return encode_record(command, register.to_bytes(2, "little") + b"\x00" + value)
+
+
+class HexRegister:
+    """A register polled over HEX and published as a regular field."""
+
+    __slots__ = ("id", "size", "signed", "interval")
+
+    def __init__(self, spec):
+        self.id = int(spec["id"], 16) if isinstance(spec["id"], str) else spec["id"]
+        self.size = spec.get("size", 2)
+        self.signed = spec.get("signed", False)
+        self.interval = spec.get("interval", 60)
+
+    def decode(self, value):
+        """Turn a little-endian register value into an integer."""
+        if len(value) < self.size:
+            raise ValueError(f"Short value for register 0x{self.id:04X}")
+        return int.from_bytes(value[:self.size], "little", signed=self.signed)
+
+    def __repr__(self):
+        return f"HexRegister(0x{self.id:04X})"
+
+
+class VEDirectHexClient:
+    """Pipelined get/set/ping client over an already open connection.
+
+    Requests are written straight away, up to ``max_in_flight`` at a time,
+    and matched to responses by command and register id, so several
+    registers can be read in one round trip. ``handle_record`` must be fed
+    every HEX record the text parser separates from the stream. Device
+    initiated async messages are passed to ``on_async``.
+    """
+
+    def __init__(
+        self,
+        write,
+        timeout=DEFAULT_TIMEOUT,
+        retries=DEFAULT_RETRIES,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        on_async=None,
+    ):
+        self._write = write
+        self._timeout = timeout
+        self._retries = retries
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._pending = {}
+        self._on_async = on_async
+        self.errors = 0
+        self.timeouts = 0
+
+    def handle_record(self, record):
+        """Resolve the request a received HEX record answers."""
+        try:
+            command, payload = decode_record(record)
+        except ValueError as exc:
+            self.errors += 1
+            _LOGGER.debug("%s", exc)
+            return
+
+        if command in (RSP_GET, RSP_SET, RSP_ASYNC):
+            if len(payload) < 3:
+                self.errors += 1
+                return
+            register = int.from_bytes(payload[:2], "little")
+            flags = payload[2]
+            value = payload[3:]
+
+            if command == RSP_ASYNC:
+                if self._on_async is not None and not flags:
+                    self._on_async(register, value)
+                return
+
+            key = (command, register)
+            if flags:
+                self._resolve(key, exception=VEDirectHexError(
+                    f"Register 0x{register:04X} rejected with flags 0x{flags:02X}"
+                ))
+            else:
+                self._resolve(key, result=value)
+        elif command == RSP_PING:
+            self._resolve((RSP_PING, None), result=payload)
+        elif command in (RSP_ERROR, RSP_UNKNOWN):
+            # Not attributable to a specific request; the request times out
+            self.errors += 1
+            _LOGGER.debug("Device reported HEX error response %X", command)
+        else:
+            _LOGGER.debug("Ignoring unexpected HEX response %X", command)
+
+    def _resolve(self, key, result=None, exception=None):
+        waiters = self._pending.get(key)
+        while waiters:
+            future = waiters.popleft()
+            if future.done():
+                continue
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+            break
+        if not waiters:
+            self._pending.pop(key, None)
+
+    async def _request(self, key, record):
+        async with self._slots:
+            for attempt in range(self._retries + 1):
+                future = asyncio.get_running_loop().create_future()
+                self._pending.setdefault(key, deque()).append(future)
+                self._write(record)
+                try:
+                    return await asyncio.wait_for(future, self._timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    _LOGGER.debug("HEX request %r timed out (attempt %d)", record, attempt + 1)
+            raise VEDirectHexTimeout(f"No response to {record!r}")
+
+    async def ping(self):
+        """Ping the device; returns the raw version payload."""
+        return await self._request((RSP_PING, None), encode_record(CMD_PING))
+
+    async def get(self, register):
+        """Read a register; returns its raw little-endian value bytes."""
+        return await self._request((RSP_GET, register), encode_register_request(CMD_GET, register))
+
+    async def set(self, register, value):
+        """Write raw little-endian value bytes to a register; returns the echoed value."""
+        return await self._request((RSP_SET, register), encode_register_request(CMD_SET, register, value))
+
+    def cancel_all(self):
+        """Fail every outstanding request, e.g. when the connection drops."""
+        pending = self._pending
+        self._pending = {}
+        for waiters in pending.values():
+            for future in waiters:
+                if not future.done():
+                    future.cancel()
+
+
+async def poll_registers(client, registers, on_value):
+    """Poll ``registers`` at their own intervals and report them as text fields.
+
+    ``registers`` is a list of ``(label, HexRegister)`` pairs where label is
+    the raw field label the value is published under. All registers that
+    are due together are requested in one pipelined batch, and each value
+    is handed to ``on_value(label, value)`` in the same textual form the
+    text protocol uses, so it decodes like the text field would. Runs
+    until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    due = [(loop.time(), index, label, register) for index, (label, register) in enumerate(registers)]
+    heapq.heapify(due)
+
+    while due:
+        delay = due[0][0] - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        now = loop.time()
+        batch = []
+        while due and due[0][0] <= now:
+            batch.append(heapq.heappop(due))
+
+        results = await asyncio.gather(
+            *(client.get(register.id) for _, _, _, register in batch), return_exceptions=True
+        )
+
+        for (_, index, label, register), result in zip(batch, results):
+            heapq.heappush(due, (now + register.interval, index, label, register))
+            if isinstance(result, BaseException):
+                _LOGGER.debug("Polling %r failed: %s", register, result)
+                continue
+            try:
+                value = b"%d" % register.decode(result)
+            except ValueError as exc:
+                _LOGGER.debug("%s", exc)
+                continue
+            on_value(label, value)
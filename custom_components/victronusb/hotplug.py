@@ -0,0 +1,105 @@
+"""Stable serial port names and device node hot-plug notification."""
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+
+_LOGGER = logging.getLogger(__name__)
+
+BY_ID_DIR = "/dev/serial/by-id"
+
+# inotify(7)
+IN_ATTRIB = 0x00000004
+IN_CREATE = 0x00000100
+IN_MOVED_TO = 0x00000080
+IN_IGNORED = 0x00008000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+
+def resolve_by_id(path):
+    """Return the /dev/serial/by-id link for a device node, or None.
+
+    The by-id names are derived from the adapter's USB serial number, so
+    they keep pointing at the same adapter when USB re-enumeration hands
+    out the ttyUSB numbers in a different order. Blocking.
+    """
+    if path.startswith(BY_ID_DIR) or not os.path.isdir(BY_ID_DIR):
+        return None
+    target = os.path.realpath(path)
+    for name in sorted(os.listdir(BY_ID_DIR)):
+        link = os.path.join(BY_ID_DIR, name)
+        if os.path.realpath(link) == target:
+            return link
+    return None
+
+
+class DeviceNodeWatcher:
+    """Call ``on_change`` when device nodes appear, using inotify on Linux.
+
+    Watches /dev and /dev/serial/by-id for created or re-permissioned
+    entries, so a port that went away can be reopened as soon as udev has
+    recreated its node instead of on the next timed retry. Without inotify
+    (other platforms, containers without it) ``start`` returns False and
+    reconnecting falls back to the timed retries alone.
+    """
+
+    def __init__(self, loop, on_change):
+        self._loop = loop
+        self._on_change = on_change
+        self._fd = None
+        self._libc = None
+        self._watches = {}
+
+    def start(self):
+        """Start watching; return False if inotify is not available."""
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return False
+        if fd < 0:
+            _LOGGER.debug("inotify unavailable: %s", os.strerror(ctypes.get_errno()))
+            return False
+
+        self._libc = libc
+        self._fd = fd
+        self._add_watch("/dev")
+        self._add_watch(BY_ID_DIR)
+        self._loop.add_reader(fd, self._read_events)
+        return True
+
+    def stop(self):
+        if self._fd is not None:
+            self._loop.remove_reader(self._fd)
+            os.close(self._fd)
+            self._fd = None
+            self._watches = {}
+
+    def _add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), IN_CREATE | IN_ATTRIB | IN_MOVED_TO)
+        if wd >= 0:
+            self._watches[wd] = path
+
+    def _read_events(self):
+        try:
+            data = os.read(self._fd, 4096)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+            offset += _EVENT.size + length
+
+            if mask & IN_IGNORED:
+                # The by-id directory disappears with the last USB serial adapter
+                self._watches.pop(wd, None)
+            elif self._watches.get(wd) == "/dev" and name == b"serial" and BY_ID_DIR not in self._watches.values():
+                self._add_watch(BY_ID_DIR)
+
+        self._on_change()
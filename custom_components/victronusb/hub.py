@@ -0,0 +1,754 @@
+"""Shared I/O supervisor for all Victron USB ports."""
+import asyncio
+import logging
+import random
+from functools import partial
+
+import serial_asyncio
+from serial import SerialException
+
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP
+from homeassistant.core import callback
+
+from .aggregation import DeviceAggregator, aggregate_definitions
+from .capture import FrameCapture
+from .connection import (
+    RFC2217_SCHEME,
+    TCP_SCHEMES,
+    VEDirectProtocol,
+    create_tcp_connection,
+    create_threaded_serial_connection,
+    url_scheme,
+)
+from .const import DOMAIN, EVENT_STATE_CHANGE
+from .definitions import hex_registers, load_registry
+from .frames import DEFAULT_MAX_QUEUE, FrameBroker
+from .hexproto import VEDirectHexClient, poll_registers
+from .hotplug import DeviceNodeWatcher, resolve_by_id
+from .statistics import StatisticsImporter
+from .stats import PortStats
+from .vedirect import LABEL_PID, LABEL_SERIAL
+
+_LOGGER = logging.getLogger(__name__)
+
+HUB_KEY = f"{DOMAIN}_hub"
+
+# Reconnect backoff: a fast first retry, then doubling up to the maximum,
+# each delay jittered down by up to half so ports do not retry in lockstep
+RETRY_FIRST = 0.25
+RETRY_BASE = 1
+RETRY_MAX = 60
+# A connection that stayed up this long resets the backoff
+STABLE_AFTER = 30
+# Delay between a device node appearing and trying to open it
+HOTPLUG_DELAY = 0.1
+
+
+@callback
+def async_get_hub(hass):
+    """Return the process-wide hub, creating it on first use."""
+    hub = hass.data.get(HUB_KEY)
+    if hub is None:
+        hub = hass.data[HUB_KEY] = VictronHub(hass)
+    return hub
+
+
+@callback
+def async_subscribe_frames(hass, entry_id, frame_callback, max_rate=0, max_queue=DEFAULT_MAX_QUEUE, on_close=None):
+    """Subscribe to the decoded frames of a config entry's port; return the unsubscribe function.
+
+    ``frame_callback`` is called in the event loop with a list of frames,
+    see FrameSubscription. Raises ValueError if the entry has no port.
+    The subscription ends when the entry is unloaded or reloaded; then
+    ``on_close`` is called, so the caller can subscribe again.
+    """
+    hub = hass.data.get(HUB_KEY)
+    port = hub.ports.get(entry_id) if hub is not None else None
+    if port is None:
+        raise ValueError(f"No VE.Direct port for config entry {entry_id}")
+    return port.frames.async_subscribe(frame_callback, max_rate, max_queue, on_close)
+
+
+class VictronDevice:
+    """One physical VE.Direct device and the sensors created for it.
+
+    Devices are identified by the ``SER#`` they report, or by ``PID`` per
+    config entry for products that do not send a serial number, so their
+    entities follow the device rather than the port it is plugged into.
+    ``last_seen`` is the loop time of the device's latest frame.
+    ``field_table`` holds the definitions of the device's product family
+    and ``derived`` its derived fields, computed from the latest input
+    ``values``.
+    ``aggregator`` is set when the port publishes full-rate aggregates.
+    ``priority`` lists the family's priority fields, whose last raw value
+    is kept in ``priority_values`` to detect transitions.
+    """
+
+    __slots__ = (
+        "entry_id",
+        "key",
+        "name",
+        "pid",
+        "serial",
+        "field_table",
+        "derived",
+        "values",
+        "sensors",
+        "available",
+        "last_seen",
+        "aggregator",
+        "priority",
+        "priority_values",
+    )
+
+    def __init__(self, entry_id, key, name, pid, serial, field_table, derived, last_seen):
+        self.entry_id = entry_id
+        self.key = key
+        self.name = name
+        self.pid = pid
+        self.serial = serial
+        self.field_table = field_table
+        self.derived = derived
+        self.values = {}
+        self.sensors = {}
+        self.available = True
+        self.last_seen = last_seen
+        self.aggregator = None
+        self.priority = tuple((raw_label, field) for raw_label, field in field_table.items() if field.priority)
+        self.priority_values = {}
+
+    def __repr__(self):
+        return f"VictronDevice({self.key!r})"
+
+    def sensor_unique_id(self, label):
+        """Return the unique ID of the device's sensor for ``label``.
+
+        Scoped to the config entry, so a device reachable through two
+        entries (e.g. USB and a TCP relay) does not register the same IDs.
+        """
+        device_id = (self.serial or self.pid).decode("ascii", "replace")
+        return f"{self.entry_id}_{device_id}_{label}".lower().replace(" ", "_")
+
+
+class VictronPort:
+    """One serial port served by the hub.
+
+    Owns the connection, parser and HEX client for the port, resolves which
+    device a frame belongs to and hands the due fields of every validated
+    frame to ``frame_handler(port, device, frame)``.
+
+    Availability is deadline based: a device whose last frame is older than
+    ``availability_timeout`` seconds is marked unavailable. A single timer
+    per port is armed for the earliest deadline and re-armed when it fires,
+    so the frame path only records a timestamp.
+
+    With ``reader_thread`` the port is read and parsed in its own thread
+    and only complete frames reach the event loop, in batches.
+
+    ``url`` is a device path or a pyserial URL. ``tcp://`` and ``socket://``
+    URLs of a remote device server are served by the event loop directly,
+    ``rfc2217://`` ones always by a reader thread.
+
+    Failed and lost connections are retried with jittered exponential
+    backoff. Device nodes are opened through their /dev/serial/by-id name
+    once known, so the port keeps following the same adapter.
+
+    With an ``aggregate_interval``, every frame is also fed to the device's
+    aggregator before throttling, and the aggregates are handed to
+    ``aggregate_handler(port, device, values)`` once per interval.
+
+    Priority fields (alarms, relay and device state) are checked on every
+    frame before throttling, and each change fires an ``EVENT_STATE_CHANGE``
+    bus event right away, from the same callback that validated the frame.
+
+    With ``statistics``, the aggregators also keep hourly statistics that
+    are imported into the recorder, and with ``statistics_only_fast`` the
+    aggregated fast fields are listed in ``statistics_only`` so that no
+    sensors are created for them.
+    """
+
+    def __init__(
+        self,
+        hub,
+        entry_id,
+        name,
+        url,
+        serial_options,
+        registry,
+        scheduler,
+        publisher,
+        availability_timeout,
+        aggregate_interval=0,
+        reader_thread=False,
+        statistics=False,
+        statistics_only_fast=False,
+    ):
+        self.hub = hub
+        self.entry_id = entry_id
+        self.name = name
+        self.url = url
+        # As configured; ``url`` may be swapped for the adapter's by-id path
+        self._configured_url = url
+        self.serial_options = serial_options
+        self.registry = registry
+        # Fields of all product families, for what is shared by the port's devices
+        self.field_table = registry.fallback
+        self.scheduler = scheduler
+        self.publisher = publisher
+        self.availability_timeout = availability_timeout
+        self.aggregate_interval = aggregate_interval
+        self.reader_thread = reader_thread
+        self.aggregate_table = aggregate_definitions(self.field_table) if aggregate_interval else {}
+        self.statistics = StatisticsImporter(hub.hass, self) if statistics else None
+        self.statistics_only = frozenset(
+            raw_label
+            for raw_label, field in self.field_table.items()
+            if statistics and statistics_only_fast and field.aggregate and field.rate_group == "fast"
+        )
+        self.stats = PortStats()
+        self.stats.publisher = publisher
+        self.capture = FrameCapture()
+        self.frames = FrameBroker(hub.hass, entry_id)
+        self.frame_handler = None
+        self.aggregate_handler = None
+        self.status_listener = None
+        self.add_entities = None
+        # The entry settings the port runs with, to tell what an options update changed
+        self.options = {}
+        self.device = None
+        self.devices = {}
+        self.transport = None
+        self.protocol = None
+        self.hex_client = None
+        self.retry_at = 0.0
+        self.retries = 0
+        self.closing = False
+        self._connected_at = None
+        self._resolved = False
+        self._poll_task = None
+        self._connect_task = None
+        self._availability_timer = None
+        self._aggregate_timer = None
+        self._aggregate_since = 0.0
+        self._logged_error = False
+        self._generation = 0
+
+    @property
+    def connected(self):
+        """Return True while the port has an open transport."""
+        return self.transport is not None
+
+    @property
+    def connecting(self):
+        """Return True while a connect attempt is in progress."""
+        return self._connect_task is not None
+
+    @callback
+    def async_start_connect(self):
+        """Start a connect attempt that runs independently of the other ports."""
+        self._connect_task = self.hub.hass.async_create_background_task(
+            self._async_connect_attempt(), f"{DOMAIN} connect {self.url}"
+        )
+
+    async def _async_connect_attempt(self):
+        try:
+            await self.async_connect()
+        except Exception:  # Catch all exception types
+            _LOGGER.exception("Unexpected error connecting to %s", self.url)
+            self._schedule_retry()
+        finally:
+            self._connect_task = None
+            # Let the supervisor pick up the next retry time
+            self.hub.wakeup()
+
+    def _schedule_retry(self):
+        """Set ``retry_at`` for the next attempt from the backoff state."""
+        if self.retries == 0:
+            delay = RETRY_FIRST
+        else:
+            delay = min(RETRY_MAX, RETRY_BASE * 2 ** (self.retries - 1))
+            delay = random.uniform(delay / 2, delay)
+        self.retries += 1
+        self.retry_at = self.hub.hass.loop.time() + delay
+
+    @callback
+    def hotplug(self):
+        """Retry a down port right away, its device node may be back."""
+        if not self.connected and not self.closing:
+            self.retry_at = min(self.retry_at, self.hub.hass.loop.time() + HOTPLUG_DELAY)
+
+    async def async_connect(self):
+        """Try to open the port once; return True on success."""
+        loop = self.hub.hass.loop
+        generation = self._generation
+        if not self._resolved and self.url.startswith("/dev/"):
+            # Pin the port to the adapter, not to whatever gets its ttyUSB number
+            by_id = await self.hub.hass.async_add_executor_job(resolve_by_id, self.url)
+            if by_id is not None:
+                _LOGGER.info("Using %s for serial device %s", by_id, self.url)
+                self.url = by_id
+                self._resolved = True
+        scheme = url_scheme(self.url)
+        try:
+            if scheme in TCP_SCHEMES:
+                transport, protocol = await create_tcp_connection(
+                    loop, lambda: VEDirectProtocol(self.handle_frame, stats=self.stats), self.url
+                )
+            elif self.reader_thread or scheme == RFC2217_SCHEME:
+                # RFC 2217 ports have no file descriptor the event loop could watch
+                transport, protocol = await create_threaded_serial_connection(
+                    loop,
+                    lambda: VEDirectProtocol(self.handle_frame),
+                    self.url,
+                    stats=self.stats,
+                    **self.serial_options,
+                )
+            else:
+                transport, protocol = await serial_asyncio.create_serial_connection(
+                    loop,
+                    lambda: VEDirectProtocol(self.handle_frame, stats=self.stats),
+                    url=self.url,
+                    **self.serial_options,
+                )
+        except (SerialException, OSError, ValueError) as exc:
+            # ValueError: a malformed URL, unknown scheme or unsupported baud rate
+            if not self._logged_error:
+                _LOGGER.error("Unable to connect to the serial device %s: %s. Will retry", self.url, exc)
+                self._logged_error = True
+            self._schedule_retry()
+            return False
+
+        if self.closing:
+            # Removed while we were connecting
+            transport.close()
+            return False
+        if generation != self._generation:
+            # Reconfigured while we were connecting; try again with the new settings
+            transport.close()
+            return False
+
+        _LOGGER.info("Serial device %s connected", self.url)
+        self._logged_error = False
+        self.transport = transport
+        self.protocol = protocol
+        self._connected_at = loop.time()
+        self.stats.connects += 1
+        self.stats.parser = protocol.parser
+        protocol.closed.add_done_callback(self._async_connection_closed)
+
+        # HEX requests share the connection with the text stream
+        self.hex_client = VEDirectHexClient(transport.write)
+        protocol.on_hex = self.hex_client.handle_record
+
+        self._notify_status()
+        return True
+
+    @callback
+    def async_set_connection(self, url, serial_options, reader_thread):
+        """Switch to a new port, baud rate or reader without losing the devices.
+
+        Only the transport is replaced: devices, their sensors and states
+        stay, and the devices identify themselves again from the first
+        frame of the new connection. Does nothing when the settings are
+        unchanged.
+        """
+        if (url, serial_options, reader_thread) == (self._configured_url, self.serial_options, self.reader_thread):
+            return
+        _LOGGER.info("Reconnecting %s to %s", self.name, url)
+        self._generation += 1
+        self.url = self._configured_url = url
+        self.serial_options = serial_options
+        self.reader_thread = reader_thread
+        self._resolved = False
+        self._logged_error = False
+        if self.protocol is not None:
+            # A deliberate close, not a lost device to back off from
+            self.protocol.closed.remove_done_callback(self._async_connection_closed)
+        self._teardown()
+        self.retries = 0
+        self.retry_at = self.hub.hass.loop.time()
+        self._notify_status()
+        self.hub.wakeup()
+
+    @callback
+    def async_set_availability_timeout(self, availability_timeout):
+        """Apply a new availability timeout to the running deadline timer."""
+        if availability_timeout == self.availability_timeout:
+            return
+        self.availability_timeout = availability_timeout
+        if self._availability_timer is not None:
+            self._availability_timer.cancel()
+        self._async_check_availability()
+
+    @callback
+    def _async_connection_closed(self, future):
+        exc = future.result()
+        if exc is not None and not self.closing:
+            _LOGGER.error("Error while reading serial device %s: %s", self.url, exc)
+
+        connected_at = self._connected_at
+        self._teardown()
+        if not self.closing:
+            # Nothing more can arrive from this port, no need to wait for the deadline
+            for device in self.devices.values():
+                if device.available:
+                    self._async_set_device_available(device, False)
+            if connected_at is not None and self.hub.hass.loop.time() - connected_at >= STABLE_AFTER:
+                self.retries = 0
+            self._schedule_retry()
+            self.hub.wakeup()
+        self._notify_status()
+
+    def _teardown(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        if self.hex_client is not None:
+            self.hex_client.cancel_all()
+            self.hex_client = None
+        if self.transport is not None:
+            if not self.transport.is_closing():
+                # Nothing worth flushing to a device that may be gone; free the fd now
+                self.transport.abort()
+            self.transport = None
+        self.protocol = None
+        self._connected_at = None
+        self.stats.absorb_parser()
+        # Whatever is plugged in after a reconnect has to identify itself again
+        self.device = None
+        self.scheduler.reset()
+
+    def diagnostics(self):
+        """Return the port's state and counters for diagnostics."""
+        hex_client = self.hex_client
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "retries": self.retries,
+            "device": self.device.key if self.device else None,
+            "devices": {
+                key: {
+                    "pid": device.pid.decode("ascii", "replace"),
+                    "available": device.available,
+                    "sensors": len(device.sensors),
+                }
+                for key, device in self.devices.items()
+            },
+            "counters": self.stats.snapshot(),
+            "capture": self.capture.diagnostics(),
+            "frames": self.frames.diagnostics(),
+            "hex": {"errors": hex_client.errors, "timeouts": hex_client.timeouts} if hex_client else None,
+        }
+
+    @callback
+    def async_close(self):
+        """Close the port for good."""
+        self.closing = True
+        if self._connect_task is not None:
+            self._connect_task.cancel()
+            self._connect_task = None
+        if self._availability_timer is not None:
+            self._availability_timer.cancel()
+            self._availability_timer = None
+        if self._aggregate_timer is not None:
+            self._aggregate_timer.cancel()
+            self._aggregate_timer = None
+        if self.statistics is not None:
+            self.statistics.async_stop()
+        self.frames.async_close()
+        self.capture.stop()
+        self._teardown()
+
+    def _notify_status(self):
+        if self.status_listener is not None:
+            self.status_listener()
+
+    @callback
+    def handle_frame(self, frame):
+        """Attribute a validated frame to its device and pass on the due fields."""
+        loop = self.hub.hass.loop
+        self.capture.add(loop.time(), frame)
+
+        pid = frame.get(LABEL_PID)
+        if pid is not None:
+            self._identify(pid, frame.get(LABEL_SERIAL))
+
+        device = self.device
+        if device is None:
+            # Blocks without a PID (e.g. BMV history) until the device is known
+            return
+
+        device.last_seen = self.stats.last_frame = loop.time()
+        if not device.available:
+            self._async_set_device_available(device, True)
+        if self._availability_timer is None:
+            self._availability_timer = loop.call_at(
+                device.last_seen + self.availability_timeout, self._async_check_availability
+            )
+
+        if device.priority:
+            self._check_priority(device, frame)
+
+        if self.frames:
+            # Full rate; each subscriber applies its own limit
+            self.frames.publish(device, frame)
+
+        if device.aggregator is not None:
+            # Full rate, before the scheduler drops anything
+            device.aggregator.add_frame(frame, device.last_seen)
+            if self._aggregate_timer is None and self.aggregate_interval:
+                self._aggregate_since = device.last_seen
+                self._aggregate_timer = loop.call_later(self.aggregate_interval, self._async_publish_aggregates)
+
+        accepted = self.scheduler.filter(frame)
+        self.stats.throttled += len(frame) - len(accepted)
+        if accepted:
+            self.frame_handler(self, device, accepted)
+
+    @callback
+    def handle_register(self, device, label, raw):
+        """Pass on a field value polled over HEX.
+
+        Polled values are decoded and published like text fields, but they
+        are not frames the device sent: they are not captured or passed to
+        frame subscribers, and do not count as the device being seen.
+        """
+        self.frame_handler(self, device, {label: raw})
+
+    def _check_priority(self, device, frame):
+        """Fire an event for every priority field whose raw value changed."""
+        last_values = device.priority_values
+        for raw_label, field in device.priority:
+            raw = frame.get(raw_label)
+            if raw is None:
+                continue
+            old = last_values.get(raw_label)
+            if raw == old:
+                continue
+            last_values[raw_label] = raw
+            # The first value seen is the starting point, not a transition
+            if old is not None:
+                self._async_fire_state_change(device, field, old, raw)
+
+    def _async_fire_state_change(self, device, field, old, new):
+        try:
+            data = {
+                "entry_id": self.entry_id,
+                "device": device.key,
+                "field": field.label,
+                "name": field.name,
+                "old_state": field.decode(old),
+                "new_state": field.decode(new),
+            }
+            flags = field.flags
+            if flags is not None:
+                old_mask = flags.mask(old)
+                new_mask = flags.mask(new)
+                data["raised"] = flags.names(new_mask & ~old_mask)
+                data["cleared"] = flags.names(old_mask & ~new_mask)
+        except ValueError:
+            self.stats.decode_errors += 1
+            return
+        self.hub.hass.bus.async_fire(EVENT_STATE_CHANGE, data)
+
+    def _identify(self, pid, serial):
+        device = self.device
+        if device is not None and device.pid == pid and (serial is None or device.serial == serial):
+            return
+
+        key = serial.decode("ascii", "replace") if serial else f"{self.entry_id}_{pid.decode('ascii', 'replace')}"
+        device = self.devices.get(key)
+        if device is None:
+            _LOGGER.info("Found VE.Direct device %s on %s", key, self.url)
+            device = self._add_device(key, pid, serial)
+            self._notify_status()
+        self.device = device
+        self._start_polling(device)
+
+    def _add_device(self, key, pid, serial):
+        field_table = self.registry.table_for(pid)
+        device = self.devices[key] = VictronDevice(
+            self.entry_id,
+            key,
+            self.name,
+            pid,
+            serial,
+            field_table,
+            self.registry.derived_for(pid),
+            self.hub.hass.loop.time(),
+        )
+        if self.aggregate_table or self.statistics is not None:
+            device.aggregator = DeviceAggregator(
+                field_table, self.aggregate_table, self.aggregate_interval, long_term=self.statistics is not None
+            )
+        return device
+
+    def _start_polling(self, device):
+        """Poll the HEX registers of the device's product, once it is known."""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            self._poll_task = None
+        registers = hex_registers(device.field_table)
+        if registers and self.hex_client is not None:
+            # Runs until cancelled, so it must not hold up startup or async_block_till_done
+            self._poll_task = self.hub.hass.async_create_background_task(
+                poll_registers(self.hex_client, registers, partial(self.handle_register, device)),
+                f"{DOMAIN} poll {self.url}",
+            )
+
+    @callback
+    def async_restore_device(self, key, pid, serial):
+        """Recreate a device known from an earlier run before it has reported.
+
+        The device counts as just seen, so its restored sensors stay
+        available for one availability timeout before they need live data.
+        """
+        device = self.devices.get(key)
+        if device is None:
+            device = self._add_device(key, pid, serial)
+            if self._availability_timer is None:
+                self._availability_timer = self.hub.hass.loop.call_at(
+                    device.last_seen + self.availability_timeout, self._async_check_availability
+                )
+        return device
+
+    @callback
+    def _async_check_availability(self):
+        """Mark devices past their deadline unavailable and re-arm for the next one."""
+        self._availability_timer = None
+        loop = self.hub.hass.loop
+        now = loop.time()
+        next_deadline = None
+
+        for device in self.devices.values():
+            if not device.available:
+                continue
+            deadline = device.last_seen + self.availability_timeout
+            if deadline <= now:
+                _LOGGER.info("VE.Direct device %s on %s stopped reporting", device.key, self.url)
+                self._async_set_device_available(device, False)
+            elif next_deadline is None or deadline < next_deadline:
+                next_deadline = deadline
+
+        if next_deadline is not None:
+            self._availability_timer = loop.call_at(next_deadline, self._async_check_availability)
+
+    @callback
+    def _async_publish_aggregates(self):
+        """Publish the aggregates of the interval that just ended."""
+        loop = self.hub.hass.loop
+        since = self._aggregate_since
+        self._aggregate_since = now = loop.time()
+        self._aggregate_timer = None
+
+        active = False
+        for device in self.devices.values():
+            if device.aggregator is None or device.last_seen < since:
+                continue
+            active = True
+            values = device.aggregator.summary(since)
+            if values and self.aggregate_handler is not None:
+                self.aggregate_handler(self, device, values)
+
+        # Idle ports stop the timer; the next frame starts it again
+        if active:
+            self._aggregate_timer = loop.call_at(now + self.aggregate_interval, self._async_publish_aggregates)
+
+    @callback
+    def _async_set_device_available(self, device, available):
+        device.available = available
+        for sensor in device.sensors.values():
+            sensor.set_available(available)
+
+
+class VictronHub:
+    """Serve every configured port from one supervisor task.
+
+    Reading is done by protocol callbacks and availability by per-port
+    timers, so an open port costs no task. The supervisor only (re)opens
+    ports that are down, woken early by device node hot-plug events, and
+    the compiled product definitions are shared by all ports.
+    """
+
+    def __init__(self, hass):
+        self.hass = hass
+        self.ports = {}
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._unsub_stop = None
+        self._watcher = None
+
+    async def async_get_registry(self):
+        """Return the product definitions, compiled once per process."""
+        return await self.hass.async_add_executor_job(load_registry)
+
+    @callback
+    def wakeup(self):
+        """Make the supervisor re-check the ports."""
+        self._wakeup.set()
+
+    @callback
+    def _async_device_nodes_changed(self):
+        for port in self.ports.values():
+            port.hotplug()
+        self.wakeup()
+
+    @callback
+    def async_add_port(self, port):
+        """Start serving a port."""
+        self.ports[port.entry_id] = port
+        if port.statistics is not None:
+            port.statistics.async_start()
+        if self._task is None:
+            self._task = self.hass.async_create_background_task(self._supervise(), f"{DOMAIN} supervisor")
+            self._unsub_stop = self.hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, self.async_stop)
+            self._watcher = DeviceNodeWatcher(self.hass.loop, self._async_device_nodes_changed)
+            if not self._watcher.start():
+                self._watcher = None
+        self.wakeup()
+
+    @callback
+    def async_remove_port(self, entry_id):
+        """Stop serving a port; stop the hub when it was the last one."""
+        port = self.ports.pop(entry_id, None)
+        if port is not None:
+            port.async_close()
+        if not self.ports:
+            self.async_stop()
+
+    @callback
+    def async_stop(self, event=None):
+        """Close all ports and stop the supervisor."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._unsub_stop is not None:
+            if event is None:
+                self._unsub_stop()
+            self._unsub_stop = None
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+        for port in self.ports.values():
+            port.async_close()
+
+    async def _supervise(self):
+        loop = self.hass.loop
+        while True:
+            self._wakeup.clear()
+            next_retry = None
+
+            for port in list(self.ports.values()):
+                if port.connected or port.connecting or port.closing:
+                    continue
+                if port.retry_at <= loop.time():
+                    # Each in its own task, so a slow or unreachable server delays no other port
+                    port.async_start_connect()
+                    continue
+                next_retry = port.retry_at if next_retry is None else min(next_retry, port.retry_at)
+
+            timeout = None if next_retry is None else max(0, next_retry - loop.time())
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,86 @@
+"""Batched state publishing for Victron USB sensors."""
+import logging
+
+from homeassistant.core import callback
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StatePublisher:
+    """Coalesce entity state writes into one flush per event-loop tick.
+
+    Sensors mark themselves dirty instead of scheduling their own state
+    write. All entities marked while handling a frame are written together
+    in a single callback, and flushes are spaced out to at most
+    ``max_rate`` per second. An entity marked several times before the
+    flush is written once, with its latest value.
+
+    ``heartbeat_interval`` is the publishing policy shared by the entry's
+    sensors: a value that has not changed (or stayed inside its deadband)
+    is still re-published once that many seconds have passed.
+    """
+
+    def __init__(self, hass, max_rate, heartbeat_interval):
+        self._hass = hass
+        self.heartbeat_interval = heartbeat_interval
+        self._min_interval = 1.0 / max_rate if max_rate else 0.0
+        self._pending = {}
+        self._handle = None
+        self._last_flush = 0.0
+        self.writes = 0
+
+    @callback
+    def async_set_limits(self, max_rate, heartbeat_interval):
+        """Change the rate limit and heartbeat; a scheduled flush keeps its time."""
+        self.heartbeat_interval = heartbeat_interval
+        self._min_interval = 1.0 / max_rate if max_rate else 0.0
+
+    @callback
+    def async_mark(self, entity):
+        """Queue ``entity`` for the next flush."""
+        self._pending[entity] = None
+        if self._handle is None:
+            loop = self._hass.loop
+            delay = self._last_flush + self._min_interval - loop.time()
+            if delay > 0:
+                self._handle = loop.call_later(delay, self._async_flush)
+            else:
+                self._handle = loop.call_soon(self._async_flush)
+
+    @callback
+    def async_write_now(self, entity):
+        """Write ``entity`` right away, ahead of the rate limit."""
+        self._pending.pop(entity, None)
+        # Entities created from the current frame write their state when added
+        if entity.hass is None:
+            return
+        try:
+            entity.async_write_ha_state()
+            self.writes += 1
+        except Exception as e:  # Catch all exception types
+            _LOGGER.warning(f"Could not update state for sensor '{entity.name}': {e}")
+
+    @callback
+    def _async_flush(self):
+        self._handle = None
+        self._last_flush = self._hass.loop.time()
+        pending = self._pending
+        self._pending = {}
+
+        for entity in pending:
+            # Entities created from the current frame may not be added yet
+            if entity.hass is None:
+                continue
+            try:
+                entity.async_write_ha_state()
+                self.writes += 1
+            except Exception as e:  # Catch all exception types
+                _LOGGER.warning(f"Could not update state for sensor '{entity.name}': {e}")
+
+    @callback
+    def async_shutdown(self):
+        """Drop pending writes and cancel the scheduled flush."""
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self._pending = {}
@@ -0,0 +1,94 @@
+"""Per-field update rate scheduling."""
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+RATE_GROUPS = ("fast", "normal", "history")
+DEFAULT_RATE_GROUP = "normal"
+
+# A value is accepted once this share of its interval has passed, so frame
+# jitter does not make a 1 s field skip every other block.
+_JITTER_FACTOR = 0.9
+
+
+def parse_field_intervals(text):
+    """Parse ``"V=1, H17=600"`` into ``{"V": 1.0, "H17": 600.0}``.
+
+    Raises ValueError on malformed entries.
+    """
+    intervals = {}
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        label, sep, seconds = item.partition("=")
+        label = label.strip()
+        if not sep or not label:
+            raise ValueError(f"Expected LABEL=seconds, got {item!r}")
+        interval = float(seconds)
+        if interval < 0:
+            raise ValueError(f"Negative interval for {label}")
+        intervals[label] = interval
+    return intervals
+
+
+class FieldScheduler:
+    """Throttle fields individually, keyed on their exact label.
+
+    Every field has its own minimum interval, taken from a per-field
+    override or from its rate group. Time is measured with the monotonic
+    clock, so wall-clock jumps do not stall or flood updates.
+    """
+
+    __slots__ = ("_gaps", "_default_gap", "_next_due")
+
+    def __init__(self, intervals, default_interval):
+        self._gaps = {label: interval * _JITTER_FACTOR for label, interval in intervals.items()}
+        self._default_gap = default_interval * _JITTER_FACTOR
+        self._next_due = {}
+
+    @classmethod
+    def from_definitions(cls, field_table, group_intervals, field_intervals=None):
+        """Build a scheduler for a compiled field table.
+
+        ``group_intervals`` maps rate group names to seconds and
+        ``field_intervals`` maps field labels (str) to seconds. Priority
+        fields are never throttled unless given an interval of their own.
+        """
+        field_intervals = field_intervals or {}
+        default_interval = group_intervals[DEFAULT_RATE_GROUP]
+        intervals = {}
+        for raw_label, field in field_table.items():
+            if field.label in field_intervals:
+                intervals[raw_label] = field_intervals[field.label]
+            elif field.priority:
+                intervals[raw_label] = 0
+            else:
+                intervals[raw_label] = group_intervals.get(field.rate_group, default_interval)
+
+        unknown = set(field_intervals) - {field.label for field in field_table.values()}
+        if unknown:
+            _LOGGER.warning("Ignoring update intervals for unknown fields: %s", ", ".join(sorted(unknown)))
+
+        return cls(intervals, default_interval)
+
+    def filter(self, frame, now=None):
+        """Return the subset of ``frame`` whose fields are due, and mark them."""
+        if now is None:
+            now = time.monotonic()
+        gaps = self._gaps
+        default_gap = self._default_gap
+        next_due = self._next_due
+        accepted = {}
+
+        for label, value in frame.items():
+            if now >= next_due.get(label, 0.0):
+                accepted[label] = value
+                next_due[label] = now + gaps.get(label, default_gap)
+
+        return accepted
+
+    def reset(self):
+        """Make every field due again, e.g. after a reconnect."""
+        self._next_due.clear()
@@ -1,27 +1,46 @@
 # Standard Library Imports
-import asyncio
-import json
 import logging
-import os
 import serial_asyncio
-from datetime import datetime, timedelta
-from serial import SerialException
+import time
+from datetime import timedelta
 
 # Home Assistant Imports
 from homeassistant.core import callback
-from homeassistant.components.sensor import SensorEntity, SensorStateClass
-
-from homeassistant.const import (
-    CONF_NAME,
-    EVENT_HOMEASSISTANT_STOP
+from homeassistant.components.sensor import RestoreSensor, SensorDeviceClass, SensorEntity, SensorStateClass
+from homeassistant.helpers import device_registry as dr, entity_registry as er
+
+from homeassistant.const import CONF_NAME, EntityCategory
+
+from .const import (
+    CONF_AGGREGATE_INTERVAL,
+    CONF_AVAILABILITY_TIMEOUT,
+    CONF_BAUDRATE,
+    CONF_FAST_INTERVAL,
+    CONF_FIELD_INTERVALS,
+    CONF_FRAME_EVENT_INTERVAL,
+    CONF_HEARTBEAT_INTERVAL,
+    CONF_HISTORY_INTERVAL,
+    CONF_MAX_PUBLISH_RATE,
+    CONF_NORMAL_INTERVAL,
+    CONF_READER_THREAD,
+    CONF_SERIAL_PORT,
+    CONF_STATISTICS,
+    CONF_STATISTICS_ONLY_FAST,
+    DEFAULT_AGGREGATE_INTERVAL,
+    DEFAULT_AVAILABILITY_TIMEOUT,
+    DEFAULT_FAST_INTERVAL,
+    DEFAULT_FRAME_EVENT_INTERVAL,
+    DEFAULT_HEARTBEAT_INTERVAL,
+    DEFAULT_HISTORY_INTERVAL,
+    DEFAULT_MAX_PUBLISH_RATE,
+    DEFAULT_NORMAL_INTERVAL,
+    DOMAIN,
 )
-
-CONF_BAUDRATE = "baudrate"
-CONF_SERIAL_PORT = "serial_port"
-
+from .hub import VictronPort, async_get_hub
+from .publisher import StatePublisher
+from .scheduler import FieldScheduler, parse_field_intervals
 
 DEFAULT_NAME = "Victron VE.Direct Serial Sensor"
-DEFAULT_BAUDRATE = 19200
 DEFAULT_BYTESIZE = serial_asyncio.serial.EIGHTBITS
 DEFAULT_PARITY = serial_asyncio.serial.PARITY_NONE
 DEFAULT_STOPBITS = serial_asyncio.serial.STOPBITS_ONE
@@ -33,236 +52,393 @@ DEFAULT_DSRDTR = False
 
 _LOGGER = logging.getLogger(__name__)
 
+# Only the (disabled by default) port statistics sensors poll
+SCAN_INTERVAL = timedelta(seconds=30)
+
+# (snapshot key, name, unit, state class) of the port statistics sensors
+PORT_STATS_SENSORS = (
+    ("bytes_per_s", "Bytes per second", "B/s", SensorStateClass.MEASUREMENT),
+    ("frames_per_s", "Frames per second", "frames/s", SensorStateClass.MEASUREMENT),
+    ("state_writes_per_s", "State writes per second", "writes/s", SensorStateClass.MEASUREMENT),
+    ("checksum_errors", "Checksum errors", None, SensorStateClass.TOTAL_INCREASING),
+    ("malformed", "Malformed lines", None, SensorStateClass.TOTAL_INCREASING),
+    ("decode_errors", "Decode errors", None, SensorStateClass.TOTAL_INCREASING),
+    ("throttled_fields", "Throttled fields", None, SensorStateClass.TOTAL_INCREASING),
+    ("reconnects", "Reconnects", None, SensorStateClass.TOTAL_INCREASING),
+    ("seconds_since_last_frame", "Time since last frame", "s", SensorStateClass.MEASUREMENT),
+)
+
+
+# Options that change which sensors and aggregators exist; changing them reloads the entry
+RELOAD_OPTIONS = (CONF_AGGREGATE_INTERVAL, CONF_STATISTICS, CONF_STATISTICS_ONLY_FAST)
 
-async def update_sensor_availability(hass,instance_name):
-    """Update the availability of all sensors every 5 minutes."""
-    
-    created_sensors_key = f"{instance_name}_created_sensors"
 
-    while True:
-        _LOGGER.debug("Running update_sensor_availability")
-        await asyncio.sleep(300)  # wait for 5 minutes
+def entry_settings(entry):
+    """Return an entry's settings: its data, overridden by the options flow's options."""
+    return {**entry.data, **entry.options}
 
-        for sensor in hass.data[created_sensors_key].values():
-            sensor.update_availability()
 
-def load_smart_data(json_path):
-    with open(json_path, "r") as file:
-        return json.load(file)
+def _serial_options(data):
+    return {
+        "baudrate": data[CONF_BAUDRATE],
+        "bytesize": DEFAULT_BYTESIZE,
+        "parity": DEFAULT_PARITY,
+        "stopbits": DEFAULT_STOPBITS,
+        "xonxoff": DEFAULT_XONXOFF,
+        "rtscts": DEFAULT_RTSCTS,
+        "dsrdtr": DEFAULT_DSRDTR,
+    }
+
+
+def _build_scheduler(registry, data):
+    group_intervals = {
+        "fast": data.get(CONF_FAST_INTERVAL, DEFAULT_FAST_INTERVAL),
+        "normal": data.get(CONF_NORMAL_INTERVAL, DEFAULT_NORMAL_INTERVAL),
+        "history": data.get(CONF_HISTORY_INTERVAL, DEFAULT_HISTORY_INTERVAL),
+    }
+    try:
+        field_intervals = parse_field_intervals(data.get(CONF_FIELD_INTERVALS, ""))
+    except ValueError as e:
+        _LOGGER.error(f"Ignoring invalid field update intervals: {e}")
+        field_intervals = {}
+
+    return FieldScheduler.from_definitions(registry.fallback, group_intervals, field_intervals)
+
+
+@callback
+def async_apply_options(port, data):
+    """Apply changed options to a running port, without recreating its sensors.
+
+    The transport is only replaced when the port, baud rate or reader
+    changed; devices, sensors and their states are kept throughout.
+    """
+    port.async_set_connection(data[CONF_SERIAL_PORT], _serial_options(data), data.get(CONF_READER_THREAD, False))
+    port.scheduler = _build_scheduler(port.registry, data)
+    port.publisher.async_set_limits(
+        data.get(CONF_MAX_PUBLISH_RATE, DEFAULT_MAX_PUBLISH_RATE),
+        data.get(CONF_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_INTERVAL),
+    )
+    port.async_set_availability_timeout(data.get(CONF_AVAILABILITY_TIMEOUT, DEFAULT_AVAILABILITY_TIMEOUT))
+    port.frames.async_set_event_interval(data.get(CONF_FRAME_EVENT_INTERVAL, DEFAULT_FRAME_EVENT_INTERVAL))
+    port.options = data
 
 
 # The main setup function to initialize the sensor platform
 
 async def async_setup_entry(hass, entry, async_add_entities):
     # Retrieve configuration from entry
-    name = entry.data[CONF_NAME]
-    serial_port = entry.data[CONF_SERIAL_PORT]
-    baudrate = entry.data[CONF_BAUDRATE]
-    
-    bytesize = DEFAULT_BYTESIZE
-    parity = DEFAULT_PARITY
-    stopbits = DEFAULT_STOPBITS
-    xonxoff = DEFAULT_XONXOFF
-    rtscts = DEFAULT_RTSCTS
-    dsrdtr = DEFAULT_DSRDTR
+    data = entry_settings(entry)
+    name = data[CONF_NAME]
+    serial_port = data[CONF_SERIAL_PORT]
+    baudrate = data[CONF_BAUDRATE]
+    max_publish_rate = data.get(CONF_MAX_PUBLISH_RATE, DEFAULT_MAX_PUBLISH_RATE)
+    heartbeat_interval = data.get(CONF_HEARTBEAT_INTERVAL, DEFAULT_HEARTBEAT_INTERVAL)
+    availability_timeout = data.get(CONF_AVAILABILITY_TIMEOUT, DEFAULT_AVAILABILITY_TIMEOUT)
+    aggregate_interval = data.get(CONF_AGGREGATE_INTERVAL, DEFAULT_AGGREGATE_INTERVAL)
+    reader_thread = data.get(CONF_READER_THREAD, False)
+    statistics = data.get(CONF_STATISTICS, False)
+    statistics_only_fast = data.get(CONF_STATISTICS_ONLY_FAST, False)
+
+    serial_options = _serial_options(data)
 
     # Log the retrieved configuration values for debugging purposes
     _LOGGER.info(f"Configuring sensor with name: {name}, serial_port: {serial_port}, baudrate: {baudrate}")
-    
-    # Initialize unique dictionary keys based on the integration name
-    add_entities_key = f"{name}_add_entities"
-    created_sensors_key = f"{name}_created_sensors"
-    victronusb_data_key = f"{name}_victronusb_data"
-    gps_key = f"{name}_gps"
 
-     # Save a reference to the add_entities callback
-    _LOGGER.debug(f"Assigning async_add_entities to hass.data[{add_entities_key}].")
-    hass.data[add_entities_key] = async_add_entities
+    hub = async_get_hub(hass)
 
+    try:
+        # Compiled once per process and shared by all entries
+        registry = await hub.async_get_registry()
+    except Exception as e:
+        _LOGGER.error(f"Error loading Victronusb.json: {e}")
+        return
 
-    # Initialize a dictionary to store references to the created sensors
-    hass.data[created_sensors_key] = {}
-    hass.data[gps_key] = {}
+    scheduler = _build_scheduler(registry, data)
 
+    # All sensor state writes of this entry go through one batched publisher
+    publisher = StatePublisher(hass, max_publish_rate, heartbeat_interval)
+    entry.async_on_unload(publisher.async_shutdown)
 
-    # Load the VictronUSB json data
-    config_dir = hass.config.config_dir
-    json_path = os.path.join(config_dir, 'custom_components', 'victronusb', 'Victronusb.json')
-    try:
-        smart_data = await hass.async_add_executor_job(load_smart_data, json_path)
-        
-        result_dict = {}
-        for sentence in smart_data:
-            group = sentence["group"]  # Capture the group for all fields within this sentence
-            for field in sentence["fields"]:
-                result_dict[field["unique_id"]] = {
-                    "full_description": field["full_description"],
-                    "group": group,
-                    "unit_of_measurement": field.get("unit_of_measurement", None)
-                }
+    port = VictronPort(
+        hub,
+        entry.entry_id,
+        name,
+        serial_port,
+        serial_options,
+        registry,
+        scheduler,
+        publisher,
+        availability_timeout,
+        aggregate_interval,
+        reader_thread,
+        statistics,
+        statistics_only_fast,
+    )
+    port.frame_handler = set_smart_sensors
+    port.aggregate_handler = set_aggregate_sensors
+    port.add_entities = async_add_entities
+    port.frames.async_set_event_interval(data.get(CONF_FRAME_EVENT_INTERVAL, DEFAULT_FRAME_EVENT_INTERVAL))
+    port.options = data
+
+    async_add_entities(
+        [SerialSensor(name, port)]
+        + [PortStatsSensor(port, *description) for description in PORT_STATS_SENSORS],
+        True,
+    )
 
+    # Bring back the sensors of earlier runs in one go, before the devices report
+    await async_migrate_unique_ids(hass, entry)
+    restored_sensors = restore_sensors(hass, entry, port)
+    if restored_sensors:
+        _LOGGER.debug("Restoring %d sensors of %s", len(restored_sensors), name)
+        async_add_entities(restored_sensors)
 
+    hub.async_add_port(port)
+    entry.async_on_unload(lambda: hub.async_remove_port(entry.entry_id))
 
-        hass.data[victronusb_data_key] = result_dict
 
-    except Exception as e:
-        _LOGGER.error(f"Error loading Victronusb.json: {e}")
-        return
+@callback
+def set_smart_sensors(port, device, frame):
+    """Commit the fields of one validated VE.Direct block to a device's sensors.
 
-    _LOGGER.debug(f"Loaded victron data: {hass.data[victronusb_data_key]}")
+    ``frame`` maps raw label bytes to raw value bytes; only fields defined
+    for the device's product are decoded. Derived fields are recomputed
+    when one of their inputs changed. Sensors for labels seen for the first
+    time are added to Home Assistant together, in one call per frame,
+    except for fields the port keeps in long-term statistics only.
+    """
+    new_sensors = []
+    try:
+        field_table = device.field_table
+        created_sensors = device.sensors
+        derived = device.derived
+        derived_inputs = derived.inputs
+        statistics_only = port.statistics_only
+        values = device.values
+        changed = set()
 
+        for field_label, field_data in frame.items():
+            field = field_table.get(field_label)
 
+            # Skip labels we have no definition for
+            if field is None:
+                continue
 
-    sensor = SerialSensor(
-        name,
-        serial_port,
-        baudrate,
-        bytesize,
-        parity,
-        stopbits,
-        xonxoff,
-        rtscts,
-        dsrdtr,
-    )
-    
-    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, sensor.stop_serial_read)
-    async_add_entities([sensor], True)
-
-    # Start the task that updates the sensor availability every 5 minutes
-    hass.loop.create_task(update_sensor_availability(hass,name))
-
-
-def translate_unit(unit_of_measurement):
-    
-    if unit_of_measurement is None:
-        return None
-    
-    unit_of_measurement = unit_of_measurement.upper()
-
-    translation = {
-        'mV': 'mV',
-        'P': '%',
-        'W': 'W',
-        'mA': 'mA',
-        'Dc': '°C',
-        'mAh': 'mAh',
-        'MIN': 'minutes',
-        'SEC': 'seconds',
-        'ckWh': '0.01 kWh'
-    }
-    
-    return translation.get(unit_of_measurement, unit_of_measurement)
+            try:
+                value = field.decode(field_data)
+            except ValueError:
+                port.stats.decode_errors += 1
+                _LOGGER.debug("Could not decode %s value %r", field.label, field_data)
+                continue
+
+            if field_label in derived_inputs and values.get(field_label) != value:
+                values[field_label] = value
+                changed.add(field_label)
+
+            sensor = created_sensors.get(field_label)
+            if sensor is not None:
+                sensor.set_state(value)
+                continue
+
+            if field_label in statistics_only:
+                continue
+
+            new_sensors.append(_create_sensor(port, device, field_label, field, value))
+
+        if changed:
+            for field_label, value in derived.update(values, changed).items():
+                sensor = created_sensors.get(field_label)
+                if sensor is not None:
+                    sensor.set_state(value)
+                elif value is not None:
+                    new_sensors.append(_create_sensor(port, device, field_label, derived.fields[field_label], value))
+
+    except Exception as e:
+        _LOGGER.error(f"An unexpected error occurred: {e}")
 
+    if new_sensors:
+        # Add Sensors to Home Assistant
+        port.add_entities(new_sensors)
 
 
-async def set_smart_sensors(hass, line, instance_name):
-    """Process the content of the line related to the smart sensors."""
+@callback
+def set_aggregate_sensors(port, device, values):
+    """Publish the aggregates of one interval to a device's aggregate sensors.
+
+    ``values`` maps raw aggregate labels to already computed values.
+    """
+    new_sensors = []
     try:
-        if not line:
-            return
+        aggregate_table = port.aggregate_table
+        created_sensors = device.sensors
 
-        # Make the checksum a seperate field instead of joined to the last field
-        # if '*' in line[-3:]:
-        #     line = line[:-3] + line[-3:].replace('*', ',')
-            
-        # Splitting by comma and getting the data fields
-        fields = line.split('\t')
-        if len(fields) != 2:  # Ensure enough fields and length
-            _LOGGER.error(f"Malformed line: {line}")
-            return
+        for label, value in values.items():
+            sensor = created_sensors.get(label)
+            if sensor is not None:
+                sensor.set_state(value)
+            else:
+                new_sensors.append(_create_sensor(port, device, label, aggregate_table[label], value))
 
-        field_label = fields[0]  # Gets the Field label
+    except Exception as e:
+        _LOGGER.error(f"An unexpected error occurred: {e}")
 
-        _LOGGER.debug(f"Sentence_id: {field_label}")
-        
-        # Dynamically construct the keys based on the instance name
-        victronusb_data_key = f"{instance_name}_victronusb_data"
-        created_sensors_key = f"{instance_name}_created_sensors"
-        add_entities_key = f"{instance_name}_add_entities"
+    if new_sensors:
+        port.add_entities(new_sensors)
 
-        field_data = fields[1]
-        sentence_type = field_label
-        sensor_name = f"{sentence_type}"
 
-        if sensor_name not in hass.data[created_sensors_key]:
-            _LOGGER.debug(f"Creating field sensor: {sensor_name}")
+def _create_sensor(port, device, label, field, value):
+    _LOGGER.debug("Creating field sensor: %s for %s", field.label, device.key)
 
-            short_sensor_name = f"{field_label}"
-            sensor_info = hass.data[victronusb_data_key].get(short_sensor_name)
+    sensor = SmartSensor(device, field, value, port.publisher)
+    _adopt_legacy_entity(port.hub.hass, port.entry_id, field, sensor.unique_id)
 
-            # If sensor_info does not exist, skip this loop iteration
-            if sensor_info is None:
-                _LOGGER.debug(f"Skipping creation/update for undefined sensor: {sensor_name}")
-                return
+    # Update dictionary with added sensor
+    device.sensors[label] = sensor
+    return sensor
 
-            full_desc = sensor_info["full_description"] if sensor_info else sensor_name
-            group = sensor_info["group"]
-            unit_of_measurement = sensor_info.get("unit_of_measurement")
-            device_name = full_desc
-            unit = unit_of_measurement
 
-            sensor = SmartSensor(
-                sensor_name,
-                full_desc,
-                field_data,
-                group,
-                unit,
-                device_name,
-                sentence_type
-            )
+@callback
+def _adopt_legacy_entity(hass, entry_id, field, unique_id):
+    """Give a sensor registered under its bare label the device-scoped unique ID.
 
-            # Add Sensor to Home Assistant
-            hass.data[add_entities_key]([sensor])
+    Releases before devices were identified keyed sensors by the label
+    alone. Which device such a sensor belongs to is only known once one
+    reports the label, so the first sensor created for it takes over the
+    registry entry, keeping its entity ID and history.
+    """
+    entity_registry = er.async_get(hass)
+    entity_id = entity_registry.async_get_entity_id("sensor", DOMAIN, field.label.lower().replace(" ", "_"))
+    if entity_id is None or entity_registry.async_get_entity_id("sensor", DOMAIN, unique_id) is not None:
+        return
+    if entity_registry.async_get(entity_id).config_entry_id != entry_id:
+        return
+    _LOGGER.info("Migrating %s to unique ID %s", entity_id, unique_id)
+    entity_registry.async_update_entity(entity_id, new_unique_id=unique_id)
 
-            # Update dictionary with added sensor
-            hass.data[created_sensors_key][sensor_name] = sensor
 
-        else:
-            _LOGGER.debug(f"Updating field sensor: {sensor_name}")
-            sensor = hass.data[created_sensors_key][sensor_name]
-            sensor.set_state(field_data)
+async def async_migrate_unique_ids(hass, entry):
+    """Scope the unique IDs of sensors keyed by a device's SER# to the entry.
 
+    These were ``<SER#>_<label>``, which collides when the same device is
+    reachable through two entries. Devices keyed by PID already had the
+    entry ID in front and keep their IDs.
+    """
+    device_registry = dr.async_get(hass)
+    entry_prefix = f"{entry.entry_id}_".lower()
 
-    except IndexError:
-        _LOGGER.error(f"Index error for line: {line}")
-    except KeyError as e:
-        _LOGGER.error(f"Key error: {e}")
-    except Exception as e:
-        _LOGGER.error(f"An unexpected error occurred: {e}")
+    @callback
+    def migrate(entity_entry):
+        if entity_entry.unique_id.startswith(entry_prefix) or entity_entry.device_id is None:
+            return None
+        device_entry = device_registry.async_get(entity_entry.device_id)
+        if device_entry is None:
+            return None
+        key = next((identifier for domain, identifier in device_entry.identifiers if domain == DOMAIN), None)
+        if key is None or not entity_entry.unique_id.startswith(f"{key}_".lower().replace(" ", "_")):
+            return None
+        new_unique_id = entry_prefix + entity_entry.unique_id
+        _LOGGER.info("Migrating %s to unique ID %s", entity_entry.entity_id, new_unique_id)
+        return {"new_unique_id": new_unique_id}
+
+    await er.async_migrate_entries(hass, entry.entry_id, migrate)
+
+
+def restore_sensors(hass, entry, port):
+    """Recreate the devices and sensors registered for an entry in earlier runs.
+
+    Devices are found in the device registry by their identifier, and
+    their sensors by the field label at the end of the unique ID. The
+    sensors start without a value and restore their last one when added.
+    Sensors of fields the port now keeps in statistics only are removed
+    from the entity registry instead.
+    """
+    device_registry = dr.async_get(hass)
+    entity_registry = er.async_get(hass)
+    sensors = []
+
+    for device_entry in dr.async_entries_for_config_entry(device_registry, entry.entry_id):
+        key = next((identifier for domain, identifier in device_entry.identifiers if domain == DOMAIN), None)
+        # The port's own device has no model PID and no field sensors
+        if key is None or key == f"{entry.entry_id}_port" or not device_entry.model:
+            continue
+
+        serial = device_entry.serial_number
+        device = port.async_restore_device(
+            key, device_entry.model.encode("ascii"), serial.encode("ascii") if serial else None
+        )
+        prefix = device.sensor_unique_id("")
+        labels = {}
+        for table in (device.field_table, device.derived.fields, port.aggregate_table):
+            for raw_label, field in table.items():
+                labels[field.label.lower().replace(" ", "_")] = (raw_label, field)
+
+        for entity_entry in er.async_entries_for_device(entity_registry, device_entry.id):
+            if entity_entry.platform != DOMAIN or not entity_entry.unique_id.startswith(prefix):
+                continue
+            known = labels.get(entity_entry.unique_id[len(prefix):])
+            if known is None:
+                continue
+            raw_label, field = known
+            if raw_label in port.statistics_only:
+                _LOGGER.debug("Removing %s, kept in statistics only", entity_entry.entity_id)
+                entity_registry.async_remove(entity_entry.entity_id)
+            elif raw_label not in device.sensors:
+                sensors.append(_create_sensor(port, device, raw_label, field, None))
+
+    return sensors
 
 
 # SmartSensor class representing a basic sensor entity with state
 
-class SmartSensor(SensorEntity):
+class SmartSensor(RestoreSensor):
+    _attr_has_entity_name = True
+
     def __init__(
         self, 
-        name, 
-        friendly_name, 
+        device, 
+        field, 
         initial_state, 
-        group=None, 
-        unit_of_measurement=None, 
-        device_name=None, 
-        sentence_type=None
+        publisher=None
     ):
         """Initialize the sensor."""
-        _LOGGER.info(f"Initializing sensor: {name} with state: {initial_state}")
+        _LOGGER.info(f"Initializing sensor: {field.label} of {device.key} with state: {initial_state}")
 
-        self._unique_id = name.lower().replace(" ", "_")
-        self.entity_id = f"sensor.{self._unique_id}"
-        self._name = friendly_name if friendly_name else self._unique_id
+        # Namespaced per entry and device, so the same label on two devices never collides
+        self._unique_id = device.sensor_unique_id(field.label)
+        self._name = field.name if field.name else field.label
         self._state = initial_state
-        self._group = group if group is not None else "Other"
-        self._device_name = device_name
-        self._sentence_type = sentence_type
-        self._unit_of_measurement = unit_of_measurement
-        self._state_class = SensorStateClass.MEASUREMENT
-        self._last_updated = datetime.now()
+        self._device = device
+        self._sentence_type = field.label
+        self._publisher = publisher
+        self._deadband = field.deadband
+        self._deadband_percent = field.deadband_percent
+        self._priority = field.priority
+        self._last_published = time.monotonic()
+        self._unit_of_measurement = field.unit
+        self._device_class = SensorDeviceClass(field.device_class) if field.device_class else None
+        self._state_class = SensorStateClass(field.state_class) if field.state_class else None
+        self._options = field.options
+        self._suggested_display_precision = field.precision
         if initial_state is None or initial_state == "":
             self._available = False
             _LOGGER.debug(f"Setting sensor: '{self._name}' with unavailable")
         else:
             self._available = True
 
+    async def async_added_to_hass(self) -> None:
+        """Show the last known value until the device reports a new one."""
+        await super().async_added_to_hass()
+        if self._state is not None:
+            return
+        last_data = await self.async_get_last_sensor_data()
+        if last_data is None or last_data.native_value is None:
+            return
+        # Skip values stored before a field was decoded into named states
+        if self._options is not None and last_data.native_value not in self._options:
+            return
+        self._state = last_data.native_value
+        self._available = True
+
     @property
     def name(self):
         """Return the name of the sensor."""
@@ -273,23 +449,40 @@ class SmartSensor(SensorEntity):
         return self._unique_id
 
     @property
-    def state(self):
+    def native_value(self):
         """Return the state of the sensor."""
         return self._state
 
     @property
-    def unit_of_measurement(self):
+    def native_unit_of_measurement(self):
         """Return the unit of measurement."""
         return self._unit_of_measurement
 
+    @property
+    def device_class(self):
+        """Return the device class of the sensor."""
+        return self._device_class
+
+    @property
+    def options(self):
+        """Return the possible states of an enum sensor."""
+        return self._options
+
+    @property
+    def suggested_display_precision(self):
+        """Return the number of decimals to display."""
+        return self._suggested_display_precision
+
     @property
     def device_info(self):
         """Return device information about this sensor."""
+        device = self._device
         return {
-            "identifiers": {("victronusb", self._device_name)},
-            "name": self._device_name,
-            "manufacturer": self._group,
-            "model": self._sentence_type,
+            "identifiers": {(DOMAIN, device.key)},
+            "name": device.name,
+            "manufacturer": "Victron Energy",
+            "model": device.pid.decode("ascii", "replace"),
+            "serial_number": device.serial.decode("ascii", "replace") if device.serial else None,
         }
 
     @property
@@ -298,11 +491,6 @@ class SmartSensor(SensorEntity):
         return self._state_class
 
 
-    @property
-    def last_updated(self):
-        """Return the last updated timestamp of the sensor."""
-        return self._last_updated
-
     @property
     def available(self) -> bool:
         """Return True if the entity is available."""
@@ -315,198 +503,139 @@ class SmartSensor(SensorEntity):
 
 
 
-    def update_availability(self):
-        """Update the availability status of the sensor."""
-
-        new_availability = (datetime.now() - self._last_updated) < timedelta(minutes=4)
-
-        self._available = new_availability
-
-        try:
-            self.async_schedule_update_ha_state()
-        except RuntimeError as re:
-            if "Attribute hass is None" in str(re):
-                pass  # Ignore this specific error
-            else:
-                _LOGGER.warning(f"Could not update state for sensor '{self._name}': {re}")
-        except Exception as e:  # Catch all other exception types
-            _LOGGER.warning(f"Could not update state for sensor '{self._name}': {e}")
+    def set_available(self, available):
+        """Follow the availability of the device; only changes are written."""
+        if available == self._available or (available and self._state is None):
+            return
+        self._available = available
+        self._publisher.async_mark(self)
+
+    def _value_changed(self, new_state):
+        """Return True if new_state differs from the published state by more than the deadband."""
+        if new_state == self._state:
+            return False
+        if not self._deadband and not self._deadband_percent:
+            return True
+
+        old_value = self._state
+        new_value = new_state
+        if not isinstance(old_value, (int, float)) or not isinstance(new_value, (int, float)):
+            return True
+
+        threshold = max(
+            self._deadband or 0,
+            abs(old_value) * (self._deadband_percent or 0) / 100,
+        )
+        return abs(new_value - old_value) >= threshold
 
     def set_state(self, new_state):
-        """Set the state of the sensor."""
-        _LOGGER.debug(f"Setting state for sensor: '{self._name}' to {new_state}")
+        """Set the state of the sensor, publishing only changes and heartbeats."""
+        available = not (new_state is None or new_state == "")
+
+        now = time.monotonic()
+        if (
+            available == self._available
+            and not self._value_changed(new_state)
+            and now - self._last_published < self._publisher.heartbeat_interval
+        ):
+            return
+
         self._state = new_state
-        if new_state is None or new_state == "":
-            self._available = False
-            _LOGGER.debug(f"Setting sensor:'{self._name}' with unavailable")
+        self._available = available
+        if not available:
+            _LOGGER.debug("Setting sensor: '%s' with unavailable", self._name)
+        self._last_published = now
+        if self._priority:
+            # Alarms and state changes do not wait for the next flush
+            self._publisher.async_write_now(self)
         else:
-            self._available = True
-        self._last_updated = datetime.now()
-
-        try:
-            self.async_schedule_update_ha_state()
-        except RuntimeError as re:
-            if "Attribute hass is None" in str(re):
-                pass  # Ignore this specific error
-            else:
-                _LOGGER.warning(f"Could not update state for sensor '{self._name}': {re}")
-        except Exception as e:  # Catch all other exception types
-            _LOGGER.warning(f"Could not update state for sensor '{self._name}': {e}")
+            self._publisher.async_mark(self)
 
 
 
-# SerialSensor class representing a sensor entity interacting with a serial device
+# SerialSensor class representing the connection state of one serial port
 
 class SerialSensor(SensorEntity):
     """Representation of a Serial sensor."""
 
     _attr_should_poll = False
 
-    def __init__(
-        self,
-        name,
-        port,
-        baudrate,
-        bytesize,
-        parity,
-        stopbits,
-        xonxoff,
-        rtscts,
-        dsrdtr,
-    ):
+    def __init__(self, name, port):
         """Initialize the Serial sensor."""
         self._name = name
-        self._state = None
         self._port = port
-        self._baudrate = baudrate
-        self._bytesize = bytesize
-        self._parity = parity
-        self._stopbits = stopbits
-        self._xonxoff = xonxoff
-        self._rtscts = rtscts
-        self._dsrdtr = dsrdtr
-        self._serial_loop_task = None
-        self._attributes = None
 
     async def async_added_to_hass(self) -> None:
-        """Handle when an entity is about to be added to Home Assistant."""
-        self._serial_loop_task = self.hass.loop.create_task(
-            self.serial_read(
-                self._port,
-                self._baudrate,
-                self._bytesize,
-                self._parity,
-                self._stopbits,
-                self._xonxoff,
-                self._rtscts,
-                self._dsrdtr,
-            )
-        )
-
+        """Follow connection changes of the port."""
+        self._port.status_listener = self.async_write_ha_state
 
+    async def async_will_remove_from_hass(self) -> None:
+        """Stop following the port."""
+        self._port.status_listener = None
 
+    @property
+    def name(self):
+        """Return the name of the sensor."""
+        return self._name
 
+    @property
+    def unique_id(self):
+        """Return a unique ID."""
+        return f"{self._port.entry_id}_serial"
 
+    @property
+    def device_info(self):
+        """Return the port as a device, which also holds the statistics sensors."""
+        return port_device_info(self._port)
 
-    async def serial_read(
-        self,
-        device,
-        baudrate,
-        bytesize,
-        parity,
-        stopbits,
-        xonxoff,
-        rtscts,
-        dsrdtr,
-        **kwargs,
-    ):
-        
-        
-        last_processed = {}  # Dictionary to store last processed timestamp for each sentence type
-        min_interval = timedelta(seconds=5)  # Minimum time interval between processing each sentence type
-
-        """Read the data from the port."""
-        logged_error = False
-        while True:
-            try:
-                reader, _ = await serial_asyncio.open_serial_connection(
-                    url=device,
-                    baudrate=baudrate,
-                    bytesize=bytesize,
-                    parity=parity,
-                    stopbits=stopbits,
-                    xonxoff=xonxoff,
-                    rtscts=rtscts,
-                    dsrdtr=dsrdtr,
-                    **kwargs,
-                )
-
-            except SerialException as exc:
-                if not logged_error:
-                    _LOGGER.exception(
-                        "Unable to connect to the serial device %s: %s. Will retry",
-                        device,
-                        exc,
-                    )
-                    logged_error = True
-                await self._handle_error()
-            else:
-                _LOGGER.info("Serial device %s connected", device)
-
-
-                while True:
-                    try:
-                        line = await reader.readline()
-                    except SerialException as exc:
-                        _LOGGER.exception("Error while reading serial device %s: %s", device, exc)
-                        await self._handle_error()
-                        break
-                    else:
-                        try:
-                            line = line.decode("utf-8").strip()
-                        except UnicodeDecodeError as exc:
-                            _LOGGER.error("Failed to decode line from UTF-8: %s", exc)
-                            continue
-
-                        sentence_type = line[:6]  
-                        
-                        now = datetime.now()
-                        
-                        if sentence_type not in last_processed or now - last_processed[sentence_type] >= min_interval:
-                            _LOGGER.debug(f"Processing: {line}")
-                            await set_smart_sensors(self.hass, line, self.name)
-                            last_processed[sentence_type] = now
-                        else:
-                            _LOGGER.debug(f"Skipping {sentence_type} due to throttling")
+    @property
+    def extra_state_attributes(self):
+        """Return the port and the device currently attached to it."""
+        device = self._port.device
+        return {
+            "port": self._port.url,
+            "device": device.key if device else None,
+        }
 
+    @property
+    def native_value(self):
+        """Return the state of the sensor."""
+        return "connected" if self._port.connected else None
 
 
+def port_device_info(port):
+    """Return the device info shared by the entities describing a port."""
+    return {
+        "identifiers": {(DOMAIN, f"{port.entry_id}_port")},
+        "name": port.name,
+        "manufacturer": "Victron Energy",
+        "model": "VE.Direct port",
+    }
 
 
-    async def _handle_error(self):
-        """Handle error for serial connection."""
-        self._state = None
-        self._attributes = None
-        self.async_write_ha_state()
-        await asyncio.sleep(5)
+# PortStatsSensor class exposing one of the port's runtime counters
 
-    @callback
-    def stop_serial_read(self, event):
-        """Close resources."""
-        if self._serial_loop_task:
-            self._serial_loop_task.cancel()
+class PortStatsSensor(SensorEntity):
+    """A diagnostic sensor reading one value of the port's statistics.
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return self._name
+    These poll the counters every SCAN_INTERVAL instead of being pushed
+    from the frame path, and are disabled by default.
+    """
 
-    @property
-    def extra_state_attributes(self):
-        """Return the attributes of the entity (if any JSON present)."""
-        return self._attributes
+    _attr_has_entity_name = True
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+    _attr_entity_registry_enabled_default = False
 
-    @property
-    def native_value(self):
-        """Return the state of the sensor."""
-        return self._state
+    def __init__(self, port, key, name, unit, state_class):
+        """Initialize the statistics sensor."""
+        self._port = port
+        self._key = key
+        self._attr_name = name
+        self._attr_unique_id = f"{port.entry_id}_stats_{key}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_state_class = state_class
+        self._attr_device_info = port_device_info(port)
+
+    async def async_update(self):
+        """Read the current value from the port's counters."""
+        self._attr_native_value = self._port.stats.snapshot()[self._key]
@@ -0,0 +1,134 @@
+"""Named VE.Direct state codes and alarm/off reason bits."""
+
+
+def _parse_number(value):
+    """Parse a decimal or ``0x`` prefixed hexadecimal raw value."""
+    if value[:2] in (b"0x", b"0X"):
+        return int(value[2:], 16)
+    return int(value)
+
+
+class CodeTable:
+    """A field whose value is one of a set of codes, such as ``CS``.
+
+    Decodes to the code's name; codes missing from the table decode to
+    ``UNKNOWN``, so the value always is one of ``options``.
+    """
+
+    UNKNOWN = "Unknown"
+
+    __slots__ = ("codes", "options")
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.options = list(codes.values()) + [self.UNKNOWN]
+
+    def decode(self, value):
+        return self.codes.get(_parse_number(value), self.UNKNOWN)
+
+
+class FlagTable:
+    """A bitmask field such as ``AR`` or ``OR``.
+
+    Decodes to the names of the set bits, joined by commas, or ``NONE``.
+    ``mask`` and ``names`` give the individual flags, e.g. for events.
+    """
+
+    NONE = "None"
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits):
+        self.bits = bits
+
+    def mask(self, value):
+        return _parse_number(value)
+
+    def names(self, mask):
+        return [name for bit, name in self.bits.items() if mask & bit]
+
+    def decode(self, value):
+        return ", ".join(self.names(self.mask(value))) or self.NONE
+
+
+ALARM_REASONS = FlagTable(
+    {
+        0x0001: "Low voltage",
+        0x0002: "High voltage",
+        0x0004: "Low SOC",
+        0x0008: "Low starter voltage",
+        0x0010: "High starter voltage",
+        0x0020: "Low temperature",
+        0x0040: "High temperature",
+        0x0080: "Mid voltage",
+        0x0100: "Overload",
+        0x0200: "DC ripple",
+        0x0400: "Low AC out voltage",
+        0x0800: "High AC out voltage",
+        0x1000: "Short circuit",
+        0x2000: "BMS lockout",
+    }
+)
+
+OFF_REASONS = FlagTable(
+    {
+        0x0001: "No input power",
+        0x0002: "Switched off (power switch)",
+        0x0004: "Switched off (device mode register)",
+        0x0008: "Remote input",
+        0x0010: "Protection active",
+        0x0020: "Pay-as-you-go",
+        0x0040: "BMS",
+        0x0080: "Engine shutdown detection",
+        0x0100: "Analysing input voltage",
+    }
+)
+
+DEVICE_STATES = CodeTable(
+    {
+        0: "Off",
+        1: "Low power",
+        2: "Fault",
+        3: "Bulk",
+        4: "Absorption",
+        5: "Float",
+        6: "Storage",
+        7: "Equalize (manual)",
+        9: "Inverting",
+        11: "Power supply",
+        245: "Starting-up",
+        246: "Repeated absorption",
+        247: "Auto equalize",
+        248: "BatterySafe",
+        252: "External control",
+    }
+)
+
+ERROR_CODES = CodeTable(
+    {
+        0: "No error",
+        2: "Battery voltage too high",
+        17: "Charger temperature too high",
+        18: "Charger over current",
+        19: "Charger current reversed",
+        20: "Bulk time limit exceeded",
+        21: "Current sensor issue",
+        26: "Terminals overheated",
+        28: "Converter issue",
+        33: "Input voltage too high",
+        34: "Input current too high",
+        38: "Input shutdown (battery voltage)",
+        39: "Input shutdown (current flow during off mode)",
+        65: "Lost communication with one of the devices",
+        66: "Synchronised charging configuration issue",
+        67: "BMS connection lost",
+        68: "Network misconfigured",
+        116: "Factory calibration data lost",
+        117: "Invalid or incompatible firmware",
+        119: "User settings invalid",
+    }
+)
+
+# Referenced by name from the "states" and "flags" keys of Victronusb.json
+STATE_TABLES = {"device_state": DEVICE_STATES, "error": ERROR_CODES}
+FLAG_TABLES = {"alarm_reason": ALARM_REASONS, "off_reason": OFF_REASONS}
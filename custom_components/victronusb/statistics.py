@@ -0,0 +1,101 @@
+"""Hourly long-term statistics imported straight into the recorder."""
+import logging
+from datetime import timedelta
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
+from homeassistant.core import callback
+from homeassistant.helpers.event import async_track_utc_time_change
+from homeassistant.util import dt as dt_util, slugify
+
+from .aggregation import TOTALS
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def statistic_id(device, label):
+    """Return the external statistic id for a device's field, e.g. ``victronusb:hq2132_v``."""
+    return f"{DOMAIN}:{slugify(f'{device.key}_{label}')}"
+
+
+class StatisticsImporter:
+    """Write hourly min/max/mean and charge/energy sums of a port's devices as external statistics.
+
+    Values come from the devices' aggregators, which see every frame, so
+    the statistics are exact regardless of how often states are written.
+    The recorder only accepts hourly external statistics, so that is the
+    resolution. Sums continue from the last imported sum, also
+    across restarts.
+    """
+
+    def __init__(self, hass, port):
+        self._hass = hass
+        self._port = port
+        self._unsub = None
+        self._sums = {}
+        self._last_totals = {}
+
+    @callback
+    def async_start(self):
+        self._unsub = async_track_utc_time_change(self._hass, self._async_hour_passed, minute=0, second=0)
+
+    @callback
+    def async_stop(self):
+        if self._unsub is not None:
+            self._unsub()
+            self._unsub = None
+
+    @callback
+    def _async_hour_passed(self, now):
+        start = dt_util.as_utc(now).replace(minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        for device in self._port.devices.values():
+            if device.aggregator is not None:
+                self._hass.async_create_task(self._async_import(device, start))
+
+    async def _async_import(self, device, start):
+        _LOGGER.debug("Importing statistics of %s for the hour from %s", device.name, start)
+        for field, (low, high, mean) in device.aggregator.take_long_term().values():
+            metadata = {
+                "has_mean": True,
+                "has_sum": False,
+                "name": f"{device.name} {field.name}",
+                "source": DOMAIN,
+                "statistic_id": statistic_id(device, field.label),
+                "unit_of_measurement": field.unit,
+            }
+            async_add_external_statistics(
+                self._hass, metadata, [{"start": start, "mean": mean, "min": low, "max": high}]
+            )
+
+        integrator = device.aggregator.integrator
+        if integrator is None:
+            return
+        totals = (integrator.charged_ah, integrator.discharged_ah, integrator.charged_wh, integrator.discharged_wh)
+        for (key, name, unit, _, _), total in zip(TOTALS, totals):
+            stat_id = statistic_id(device, key.decode("ascii"))
+            if stat_id not in self._sums:
+                self._sums[stat_id] = await self._async_last_sum(stat_id)
+            growth = total - self._last_totals.get(stat_id, 0.0)
+            self._last_totals[stat_id] = total
+            self._sums[stat_id] += growth
+
+            metadata = {
+                "has_mean": False,
+                "has_sum": True,
+                "name": f"{device.name} {name}",
+                "source": DOMAIN,
+                "statistic_id": stat_id,
+                "unit_of_measurement": unit,
+            }
+            async_add_external_statistics(
+                self._hass, metadata, [{"start": start, "sum": self._sums[stat_id], "state": total}]
+            )
+
+    async def _async_last_sum(self, stat_id):
+        last = await get_instance(self._hass).async_add_executor_job(
+            get_last_statistics, self._hass, 1, stat_id, True, {"sum"}
+        )
+        if last.get(stat_id):
+            return last[stat_id][0]["sum"] or 0.0
+        return 0.0
@@ -0,0 +1,111 @@
+"""Hot-path counters for a Victron USB port."""
+import time
+
+# Processing time histogram buckets: bucket n counts calls that took less
+# than 2**n microseconds (the last bucket is open ended).
+HISTOGRAM_BUCKETS = 16
+
+# Rates are computed over at least this many seconds
+RATE_WINDOW = 10
+
+
+class PortStats:
+    """Plain integer counters, cheap enough to leave on in production.
+
+    The hot path only increments attributes; rates, ages and the histogram
+    summary are computed when a snapshot is requested. Parser counters are
+    per connection and are folded into the totals when a connection ends.
+    """
+
+    __slots__ = (
+        "bytes",
+        "frames",
+        "checksum_errors",
+        "malformed",
+        "decode_errors",
+        "throttled",
+        "connects",
+        "last_frame",
+        "parse_histogram",
+        "parser",
+        "publisher",
+        "_rate_time",
+        "_rate_totals",
+        "_rates",
+    )
+
+    def __init__(self):
+        self.bytes = 0
+        self.frames = 0
+        self.checksum_errors = 0
+        self.malformed = 0
+        self.decode_errors = 0
+        self.throttled = 0
+        self.connects = 0
+        self.last_frame = None
+        self.parse_histogram = [0] * HISTOGRAM_BUCKETS
+        self.parser = None
+        self.publisher = None
+        self._rate_time = time.monotonic()
+        self._rate_totals = (0, 0, 0)
+        self._rates = (0.0, 0.0, 0.0)
+
+    def record_parse(self, elapsed_ns):
+        """Count one data_received call that took ``elapsed_ns``."""
+        bucket = (elapsed_ns // 1000).bit_length()
+        self.parse_histogram[bucket if bucket < HISTOGRAM_BUCKETS else HISTOGRAM_BUCKETS - 1] += 1
+
+    def absorb_parser(self):
+        """Fold the counters of the current parser into the totals."""
+        parser = self.parser
+        if parser is not None:
+            self.frames += parser.frames
+            self.checksum_errors += parser.checksum_errors
+            self.malformed += parser.malformed
+            self.parser = None
+
+    def _totals(self):
+        parser = self.parser
+        frames = self.frames
+        checksum_errors = self.checksum_errors
+        malformed = self.malformed
+        if parser is not None:
+            frames += parser.frames
+            checksum_errors += parser.checksum_errors
+            malformed += parser.malformed
+        writes = self.publisher.writes if self.publisher is not None else 0
+        return frames, checksum_errors, malformed, writes
+
+    def snapshot(self):
+        """Return all counters plus per-second rates as a dict."""
+        now = time.monotonic()
+        frames, checksum_errors, malformed, writes = self._totals()
+
+        elapsed = now - self._rate_time
+        if elapsed >= RATE_WINDOW:
+            previous = self._rate_totals
+            current = (self.bytes, frames, writes)
+            self._rates = tuple((c - p) / elapsed for c, p in zip(current, previous))
+            self._rate_totals = current
+            self._rate_time = now
+
+        bytes_per_s, frames_per_s, writes_per_s = self._rates
+        return {
+            "bytes": self.bytes,
+            "frames": frames,
+            "checksum_errors": checksum_errors,
+            "malformed": malformed,
+            "decode_errors": self.decode_errors,
+            "throttled_fields": self.throttled,
+            "state_writes": writes,
+            "reconnects": max(0, self.connects - 1),
+            "bytes_per_s": round(bytes_per_s, 1),
+            "frames_per_s": round(frames_per_s, 2),
+            "state_writes_per_s": round(writes_per_s, 2),
+            "seconds_since_last_frame": round(now - self.last_frame, 1) if self.last_frame is not None else None,
+            "parse_time_histogram_us": {
+                f"<{1 << bucket}" if bucket < HISTOGRAM_BUCKETS - 1 else f">={1 << (bucket - 1)}": count
+                for bucket, count in enumerate(self.parse_histogram)
+                if count
+            },
+        }
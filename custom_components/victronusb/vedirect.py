@@ -0,0 +1,177 @@
+"""VE.Direct text protocol framing."""
+import logging
+
+_LOGGER = logging.getLogger(__name__)
+
+CHECKSUM_LABEL = b"Checksum"
+# Identify the device; SER# is missing on some products
+LABEL_PID = b"PID"
+LABEL_SERIAL = b"SER#"
+
+_HEX_START = b":"
+_NEWLINE = b"\n"
+_TAB = b"\t"
+_CR = 0x0D
+_LF = 0x0A
+
+# "Checksum\t" followed by the single checksum byte
+_CHECKSUM_PREFIX = CHECKSUM_LABEL + b"\t"
+_CHECKSUM_FIELD_LEN = len(_CHECKSUM_PREFIX) + 1
+
+# A text block never carries more than ~25 fields; anything longer means we
+# are not talking to a VE.Direct device (or lost the Checksum line).
+MAX_BLOCK_FIELDS = 64
+
+# Longest run of bytes we buffer without finding a field separator
+MAX_PENDING_BYTES = 4096
+
+
+class VEDirectTextParser:
+    """Assemble VE.Direct text blocks and validate their checksum.
+
+    A block is a run of ``\\r\\n<label>\\t<value>`` fields closed by a
+    ``Checksum`` field whose single value byte makes the modulo-256 sum of
+    every byte of the block zero. Fields are buffered until the block is
+    closed and are only handed out when the checksum matches, so a corrupted
+    block is dropped as a whole instead of leaking bad values into sensors.
+
+    ``feed`` accepts arbitrary chunks straight from the transport. They are
+    appended to one reusable buffer and split in place; the only objects
+    created per field are its label and raw value bytes. Labels are left as
+    bytes so they can be matched directly against the compiled field table,
+    and values are only decoded by the consumer for the fields it publishes.
+    The checksum byte is consumed as soon as it arrives, so a block is
+    complete without waiting for the next one to start.
+
+    HEX protocol records (``:...\\n``) found in the stream are passed to
+    ``on_hex`` as raw bytes and are left out of the text checksum.
+    """
+
+    __slots__ = ("_buffer", "_checksum", "_fields", "on_hex", "frames", "checksum_errors", "malformed")
+
+    def __init__(self, on_hex=None):
+        self._buffer = bytearray()
+        self.on_hex = on_hex
+        self._checksum = 0
+        self._fields = []
+        self.frames = 0
+        self.checksum_errors = 0
+        self.malformed = 0
+
+    def reset(self):
+        """Drop any buffered bytes and partial block, e.g. after a reconnect."""
+        self._buffer.clear()
+        self._checksum = 0
+        self._fields = []
+
+    def feed(self, data):
+        """Feed raw bytes; return the list of blocks that completed and validated.
+
+        Each block is returned as a dict mapping label bytes to value bytes.
+        """
+        buf = self._buffer
+        buf += data
+        frames = []
+        start = 0
+
+        while True:
+            start, record = self._scan(start, frames)
+            if record is None:
+                break
+            # A HEX record in the middle of a field: cut it out, so the two
+            # halves of the field join up and are checked as one
+            del buf[record[0]:record[1]]
+
+        if start:
+            del buf[:start]
+        elif len(buf) > MAX_PENDING_BYTES:
+            _LOGGER.debug("Discarding %d bytes without a field separator", len(buf))
+            self.malformed += 1
+            self.reset()
+
+        return frames
+
+    def _scan(self, start, frames):
+        """Parse the buffer from ``start``, appending completed blocks to ``frames``.
+
+        Returns where parsing stopped, and the ``(start, end)`` of a HEX
+        record that interrupts a field, or None when the buffer is used up.
+        """
+        buf = self._buffer
+        size = len(buf)
+        find = buf.find
+
+        with memoryview(buf) as view:
+            while start < size:
+                if buf.startswith(_CHECKSUM_PREFIX, start):
+                    stop = start + _CHECKSUM_FIELD_LEN
+                    if stop > size:
+                        break
+                    self._checksum += sum(view[start:stop])
+                    frame = self._close_block()
+                    if frame is not None:
+                        frames.append(frame)
+                    start = stop
+                    continue
+
+                end = find(_NEWLINE, start)
+                if end < 0:
+                    break
+                end += 1
+
+                # HEX protocol records can be interleaved with text blocks,
+                # even in the middle of a field. They run up to the newline
+                # and are not part of the text checksum.
+                colon = find(_HEX_START, start, end)
+                if colon >= 0:
+                    if self.on_hex is not None:
+                        self.on_hex(bytes(view[colon:end]))
+                    if colon > start:
+                        return start, (colon, end)
+                    start = end
+                    continue
+
+                self._checksum += sum(view[start:end])
+
+                tab = find(_TAB, start, end)
+                if tab < 0:
+                    if end - start > 2 or buf[start] != _CR:
+                        self.malformed += 1
+                        _LOGGER.debug("Malformed line: %r", bytes(view[start:end]))
+                elif len(self._fields) >= MAX_BLOCK_FIELDS:
+                    _LOGGER.debug("Dropping oversized block without checksum")
+                    self.malformed += 1
+                    self._checksum = 0
+                    self._fields = []
+                else:
+                    value_end = end - 1
+                    if buf[value_end - 1] == _CR:
+                        value_end -= 1
+                    self._fields.append((bytes(view[start:tab]), bytes(view[tab + 1:value_end])))
+
+                start = end
+
+        return start, None
+
+    def _close_block(self):
+        valid = self._checksum & 0xFF == 0
+        fields = self._fields
+        self._fields = []
+        self._checksum = 0
+
+        if not valid:
+            self.checksum_errors += 1
+            _LOGGER.debug("Dropping block with %d fields: checksum mismatch", len(fields))
+            return None
+
+        self.frames += 1
+        return dict(fields)
+
+
+def block_checksum(payload):
+    """Return the checksum byte that closes a text block ending in ``payload``.
+
+    ``payload`` is everything from the leading ``\\r\\n`` of the first field
+    up to and including ``Checksum\\t``.
+    """
+    return -sum(payload) & 0xFF
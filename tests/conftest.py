@@ -0,0 +1,71 @@
+"""Make the integration's modules importable as ``victronusb.<name>``.
+
+The package ``__init__`` needs Home Assistant; the protocol modules
+tested here do not, so the package is registered without running it.
+Tests of the parts running in Home Assistant's event loop drive them
+with ``FakeLoop`` instead of a real loop.
+"""
+import os
+import sys
+import types
+
+import pytest
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "custom_components", "victronusb")
+
+if "victronusb" not in sys.modules:
+    package = types.ModuleType("victronusb")
+    package.__path__ = [PACKAGE_DIR]
+    sys.modules["victronusb"] = package
+
+
+class FakeHandle:
+    def __init__(self, when, callback, args):
+        self.when = when
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class FakeLoop:
+    """An event loop stand-in whose clock only moves when the test advances it."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.handles = []
+
+    def time(self):
+        return self.now
+
+    def call_at(self, when, callback, *args):
+        handle = FakeHandle(when, callback, args)
+        self.handles.append(handle)
+        return handle
+
+    def call_later(self, delay, callback, *args):
+        return self.call_at(self.now + delay, callback, *args)
+
+    def call_soon(self, callback, *args):
+        return self.call_at(self.now, callback, *args)
+
+    def advance(self, seconds=0.0):
+        """Move the clock forward, running the callbacks that come due on the way."""
+        end = self.now + seconds
+        while True:
+            due = [handle for handle in self.handles if not handle.cancelled and handle.when <= end]
+            if not due:
+                break
+            handle = min(due, key=lambda handle: handle.when)
+            self.handles.remove(handle)
+            self.now = max(self.now, handle.when)
+            handle.callback(*handle.args)
+        self.now = end
+        self.handles = [handle for handle in self.handles if not handle.cancelled]
+
+
+@pytest.fixture
+def loop():
+    return FakeLoop()
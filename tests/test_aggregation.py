@@ -0,0 +1,72 @@
+"""Tests for full-rate aggregation and charge/energy integration."""
+import pytest
+
+from victronusb.aggregation import (
+    MAX_GAP,
+    DeviceAggregator,
+    EnergyIntegrator,
+    RunningStats,
+    SampleRing,
+    aggregate_definitions,
+)
+from victronusb.definitions import load_registry
+
+
+def test_running_stats():
+    stats = RunningStats()
+    assert stats.take() is None
+    for value in (3, 1, 2):
+        stats.add(value)
+    assert stats.take() == (1, 3, 2)
+    assert stats.take() is None
+
+
+def test_sample_ring_window_and_overwrite():
+    ring = SampleRing(3)
+    assert ring.stats(0) is None
+    for when, value in enumerate((5.0, 1.0, 3.0, 2.0)):
+        ring.append(when, value)
+
+    assert len(ring) == 3
+    # The first sample was overwritten
+    assert ring.stats(0) == (1.0, 3.0, 2.0)
+    assert ring.stats(2) == (2.0, 3.0, 2.5)
+    assert ring.stats(4) is None
+
+
+def test_integrator_splits_charge_and_discharge():
+    integrator = EnergyIntegrator()
+    # One hour at 12 V and 10 A, then one hour at -5 A
+    integrator.add(0, 12.0, 10.0)
+    for second in range(1, 3601):
+        integrator.add(second, 12.0, 10.0)
+    for second in range(3601, 7201):
+        integrator.add(second, 12.0, -5.0)
+
+    assert integrator.charged_ah == pytest.approx(10.0 + 2.5 / 3600, rel=1e-6)
+    assert integrator.discharged_ah == pytest.approx(5.0 - 5.0 / 3600, rel=1e-6)
+    assert integrator.charged_wh == pytest.approx(12 * integrator.charged_ah)
+
+
+def test_integrator_skips_gaps():
+    integrator = EnergyIntegrator()
+    integrator.add(0, 12.0, 10.0)
+    integrator.add(MAX_GAP + 1, 12.0, 10.0)
+    assert integrator.charged_ah == 0.0
+
+
+def test_device_aggregator_sees_every_frame():
+    field_table = load_registry().fallback
+    aggregator = DeviceAggregator(field_table, aggregate_definitions(field_table), 60, long_term=True)
+    for second, millivolts in enumerate((12000, 12600, 13200)):
+        aggregator.add_frame({b"V": str(millivolts).encode(), b"I": b"1000"}, 100.0 + second)
+
+    summary = aggregator.summary(100.0)
+    assert summary[b"V_min"] == 12.0
+    assert summary[b"V_max"] == 13.2
+    assert summary[b"V_mean"] == 12.6
+    assert summary[b"CHARGED_AH"] == round(2 / 3600, 3)
+
+    long_term = aggregator.take_long_term()
+    assert long_term[b"V"][1] == pytest.approx((12.0, 13.2, 12.6))
+    assert aggregator.take_long_term() == {}
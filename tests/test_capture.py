@@ -0,0 +1,71 @@
+"""Tests for writing and reading frame captures."""
+import os
+
+from victronusb.capture import MAGIC, CaptureWriter, FrameCapture, read_capture, read_capture_start
+
+FRAME = {b"PID": b"0x203", b"V": b"12800", b"I": b"-1500"}
+
+
+def write(writer, count):
+    for index in range(count):
+        writer.put(float(index), FRAME)
+
+
+def test_frames_round_trip(tmp_path):
+    path = str(tmp_path / "port.vecap")
+    writer = CaptureWriter(path)
+    write(writer, 3)
+    writer.start()
+    writer.close()
+    writer.join(5)
+
+    assert read_capture_start(path)
+    assert list(read_capture(path)) == [(0.0, FRAME), (1.0, FRAME), (2.0, FRAME)]
+
+
+def test_files_are_rotated_at_max_bytes(tmp_path):
+    path = str(tmp_path / "port.vecap")
+    writer = CaptureWriter(path, max_bytes=200, backups=2)
+    writer.start()
+    write(writer, 40)
+    writer.close()
+    writer.join(5)
+
+    assert sorted(os.listdir(tmp_path)) == ["port.vecap", "port.vecap.1", "port.vecap.2"]
+    for name in os.listdir(tmp_path):
+        with open(tmp_path / name, "rb") as file:
+            assert file.read(len(MAGIC)) == MAGIC
+        assert os.path.getsize(tmp_path / name) < 200 + 64
+    # The oldest files were rotated away, the newest frames are kept in order
+    times = [when for name in ("port.vecap.2", "port.vecap.1", "port.vecap") for when, _ in read_capture(str(tmp_path / name))]
+    assert times == [float(index) for index in range(40 - len(times), 40)]
+
+
+def test_frames_beyond_the_queue_are_dropped(tmp_path):
+    path = str(tmp_path / "port.vecap")
+    writer = CaptureWriter(path, max_queue=5)
+    write(writer, 8)
+    # Closing a full queue still stops the writer once it is emptied
+    writer.close()
+    writer.start()
+    writer.join(5)
+
+    assert not writer.is_alive()
+    assert (writer.frames, writer.dropped) == (5, 3)
+    assert len(list(read_capture(path))) == 5
+
+
+def test_capture_starts_with_recent_frames(tmp_path):
+    path = str(tmp_path / "port.vecap")
+    capture = FrameCapture()
+    for index in range(100):
+        capture.add(float(index), FRAME)
+    capture.start(path, pre_seconds=10)
+    writer = capture.writer
+    capture.add(100.0, FRAME)
+    assert capture.diagnostics()["path"] == path
+    capture.stop()
+    writer.join(5)
+
+    assert capture.diagnostics() is None
+    assert [when for when, _ in read_capture(path)] == [float(index) for index in range(89, 101)]
@@ -0,0 +1,77 @@
+"""Tests for the serial transports."""
+import asyncio
+import os
+
+import pytest
+
+from victronusb.connection import VEDirectProtocol, create_threaded_serial_connection, url_scheme, validate_url
+from victronusb.vedirect import block_checksum
+
+
+def encode_block(fields):
+    payload = b"".join(b"\r\n" + label + b"\t" + value for label, value in fields) + b"\r\nChecksum\t"
+    return payload + bytes([block_checksum(payload)])
+
+
+def test_protocol_passes_on_validated_frames():
+    async def run():
+        frames = []
+        protocol = VEDirectProtocol(frames.append)
+        block = encode_block([(b"V", b"12800")])
+        protocol.data_received(block[:5])
+        protocol.data_received(block[5:] + block.replace(b"12800", b"12900"))
+        protocol.connection_lost(None)
+        return frames, protocol.parser.checksum_errors, await protocol.closed
+
+    assert asyncio.run(run()) == ([{b"V": b"12800"}], 1, None)
+
+
+def test_threaded_reader_hands_frames_to_the_loop():
+    master, slave = os.openpty()
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        received = asyncio.Event()
+        frames = []
+
+        def on_frame(frame):
+            frames.append(frame)
+            if len(frames) == 2:
+                received.set()
+
+        transport, protocol = await create_threaded_serial_connection(
+            loop, lambda: VEDirectProtocol(on_frame), os.ttyname(slave)
+        )
+        try:
+            os.write(master, b":154\n" + encode_block([(b"V", b"12800")]) * 2)
+            await asyncio.wait_for(received.wait(), 5)
+        finally:
+            transport.close()
+        return frames, await asyncio.wait_for(protocol.closed, 5)
+
+    try:
+        assert asyncio.run(run()) == ([{b"V": b"12800"}, {b"V": b"12800"}], None)
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+def test_url_scheme():
+    assert url_scheme("/dev/ttyUSB0") is None
+    assert url_scheme("TCP://host:1") == "tcp"
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/dev/ttyUSB0", "/dev/serial/by-id/usb-VictronEnergy-if00", "tcp://10.0.0.5:2000", "socket://host:1", "rfc2217://host:7000"],
+)
+def test_valid_urls(url):
+    validate_url(url)
+
+
+@pytest.mark.parametrize(
+    "url", ["", "tcp://host", "tcp://host:abc", "tcp://host:70000", "tcp://host:0", "tcp://:2000", "spy://host:1"]
+)
+def test_invalid_urls(url):
+    with pytest.raises(ValueError):
+        validate_url(url)
@@ -0,0 +1,60 @@
+"""Tests for derived fields."""
+import pytest
+
+from victronusb.derived import compile_derived, compile_expression
+
+
+def graph(*specs, known=(b"V", b"I")):
+    fields = [
+        {"unique_id": label, "full_description": label, "expression": expression, "precision": 2}
+        for label, expression in specs
+    ]
+    group = {"group": "test", "derived": fields}
+    return compile_derived([group], known)
+
+
+def test_expression_inputs():
+    _, names = compile_expression("max(V * I, 0) if I > 0 else abs(I)")
+    assert names == {"V", "I"}
+
+
+@pytest.mark.parametrize("expression", ["__import__('os')", "V.real", "open(V)", "V ** 2", "[V]", "V +"])
+def test_unsafe_or_invalid_expressions_are_rejected(expression):
+    with pytest.raises(ValueError):
+        compile_expression(expression)
+
+
+def test_chained_fields_are_computed_in_dependency_order():
+    # Declared before its input, still computed after it
+    derived = graph(("KW", "PBAT / 1000"), ("PBAT", "V * I"))
+    values = {b"V": 12.5, b"I": -2.0}
+
+    results = derived.update(values, {b"V", b"I"})
+
+    assert results == {b"PBAT": -25.0, b"KW": -0.03}
+    assert values[b"KW"] == -0.03
+
+
+def test_only_fields_with_changed_inputs_are_recomputed():
+    derived = graph(("PBAT", "V * I"), ("VV", "V + 1"))
+    values = {b"V": 12.0, b"I": 1.0}
+    derived.update(values, {b"V", b"I"})
+
+    values[b"I"] = 2.0
+    assert derived.update(values, {b"I"}) == {b"PBAT": 24.0}
+
+
+def test_missing_input_or_division_by_zero_gives_none():
+    derived = graph(("R", "V / I"))
+    values = {b"V": 12.0, b"I": 4.0}
+    assert derived.update(values, {b"I"}) == {b"R": 3.0}
+    values[b"I"] = 0.0
+    assert derived.update(values, {b"I"}) == {b"R": None}
+    assert derived.fields[b"R"].evaluate({b"V": 12.0}) is None
+
+
+def test_circular_or_unknown_inputs_are_rejected():
+    with pytest.raises(ValueError):
+        graph(("A", "B + 1"), ("B", "A + 1"))
+    with pytest.raises(ValueError):
+        graph(("A", "X + 1"))
@@ -0,0 +1,59 @@
+"""Tests for choosing which serial ports discovery probes."""
+import asyncio
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from victronusb import discovery
+from victronusb.discovery import DiscoveredDevice, async_discover, claimed_ports, list_ports
+
+CABLE = "usb-VictronEnergy_BV_VE_Direct_cable_VE1-if00-port0"
+ZIGBEE = "usb-ITead_Sonoff_Zigbee_3.0_USB_Dongle-if00-port0"
+
+
+@pytest.fixture
+def by_id(tmp_path, monkeypatch):
+    """A by-id directory with a VE.Direct cable and a Zigbee stick, linked to real device nodes."""
+    os.symlink("/dev/zero", tmp_path / CABLE)
+    os.symlink("/dev/null", tmp_path / ZIGBEE)
+    monkeypatch.setattr(discovery, "BY_ID_DIR", str(tmp_path))
+    return tmp_path
+
+
+def entry(data, options=None):
+    return SimpleNamespace(data=data, options=options or {})
+
+
+def test_only_vedirect_cables_unless_probing_all(by_id):
+    assert list_ports() == [str(by_id / CABLE)]
+    assert list_ports(probe_all=True) == [str(by_id / ZIGBEE), str(by_id / CABLE)]
+
+
+def test_claimed_ports_are_found_anywhere_in_entries():
+    entries = [
+        entry({"serial_port": "/dev/ttyUSB0", "baudrate": 19200}),
+        entry({"device": {"path": "/dev/ttyACM0"}}, {"ports": ["/dev/ttyUSB3", "tcp://relay:2000"]}),
+    ]
+    assert claimed_ports(entries) == {"/dev/ttyUSB0", "/dev/ttyACM0", "/dev/ttyUSB3"}
+
+
+def test_ports_in_use_are_skipped_under_any_name(by_id, monkeypatch):
+    probed = []
+
+    def probe_port(port):
+        probed.append(port)
+        return DiscoveredDevice(port, 19200, b"0x203", None)
+
+    async def add_executor_job(target, *args):
+        return target(*args)
+
+    monkeypatch.setattr(discovery, "probe_port", probe_port)
+    # The Zigbee stick is configured by its node name, the cable is free
+    config_entries = SimpleNamespace(async_entries=lambda: [entry({"device": "/dev/null"})])
+    hass = SimpleNamespace(config_entries=config_entries, async_add_executor_job=add_executor_job)
+
+    devices = asyncio.run(async_discover(hass, probe_all=True))
+
+    assert probed == [str(by_id / CABLE)]
+    assert [device.port for device in devices] == probed
@@ -0,0 +1,92 @@
+"""Tests for sharing decoded frames with subscribers, driven by a fake event loop."""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from victronusb.const import EVENT_FRAME  # noqa: E402
+from victronusb.definitions import load_registry  # noqa: E402
+from victronusb.frames import FrameBroker  # noqa: E402
+
+DEVICE = SimpleNamespace(key="HQ1", pid=b"0x203", field_table=load_registry().table_for(b"0x203"))
+
+
+@pytest.fixture
+def broker(loop):
+    events = []
+    bus = SimpleNamespace(async_fire=lambda event, data: events.append((event, data)))
+    broker = FrameBroker(SimpleNamespace(loop=loop, bus=bus), "entry")
+    broker.events = events
+    return broker
+
+
+def publish(broker, count):
+    for index in range(count):
+        broker.publish(DEVICE, {b"V": b"%d" % (12000 + index), b"FW": b"0412"})
+
+
+def test_frames_are_decoded_and_delivered_in_batches(broker, loop):
+    batches = []
+    broker.async_subscribe(batches.append)
+    publish(broker, 2)
+    assert batches == []
+
+    loop.advance()
+    assert len(batches) == 1
+    assert [message["values"]["V"] for message in batches[0]] == [12.0, 12.001]
+    # Labels without a definition keep their raw value
+    assert batches[0][0]["values"]["FW"] == "0412"
+
+
+def test_slow_subscriber_drops_the_oldest_frames(broker, loop):
+    batches = []
+    broker.async_subscribe(batches.append, max_rate=1, max_queue=3)
+    publish(broker, 1)
+    loop.advance()
+    publish(broker, 5)
+    loop.advance(0.5)
+    assert len(batches) == 1
+
+    loop.advance(0.5)
+    assert [message["values"]["V"] for message in batches[1]] == [12.002, 12.003, 12.004]
+    assert broker.diagnostics() == {"subscribers": 1, "delivered": 4, "dropped": 2}
+
+
+def test_unsubscribed_callback_gets_nothing(broker, loop):
+    batches = []
+    unsubscribe = broker.async_subscribe(batches.append)
+    publish(broker, 1)
+    unsubscribe()
+    loop.advance()
+    assert batches == [] and not broker
+
+
+def test_close_ends_subscriptions_and_calls_on_close(broker, loop):
+    batches, closed = [], []
+    broker.async_subscribe(batches.append, on_close=lambda: closed.append("first"))
+
+    def failing_on_close():
+        raise RuntimeError("subscriber error")
+
+    broker.async_subscribe(batches.append, on_close=failing_on_close)
+    broker.async_subscribe(batches.append, on_close=lambda: closed.append("third"))
+    publish(broker, 1)
+    broker.async_close()
+    loop.advance()
+
+    assert batches == []
+    assert closed == ["first", "third"]
+    assert not broker
+
+
+def test_frame_events_are_batched_per_interval(broker, loop):
+    broker.async_set_event_interval(2)
+    publish(broker, 1)
+    loop.advance()
+    publish(broker, 3)
+    loop.advance(2)
+
+    assert [event for event, _ in broker.events] == [EVENT_FRAME, EVENT_FRAME]
+    assert [len(data["frames"]) for _, data in broker.events] == [1, 3]
+    assert broker.events[0][1]["entry_id"] == "entry"
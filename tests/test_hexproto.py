@@ -0,0 +1,142 @@
+"""Tests for the VE.Direct HEX protocol engine."""
+import asyncio
+
+import pytest
+
+from victronusb.hexproto import (
+    CMD_GET,
+    CMD_PING,
+    CMD_SET,
+    RSP_ASYNC,
+    RSP_GET,
+    RSP_PING,
+    HexRegister,
+    VEDirectHexClient,
+    VEDirectHexError,
+    VEDirectHexTimeout,
+    decode_record,
+    encode_record,
+    encode_register_request,
+    poll_registers,
+)
+
+
+def test_ping_record():
+    assert encode_record(CMD_PING) == b":154\n"
+    assert decode_record(b":154\n") == (CMD_PING, b"")
+
+
+@pytest.mark.parametrize(
+    "command, payload",
+    [(CMD_PING, b""), (CMD_GET, b"\x00\x10\x00"), (CMD_SET, b"\xed\xec\x00\x64\x00"), (RSP_ASYNC, bytes(range(16)))],
+)
+def test_record_round_trip(command, payload):
+    record = encode_record(command, payload)
+    assert record.startswith(b":") and record.endswith(b"\n")
+    assert decode_record(record) == (command, payload)
+
+
+def test_register_request_layout():
+    command, payload = decode_record(encode_register_request(CMD_SET, 0x1000, b"\xc8\x00"))
+    assert command == CMD_SET
+    assert payload == b"\x00\x10\x00\xc8\x00"
+
+
+@pytest.mark.parametrize("record", [b":155\n", b"154\n", b":15\n", b":1540\n", b":1ZZ\n"])
+def test_bad_records_are_rejected(record):
+    with pytest.raises(ValueError):
+        decode_record(record)
+
+
+def test_register_decode():
+    register = HexRegister({"id": "0x1000", "size": 2, "signed": True})
+    assert register.id == 0x1000
+    assert register.decode(b"\xfe\xff") == -2
+    with pytest.raises(ValueError):
+        register.decode(b"\x01")
+
+
+def get_response(register, value, flags=0):
+    return encode_record(RSP_GET, register.to_bytes(2, "little") + bytes([flags]) + value)
+
+
+def test_pipelined_requests_match_out_of_order_responses():
+    async def run():
+        written = []
+        client = VEDirectHexClient(written.append)
+        first = asyncio.ensure_future(client.get(0x1000))
+        second = asyncio.ensure_future(client.get(0xEDEC))
+        await asyncio.sleep(0)
+        # Both requests go out before any response arrives
+        assert written == [encode_register_request(CMD_GET, 0x1000), encode_register_request(CMD_GET, 0xEDEC)]
+
+        client.handle_record(get_response(0xEDEC, b"\x2c\x01"))
+        client.handle_record(get_response(0x1000, b"\xc8\x00"))
+        return await first, await second
+
+    assert asyncio.run(run()) == (b"\xc8\x00", b"\x2c\x01")
+
+
+def test_rejected_register_raises():
+    async def run():
+        client = VEDirectHexClient(lambda record: None)
+        request = asyncio.ensure_future(client.get(0x1234))
+        await asyncio.sleep(0)
+        client.handle_record(get_response(0x1234, b"", flags=0x01))
+        await request
+
+    with pytest.raises(VEDirectHexError):
+        asyncio.run(run())
+
+
+def test_unanswered_request_is_retried_then_times_out():
+    written = []
+
+    async def run():
+        client = VEDirectHexClient(written.append, timeout=0.01, retries=1)
+        try:
+            await client.ping()
+        finally:
+            assert client.timeouts == 2
+
+    with pytest.raises(VEDirectHexTimeout):
+        asyncio.run(run())
+    assert written == [b":154\n", b":154\n"]
+
+
+def test_ping_and_async_messages():
+    received = []
+
+    async def run():
+        client = VEDirectHexClient(
+            lambda record: None, on_async=lambda register, value: received.append((register, value))
+        )
+        request = asyncio.ensure_future(client.ping())
+        await asyncio.sleep(0)
+        client.handle_record(encode_record(RSP_ASYNC, b"\xed\xec\x00\x01\x02"))
+        client.handle_record(encode_record(RSP_PING, b"\x13\x41"))
+        client.handle_record(b":garbage\n")
+        return await request, client.errors
+
+    assert asyncio.run(run()) == (b"\x13\x41", 1)
+    assert received == [(0xECED, b"\x01\x02")]
+
+
+def test_due_registers_are_polled_together_and_reported_one_by_one():
+    written, values = [], []
+    registers = [(b"H1", HexRegister({"id": "0x0300", "signed": True})), (b"H2", HexRegister({"id": 0x0301}))]
+
+    async def run():
+        client = VEDirectHexClient(written.append)
+        task = asyncio.ensure_future(poll_registers(client, registers, lambda label, value: values.append((label, value))))
+        while len(written) < 2:
+            await asyncio.sleep(0)
+        client.handle_record(get_response(0x0301, b"\x07\x00"))
+        client.handle_record(get_response(0x0300, b"\xfb\xff"))
+        while len(values) < 2:
+            await asyncio.sleep(0)
+        task.cancel()
+
+    asyncio.run(run())
+    assert len(written) == 2
+    assert sorted(values) == [(b"H1", b"-5"), (b"H2", b"7")]
@@ -0,0 +1,130 @@
+"""Tests for the port's frame path, driven by a fake event loop."""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from victronusb.definitions import load_registry  # noqa: E402
+from victronusb.hub import (  # noqa: E402
+    HOTPLUG_DELAY,
+    RETRY_BASE,
+    RETRY_FIRST,
+    RETRY_MAX,
+    STABLE_AFTER,
+    VictronPort,
+)
+from victronusb.scheduler import RATE_GROUPS, FieldScheduler  # noqa: E402
+
+PID = b"0x203"
+SERIAL = b"HQ1"
+
+
+@pytest.fixture
+def port(loop):
+    registry = load_registry()
+    hass = SimpleNamespace(loop=loop, bus=SimpleNamespace(async_fire=lambda event, data: None))
+    scheduler = FieldScheduler.from_definitions(registry.fallback, {group: 0 for group in RATE_GROUPS})
+    hub = SimpleNamespace(hass=hass, wakeup=lambda: None)
+    port = VictronPort(hub, "entry", "Battery", "/dev/ttyUSB0", {}, registry, scheduler, None, 10)
+    port.handled = []
+    port.frame_handler = lambda port, device, frame: port.handled.append((device, frame))
+    return port
+
+
+def test_polled_register_is_published_but_not_a_frame(port, loop):
+    captured, delivered = [], []
+    port.capture = SimpleNamespace(add=lambda when, frame: captured.append(frame))
+    port.frames.async_subscribe(delivered.extend)
+    device = port.device = port.async_restore_device("HQ1", PID, SERIAL)
+    last_seen = device.last_seen
+
+    loop.advance(5)
+    port.handle_register(device, b"H1", b"-5")
+    loop.advance()
+
+    assert port.handled == [(device, {b"H1": b"-5"})]
+    assert captured == [] and delivered == []
+    assert device.last_seen == last_seen
+
+
+class FakeSensor:
+    def __init__(self):
+        self.available = []
+
+    def set_available(self, available):
+        self.available.append(available)
+
+
+def frame(**fields):
+    return {b"PID": PID, b"SER#": SERIAL, **{label.encode(): value.encode() for label, value in fields.items()}}
+
+
+def test_device_goes_unavailable_at_its_deadline(port, loop):
+    port.handle_frame(frame(V="12800"))
+    device = port.device
+    sensor = device.sensors[b"V"] = FakeSensor()
+    assert device.available
+
+    loop.advance(9)
+    port.handle_frame(frame(V="12790"))
+    loop.advance(9.5)
+    assert device.available and sensor.available == []
+
+    # 10 seconds after the last frame
+    loop.advance(0.5)
+    assert not device.available and sensor.available == [False]
+
+    port.handle_frame(frame(V="12780"))
+    assert device.available and sensor.available == [False, True]
+
+
+def test_one_timer_per_port(port, loop):
+    for _ in range(5):
+        port.handle_frame(frame(V="12800"))
+        loop.advance(1)
+    assert len(loop.handles) == 1
+
+
+def test_shorter_timeout_applies_to_the_running_deadline(port, loop):
+    port.handle_frame(frame(V="12800"))
+    loop.advance(3)
+    port.async_set_availability_timeout(2)
+    assert not port.device.available
+
+
+def test_connection_loss_makes_devices_unavailable_at_once(port, loop):
+    port.handle_frame(frame(V="12800"))
+    device = port.device
+    port._async_connection_closed(SimpleNamespace(result=lambda: None))
+    assert not device.available
+    assert port.device is None
+
+
+def test_retries_back_off_with_jitter_up_to_the_maximum(port, loop):
+    delays = []
+    for _ in range(12):
+        port._schedule_retry()
+        delays.append(port.retry_at - loop.time())
+
+    assert delays[0] == RETRY_FIRST
+    for retry, delay in enumerate(delays[1:]):
+        ceiling = min(RETRY_MAX, RETRY_BASE * 2 ** retry)
+        assert ceiling / 2 <= delay <= ceiling
+    assert max(delays) <= RETRY_MAX
+
+
+def test_stable_connection_resets_the_backoff(port, loop):
+    for _ in range(5):
+        port._schedule_retry()
+    port._connected_at = loop.time()
+    loop.advance(STABLE_AFTER)
+    port._async_connection_closed(SimpleNamespace(result=lambda: None))
+    assert port.retries == 1 and port.retry_at == loop.time() + RETRY_FIRST
+
+
+def test_hotplug_retries_a_down_port_soon(port, loop):
+    for _ in range(8):
+        port._schedule_retry()
+    port.hotplug()
+    assert port.retry_at == loop.time() + HOTPLUG_DELAY
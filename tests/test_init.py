@@ -0,0 +1,71 @@
+"""Tests for applying options updates to a running entry."""
+import asyncio
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+integration = importlib.import_module("victronusb.__init__")
+
+from victronusb.const import CONF_AGGREGATE_INTERVAL, CONF_MAX_PUBLISH_RATE  # noqa: E402
+from victronusb.hub import HUB_KEY  # noqa: E402
+
+DATA = {"name": "Battery", "serial_port": "/dev/ttyUSB0", "baudrate": 19200}
+
+
+class FakeConfigEntries:
+    def __init__(self):
+        self.reloads = []
+
+    async def async_reload(self, entry_id):
+        self.reloads.append(entry_id)
+
+
+@pytest.fixture
+def setup(monkeypatch):
+    applied = []
+
+    def apply_options(port, data):
+        applied.append(data)
+        port.options = data
+
+    monkeypatch.setattr(integration, "async_apply_options", apply_options)
+    port = SimpleNamespace(options=dict(DATA))
+    hass = SimpleNamespace(data={HUB_KEY: SimpleNamespace(ports={"entry": port})}, config_entries=FakeConfigEntries())
+    return hass, port, applied
+
+
+def update(hass, options):
+    entry = SimpleNamespace(entry_id="entry", data=DATA, options=options)
+    asyncio.run(integration.update_listener(hass, entry))
+
+
+def test_unchanged_settings_do_nothing(setup):
+    hass, port, applied = setup
+    update(hass, {})
+    assert applied == [] and hass.config_entries.reloads == []
+
+
+def test_live_option_is_applied_once(setup):
+    hass, port, applied = setup
+    options = {CONF_MAX_PUBLISH_RATE: 2.0}
+    update(hass, options)
+    update(hass, options)
+    assert applied == [{**DATA, **options}]
+    assert hass.config_entries.reloads == []
+
+
+def test_option_that_changes_sensors_reloads(setup):
+    hass, port, applied = setup
+    update(hass, {CONF_AGGREGATE_INTERVAL: 60})
+    assert applied == []
+    assert hass.config_entries.reloads == ["entry"]
+
+
+def test_entry_without_a_port_reloads(setup):
+    hass, port, applied = setup
+    hass.data[HUB_KEY].ports.clear()
+    update(hass, {})
+    assert hass.config_entries.reloads == ["entry"]
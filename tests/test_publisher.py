@@ -0,0 +1,94 @@
+"""Tests for the batched state publisher, driven by a fake event loop."""
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from victronusb.publisher import StatePublisher  # noqa: E402
+
+
+class FakeEntity:
+    def __init__(self, name, added=True, fail=False):
+        self.name = name
+        self.hass = object() if added else None
+        self.fail = fail
+        self.written = []
+
+    def async_write_ha_state(self):
+        if self.fail:
+            raise RuntimeError("write failed")
+        self.written.append(self.name)
+
+
+@pytest.fixture
+def publisher(loop):
+    return StatePublisher(SimpleNamespace(loop=loop), max_rate=2, heartbeat_interval=60)
+
+
+def test_writes_count_only_entities_written(publisher, loop):
+    written, not_added, failing = FakeEntity("V"), FakeEntity("I", added=False), FakeEntity("P", fail=True)
+    for entity in (written, not_added, failing):
+        publisher.async_mark(entity)
+    loop.advance()
+    publisher.async_write_now(not_added)
+    publisher.async_write_now(failing)
+
+    assert written.written == ["V"]
+    assert publisher.writes == 1
+
+
+def test_marks_are_coalesced_into_one_flush(publisher, loop):
+    voltage, current = FakeEntity("V"), FakeEntity("I")
+    for entity in (voltage, current, voltage):
+        publisher.async_mark(entity)
+    assert voltage.written == []
+
+    loop.advance()
+    assert voltage.written == ["V"] and current.written == ["I"]
+    assert publisher.writes == 2
+
+
+def test_flushes_are_spaced_out_to_the_rate_limit(publisher, loop):
+    entity = FakeEntity("V")
+    publisher.async_mark(entity)
+    loop.advance()
+    publisher.async_mark(entity)
+    loop.advance(0.4)
+    assert entity.written == ["V"]
+
+    # At most 2 flushes per second
+    loop.advance(0.1)
+    assert entity.written == ["V", "V"]
+
+
+def test_write_now_goes_ahead_of_the_rate_limit(publisher, loop):
+    entity, alarm = FakeEntity("V"), FakeEntity("Alarm")
+    publisher.async_mark(entity)
+    loop.advance()
+    publisher.async_mark(alarm)
+    publisher.async_write_now(alarm)
+    assert alarm.written == ["Alarm"]
+
+    # Not written a second time by the pending flush
+    loop.advance(1)
+    assert alarm.written == ["Alarm"]
+
+
+def test_new_limits_apply_to_the_next_flush(publisher, loop):
+    entity = FakeEntity("V")
+    publisher.async_set_limits(0, 30)
+    publisher.async_mark(entity)
+    loop.advance()
+    publisher.async_mark(entity)
+    loop.advance()
+    assert entity.written == ["V", "V"]
+    assert publisher.heartbeat_interval == 30
+
+
+def test_shutdown_drops_pending_writes(publisher, loop):
+    entity = FakeEntity("V")
+    publisher.async_mark(entity)
+    publisher.async_shutdown()
+    loop.advance(1)
+    assert entity.written == []
@@ -0,0 +1,62 @@
+"""Tests for per-field update scheduling."""
+import pytest
+
+from victronusb.definitions import load_registry
+from victronusb.scheduler import FieldScheduler, parse_field_intervals
+
+GROUPS = {"fast": 1, "normal": 5, "history": 60}
+FRAME = {b"V": b"12800", b"SOC": b"876", b"H17": b"2161", b"CS": b"3", b"XX": b"1"}
+
+
+@pytest.fixture
+def field_table():
+    return load_registry().fallback
+
+
+def due(scheduler, now):
+    return sorted(scheduler.filter(FRAME, now))
+
+
+def test_every_field_is_due_at_first(field_table):
+    scheduler = FieldScheduler.from_definitions(field_table, GROUPS)
+    assert due(scheduler, 100.0) == sorted(FRAME)
+
+
+def test_rate_groups_in_order(field_table):
+    scheduler = FieldScheduler.from_definitions(field_table, GROUPS)
+    scheduler.filter(FRAME, 100.0)
+
+    # Priority fields are never throttled
+    assert due(scheduler, 100.5) == [b"CS"]
+    assert due(scheduler, 101.0) == [b"CS", b"V"]
+    # Unknown labels use the normal group
+    assert due(scheduler, 105.0) == [b"CS", b"SOC", b"V", b"XX"]
+    assert due(scheduler, 160.0) == sorted(FRAME)
+
+
+def test_jitter_does_not_skip_a_block(field_table):
+    scheduler = FieldScheduler.from_definitions(field_table, GROUPS)
+    scheduler.filter({b"V": b"1"}, 100.0)
+    assert scheduler.filter({b"V": b"2"}, 100.95) == {b"V": b"2"}
+
+
+def test_field_intervals_override_groups_and_priority(field_table):
+    scheduler = FieldScheduler.from_definitions(field_table, GROUPS, {"V": 10, "CS": 2})
+    scheduler.filter(FRAME, 100.0)
+    assert due(scheduler, 101.0) == []
+    assert due(scheduler, 102.0) == [b"CS"]
+    assert due(scheduler, 110.0) == [b"CS", b"SOC", b"V", b"XX"]
+
+
+def test_reset_makes_everything_due(field_table):
+    scheduler = FieldScheduler.from_definitions(field_table, GROUPS)
+    scheduler.filter(FRAME, 100.0)
+    scheduler.reset()
+    assert due(scheduler, 100.1) == sorted(FRAME)
+
+
+def test_parse_field_intervals():
+    assert parse_field_intervals(" V=1, H17=600 ,") == {"V": 1.0, "H17": 600.0}
+    for text in ("V", "=1", "V=x", "V=-1"):
+        with pytest.raises(ValueError):
+            parse_field_intervals(text)
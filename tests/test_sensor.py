@@ -0,0 +1,202 @@
+"""Tests for the sensor entities and their registry entries."""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("homeassistant")
+
+from victronusb import sensor  # noqa: E402
+from victronusb.const import DOMAIN  # noqa: E402
+from victronusb.definitions import load_registry  # noqa: E402
+from victronusb.hub import VictronDevice  # noqa: E402
+
+
+class FakeEntityRegistry:
+    def __init__(self, *entries):
+        self.entities = {entry.entity_id: entry for entry in entries}
+
+    def async_get(self, entity_id):
+        return self.entities.get(entity_id)
+
+    def async_get_entity_id(self, domain, platform, unique_id):
+        return next((entity_id for entity_id, entry in self.entities.items() if entry.unique_id == unique_id), None)
+
+    def async_update_entity(self, entity_id, new_unique_id):
+        self.entities[entity_id].unique_id = new_unique_id
+
+    def async_remove(self, entity_id):
+        del self.entities[entity_id]
+
+
+def entity(entity_id, unique_id, entry_id="entry", device_id=None):
+    return SimpleNamespace(
+        entity_id=entity_id, unique_id=unique_id, config_entry_id=entry_id, device_id=device_id, platform=DOMAIN
+    )
+
+
+@pytest.fixture
+def registries(monkeypatch):
+    """Fake entity and device registries, patched into the sensor module."""
+    entity_registry = FakeEntityRegistry()
+    devices = {}
+
+    async def migrate_entries(hass, entry_id, migrate):
+        for entry in entity_registry.entities.values():
+            if entry.config_entry_id == entry_id:
+                update = migrate(entry)
+                if update:
+                    entry.unique_id = update["new_unique_id"]
+
+    monkeypatch.setattr(sensor.er, "async_get", lambda hass: entity_registry)
+    monkeypatch.setattr(sensor.er, "async_migrate_entries", migrate_entries)
+    monkeypatch.setattr(sensor.er, "async_entries_for_device", lambda registry, device_id: [
+        entry for entry in registry.entities.values() if entry.device_id == device_id
+    ])
+    monkeypatch.setattr(sensor.dr, "async_get", lambda hass: SimpleNamespace(async_get=devices.get))
+    monkeypatch.setattr(sensor.dr, "async_entries_for_config_entry", lambda registry, entry_id: [
+        SimpleNamespace(id=device_id, **vars(device)) for device_id, device in devices.items()
+    ])
+    return entity_registry, devices
+
+
+def make_device(entry_id, key, serial=None):
+    return VictronDevice(entry_id, key, "Battery", b"0x203", serial, {}, None, 0.0)
+
+
+def test_same_serial_on_two_entries_gets_two_ids():
+    ids = {make_device(entry_id, "HQ1", serial=b"HQ1").sensor_unique_id("V") for entry_id in ("usb", "tcp")}
+    assert len(ids) == 2
+
+
+def test_serial_keyed_ids_are_scoped_to_the_entry(registries):
+    entity_registry, devices = registries
+    devices["serial"] = SimpleNamespace(identifiers={(DOMAIN, "HQ2132ABCDE")})
+    devices["pid"] = SimpleNamespace(identifiers={(DOMAIN, "entry_0x203")})
+    entity_registry.entities = {
+        "sensor.v": entity("sensor.v", "hq2132abcde_v", device_id="serial"),
+        "sensor.i": entity("sensor.i", "entry_0x203_i", device_id="pid"),
+        "sensor.other": entity("sensor.other", "hq2132abcde_p", entry_id="other", device_id="serial"),
+    }
+
+    asyncio.run(sensor.async_migrate_unique_ids(None, SimpleNamespace(entry_id="entry")))
+
+    assert entity_registry.entities["sensor.v"].unique_id == make_device("entry", "HQ2132ABCDE", b"HQ2132ABCDE").sensor_unique_id("V")
+    assert entity_registry.entities["sensor.i"].unique_id == make_device("entry", "entry_0x203").sensor_unique_id("I")
+    assert entity_registry.entities["sensor.other"].unique_id == "hq2132abcde_p"
+
+
+def test_label_keyed_sensor_is_adopted_by_a_device_of_its_entry(registries):
+    entity_registry, _ = registries
+    entity_registry.entities = {"sensor.v": entity("sensor.v", "v")}
+    field = SimpleNamespace(label="V")
+
+    sensor._adopt_legacy_entity(None, "other", field, make_device("other", "HQ1", b"HQ1").sensor_unique_id("V"))
+    assert entity_registry.entities["sensor.v"].unique_id == "v"
+
+    unique_id = make_device("entry", "HQ1", b"HQ1").sensor_unique_id("V")
+    sensor._adopt_legacy_entity(None, "entry", field, unique_id)
+    assert entity_registry.entities["sensor.v"].unique_id == unique_id
+
+
+def test_restore_skips_and_removes_statistics_only_fields(registries):
+    entity_registry, devices = registries
+    devices["serial"] = SimpleNamespace(
+        identifiers={(DOMAIN, "HQ1")}, model="0x203", serial_number="HQ1"
+    )
+    device = VictronDevice("entry", "HQ1", "Battery", b"0x203", b"HQ1", load_registry().table_for(b"0x203"),
+                           SimpleNamespace(fields={}), 0.0)
+    port = SimpleNamespace(
+        entry_id="entry",
+        hub=SimpleNamespace(hass=None),
+        publisher=None,
+        aggregate_table={},
+        statistics_only=frozenset({b"V"}),
+        async_restore_device=lambda key, pid, serial: device,
+    )
+    entity_registry.entities = {
+        "sensor.v": entity("sensor.v", device.sensor_unique_id("V"), device_id="serial"),
+        "sensor.soc": entity("sensor.soc", device.sensor_unique_id("SOC"), device_id="serial"),
+    }
+
+    restored = sensor.restore_sensors(None, SimpleNamespace(entry_id="entry"), port)
+
+    assert [restored_sensor.unique_id for restored_sensor in restored] == [device.sensor_unique_id("SOC")]
+    assert list(device.sensors) == [b"SOC"]
+    assert list(entity_registry.entities) == ["sensor.soc"]
+
+
+class FakePublisher:
+    def __init__(self, heartbeat_interval=60):
+        self.heartbeat_interval = heartbeat_interval
+        self.marked = []
+        self.written = []
+
+    def async_mark(self, entity):
+        self.marked.append(entity.native_value)
+
+    def async_write_now(self, entity):
+        self.written.append(entity.native_value)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sensor, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def smart_sensor(label="V", initial_state=12.5, deadband=None, deadband_percent=None, priority=False):
+    field = SimpleNamespace(
+        label=label,
+        name=None,
+        deadband=deadband,
+        deadband_percent=deadband_percent,
+        priority=priority,
+        unit=None,
+        device_class=None,
+        state_class=None,
+        options=None,
+        precision=None,
+    )
+    publisher = FakePublisher()
+    return sensor.SmartSensor(make_device("entry", "HQ1", b"HQ1"), field, initial_state, publisher), publisher
+
+
+def test_changes_inside_the_deadband_are_not_published(clock):
+    voltage, publisher = smart_sensor(deadband=0.05)
+    voltage.set_state(12.53)
+    voltage.set_state(12.55)
+    assert publisher.marked == [12.55]
+
+
+def test_deadband_percent_scales_with_the_value(clock):
+    current, publisher = smart_sensor(label="I", initial_state=-20.0, deadband=0.01, deadband_percent=5)
+    current.set_state(-20.9)
+    current.set_state(-21.0)
+    assert publisher.marked == [-21.0]
+
+
+def test_unchanged_value_is_republished_after_the_heartbeat(clock):
+    voltage, publisher = smart_sensor()
+    voltage.set_state(12.5)
+    clock[0] += 59
+    voltage.set_state(12.5)
+    assert publisher.marked == []
+
+    clock[0] += 1
+    voltage.set_state(12.5)
+    assert publisher.marked == [12.5]
+
+
+def test_priority_field_is_written_at_once(clock):
+    alarm, publisher = smart_sensor(label="Alarm", initial_state="off", priority=True)
+    alarm.set_state("on")
+    assert publisher.written == ["on"] and publisher.marked == []
+
+
+def test_empty_value_makes_the_sensor_unavailable(clock):
+    voltage, publisher = smart_sensor()
+    voltage.set_state("")
+    assert not voltage.available
+    assert len(publisher.marked) == 1
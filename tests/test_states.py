@@ -0,0 +1,15 @@
+"""Tests for named state codes and reason flags."""
+from victronusb.states import ALARM_REASONS, DEVICE_STATES, CodeTable, FlagTable
+
+
+def test_code_table():
+    assert DEVICE_STATES.decode(b"3") == "Bulk"
+    assert DEVICE_STATES.decode(b"0xF5") == "Starting-up"
+    assert DEVICE_STATES.decode(b"99") == CodeTable.UNKNOWN
+    assert CodeTable.UNKNOWN in DEVICE_STATES.options
+
+
+def test_flag_table():
+    assert ALARM_REASONS.decode(b"0") == FlagTable.NONE
+    assert ALARM_REASONS.decode(b"5") == "Low voltage, Low SOC"
+    assert ALARM_REASONS.names(ALARM_REASONS.mask(b"0x0100")) == ["Overload"]
@@ -0,0 +1,125 @@
+"""Tests for the VE.Direct text framing."""
+from victronusb.vedirect import MAX_BLOCK_FIELDS, MAX_PENDING_BYTES, VEDirectTextParser, block_checksum
+
+HEX_RECORD = b":A0102000543\n"
+
+
+def encode_block(fields):
+    payload = b"".join(b"\r\n" + label + b"\t" + value for label, value in fields) + b"\r\nChecksum\t"
+    return payload + bytes([block_checksum(payload)])
+
+
+def feed_all(parser, data, chunk=None):
+    frames = []
+    step = chunk or len(data)
+    for i in range(0, len(data), step):
+        frames += parser.feed(data[i:i + step])
+    return frames
+
+
+def test_hex_record_inside_a_field_keeps_the_whole_value():
+    block = encode_block([(b"V", b"12800"), (b"I", b"-1500")])
+    cut = block.index(b"12800") + 3
+    records = []
+    parser = VEDirectTextParser(on_hex=records.append)
+
+    frames = feed_all(parser, block[:cut] + HEX_RECORD + block[cut:])
+
+    assert frames == [{b"V": b"12800", b"I": b"-1500"}]
+    assert records == [HEX_RECORD]
+    assert parser.checksum_errors == 0
+    assert parser.malformed == 0
+
+
+def test_hex_record_inside_a_field_split_across_chunks():
+    block = encode_block([(b"V", b"12800"), (b"I", b"-1500")])
+    cut = block.index(b"12800") + 3
+    data = block[:cut] + HEX_RECORD + block[cut:]
+    for chunk in (1, 2, 5, 7):
+        records = []
+        parser = VEDirectTextParser(on_hex=records.append)
+        assert feed_all(parser, data, chunk) == [{b"V": b"12800", b"I": b"-1500"}], chunk
+        assert records == [HEX_RECORD]
+
+
+def test_hex_record_inside_the_checksum_label():
+    block = encode_block([(b"V", b"12800")])
+    cut = block.index(b"Checksum") + 4
+    parser = VEDirectTextParser()
+    assert parser.feed(block[:cut] + HEX_RECORD + block[cut:]) == [{b"V": b"12800"}]
+
+
+def test_blocks_split_into_any_chunks():
+    blocks = [encode_block([(b"PID", b"0x203"), (b"V", str(12800 + i).encode())]) for i in range(3)]
+    data = b"".join(blocks)
+    for chunk in (1, 3, 64):
+        parser = VEDirectTextParser()
+        frames = feed_all(parser, data, chunk)
+        assert [frame[b"V"] for frame in frames] == [b"12800", b"12801", b"12802"], chunk
+        assert parser.frames == 3
+
+
+def test_corrupted_block_is_dropped_as_a_whole():
+    good = encode_block([(b"V", b"12800"), (b"I", b"-1500")])
+    bad = good.replace(b"12800", b"12900")
+    parser = VEDirectTextParser()
+
+    frames = parser.feed(bad + good)
+
+    assert frames == [{b"V": b"12800", b"I": b"-1500"}]
+    assert parser.checksum_errors == 1
+
+
+def test_checksum_byte_is_consumed_without_waiting_for_the_next_block():
+    parser = VEDirectTextParser()
+    assert parser.feed(encode_block([(b"V", b"12800")])) == [{b"V": b"12800"}]
+
+
+def test_checksum_byte_that_looks_like_a_hex_record_start():
+    # Find a block whose checksum byte happens to be ":"
+    for value in range(10000, 20000):
+        block = encode_block([(b"V", str(value).encode())])
+        if block.endswith(b":"):
+            break
+    assert block.endswith(b":")
+    records = []
+    parser = VEDirectTextParser(on_hex=records.append)
+    assert parser.feed(block) == [{b"V": str(value).encode()}]
+    assert records == []
+
+
+def test_hex_records_between_blocks():
+    block = encode_block([(b"V", b"12800")])
+    records = []
+    parser = VEDirectTextParser(on_hex=records.append)
+
+    frames = parser.feed(HEX_RECORD + block + b":154\n" + block)
+
+    assert frames == [{b"V": b"12800"}, {b"V": b"12800"}]
+    assert records == [HEX_RECORD, b":154\n"]
+    assert parser.checksum_errors == 0
+
+
+def test_hex_record_between_fields():
+    block = encode_block([(b"V", b"12800"), (b"I", b"-1500")])
+    cut = block.index(b"\r\nI")
+    records = []
+    parser = VEDirectTextParser(on_hex=records.append)
+
+    assert parser.feed(block[:cut] + HEX_RECORD + block[cut:]) == [{b"V": b"12800", b"I": b"-1500"}]
+    assert records == [HEX_RECORD]
+
+
+def test_oversized_block_is_dropped():
+    fields = [(b"H%d" % i, b"0") for i in range(MAX_BLOCK_FIELDS + 1)]
+    parser = VEDirectTextParser()
+
+    assert parser.feed(encode_block(fields)) == []
+    assert parser.malformed == 1
+
+
+def test_noise_without_newline_is_discarded():
+    parser = VEDirectTextParser()
+    parser.feed(b"x" * (MAX_PENDING_BYTES + 1))
+    assert parser.malformed == 1
+    assert parser.feed(encode_block([(b"V", b"12800")])) == [{b"V": b"12800"}]
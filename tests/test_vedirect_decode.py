@@ -0,0 +1,85 @@
+"""Tests that the offline decoder finds the same blocks as the parser."""
+import os
+import random
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools"))
+
+import vedirect_decode  # noqa: E402
+from victronusb.vedirect import VEDirectTextParser, block_checksum  # noqa: E402
+
+HEX_RECORDS = (b":154\n", b":A0102000543\n", b":70010003A\n")
+
+
+def encode_block(fields):
+    payload = b"".join(b"\r\n" + label + b"\t" + value for label, value in fields) + b"\r\nChecksum\t"
+    return payload + bytes([block_checksum(payload)])
+
+
+def scan(data):
+    columns = vedirect_decode.RawColumns()
+    stats = {"blocks": 0, "valid": 0}
+    consumed = vedirect_decode._scan_window(np.frombuffer(data, dtype=np.uint8), columns, stats)
+    frames = [{} for _ in range(columns.rows)]
+    for label in columns.pieces:
+        if label == b"Checksum":
+            # Kept as a raw column by the tool; not a field of the frame
+            continue
+        rows, values = columns.column(label)
+        for row, value in zip(rows.tolist(), values.tolist()):
+            frames[row][label] = value
+    return frames, consumed
+
+
+def stream(rng, blocks, hex_share):
+    """Blocks with HEX records inserted at random offsets, also inside labels and values."""
+    data = bytearray()
+    for index in range(blocks):
+        block = bytearray(encode_block([
+            (b"PID", b"0x203"),
+            (b"V", str(rng.randrange(10000, 15000)).encode()),
+            (b"I", str(rng.randrange(-20000, 20000)).encode()),
+            (b"SOC", str(rng.randrange(0, 1000)).encode()),
+            (b"Alarm", b"OFF"),
+        ]))
+        if rng.random() < 0.05:
+            block[rng.randrange(len(block) - 1)] ^= 0x01
+        for _ in range(rng.randrange(3) if rng.random() < hex_share else 0):
+            # Not right after "Checksum\t", where the parser takes the colon as the checksum byte
+            at = rng.randrange(len(block) - 1)
+            at += at == len(block) - 1
+            block[at:at] = rng.choice(HEX_RECORDS)
+        data += block
+    return bytes(data)
+
+
+def test_hex_record_inside_the_checksum_label():
+    block = encode_block([(b"V", b"12800")])
+    cut = block.index(b"Checksum") + 4
+    data = block[:cut] + HEX_RECORDS[0] + block[cut:] + block
+    assert scan(data) == ([{b"V": b"12800"}, {b"V": b"12800"}], len(data))
+
+
+def test_checksum_byte_that_looks_like_a_hex_record_start():
+    for value in range(10000, 20000):
+        block = encode_block([(b"V", str(value).encode())])
+        if block.endswith(b":"):
+            break
+    cut = block.index(b"Checksum") + 4
+    data = block[:cut] + HEX_RECORDS[1] + block[cut:] + HEX_RECORDS[0] + block
+    assert scan(data)[0] == [{b"V": str(value).encode()}] * 2
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_same_blocks_as_the_parser(seed):
+    rng = random.Random(seed)
+    data = stream(rng, 200, 0.5)
+    frames, consumed = scan(data)
+    parser = VEDirectTextParser()
+    expected = parser.feed(data[:consumed])
+    assert frames == expected
+    assert len(expected) + parser.checksum_errors > 150
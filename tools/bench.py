@@ -0,0 +1,216 @@
+"""Throughput and latency benchmark for the VE.Direct pipeline.
+
+    python tools/bench.py                       # offline parse/decode benchmark
+    python tools/bench.py --live --seconds 10   # end to end over a pty
+    python tools/bench.py --live --threaded     # same, read from a reader thread
+    python tools/bench.py --replay capture.bin  # offline, on a recorded capture
+
+The offline run feeds generated (or replayed) blocks through the parser,
+scheduler and field decoders and reports frames/s, MB/s, time per frame
+and allocations per frame. The live run serves the fake device from
+vedirect_sim.py on a pty, reads it through the integration's protocol and
+reports the latency from the last byte written to the decoded fields.
+
+Latency is measured up to field decode only, not up to the state write:
+that needs a running Home Assistant. In the integration, writes are
+batched on top of this, so a non-priority field's state is written up to
+1 / max_publish_rate seconds later; priority fields are written at once.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vedirect_sim import (  # noqa: E402
+    BatteryMonitorModel,
+    FakeVEDirectDevice,
+    ReplaySource,
+    corrupt,
+    load_integration_module,
+)
+
+vedirect = load_integration_module("vedirect")
+definitions = load_integration_module("definitions")
+scheduler_module = load_integration_module("scheduler")
+
+LABEL_SEQ = b"SEQ"
+
+
+def load_field_table():
+    # The table the integration picks for the simulated BMV
+    return definitions.load_registry().table_for(b"0x203")
+
+
+def make_scheduler(field_table):
+    # Everything due every time, so the decoders see every field
+    groups = {group: 0 for group in scheduler_module.RATE_GROUPS}
+    return scheduler_module.FieldScheduler.from_definitions(field_table, groups)
+
+
+def decode_frame(field_table, frame):
+    """The per-field work set_smart_sensors does before touching entities."""
+    values = {}
+    for label, raw in frame.items():
+        field = field_table.get(label)
+        if field is None:
+            continue
+        try:
+            values[label] = field.decode(raw)
+        except ValueError:
+            pass
+    return values
+
+
+def build_stream(source, blocks, corrupt_rate, seed=1):
+    import random
+
+    rng = random.Random(seed)
+    parts = []
+    for _ in range(blocks):
+        _, block = source.next_block()
+        if corrupt_rate and rng.random() < corrupt_rate:
+            block = corrupt(block, rng)
+        parts.append(block)
+    return b"".join(parts)
+
+
+def run_offline(stream, chunk, field_table):
+    parser = vedirect.VEDirectTextParser()
+    scheduler = make_scheduler(field_table)
+    frames = 0
+
+    start = time.perf_counter()
+    for pos in range(0, len(stream), chunk):
+        for frame in parser.feed(stream[pos:pos + chunk]):
+            decode_frame(field_table, scheduler.filter(frame))
+            frames += 1
+    elapsed = time.perf_counter() - start
+
+    # Second pass under tracemalloc, which slows things down too much to time
+    parser = vedirect.VEDirectTextParser()
+    scheduler = make_scheduler(field_table)
+    tracemalloc.start()
+    blocks_before = sys.getallocatedblocks()
+    for pos in range(0, len(stream), chunk):
+        for frame in parser.feed(stream[pos:pos + chunk]):
+            decode_frame(field_table, scheduler.filter(frame))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained = sys.getallocatedblocks() - blocks_before
+
+    return {
+        "bytes": len(stream),
+        "frames": frames,
+        "checksum_errors": parser.checksum_errors,
+        "malformed": parser.malformed,
+        "seconds": elapsed,
+        "frames_per_s": frames / elapsed if elapsed else 0,
+        "mb_per_s": len(stream) / elapsed / 1e6 if elapsed else 0,
+        "us_per_frame": elapsed / frames * 1e6 if frames else 0,
+        "peak_bytes_per_frame": peak / frames if frames else 0,
+        "retained_blocks_per_frame": retained / frames if frames else 0,
+    }
+
+
+async def run_live(args, field_table):
+    import serial_asyncio
+
+    connection = load_integration_module("connection")
+
+    source = BatteryMonitorModel(sequence=True, seed=args.seed)
+    device = FakeVEDirectDevice(source, args.baud, args.rate, args.corrupt, seed=args.seed)
+    scheduler = make_scheduler(field_table)
+    latencies = []
+    parse_times = []
+
+    def on_frame(frame):
+        started = time.perf_counter()
+        decode_frame(field_table, scheduler.filter(frame))
+        parse_times.append(time.perf_counter() - started)
+        decoded = time.monotonic()
+        seq = frame.get(LABEL_SEQ)
+        if seq is not None and int(seq) in device.sent:
+            latencies.append(decoded - device.sent[int(seq)])
+
+    async with device:
+        if args.threaded:
+            transport, protocol = await connection.create_threaded_serial_connection(
+                asyncio.get_running_loop(),
+                lambda: connection.VEDirectProtocol(on_frame),
+                device.port,
+                baudrate=args.baud,
+            )
+        else:
+            transport, protocol = await serial_asyncio.create_serial_connection(
+                asyncio.get_running_loop(),
+                lambda: connection.VEDirectProtocol(on_frame),
+                url=device.port,
+                baudrate=args.baud,
+            )
+        await asyncio.sleep(args.seconds)
+        transport.close()
+        await protocol.closed
+
+    latencies.sort()
+
+    def percentile(share):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * share))] * 1e3 if latencies else None
+
+    return {
+        "blocks_sent": device.blocks_sent,
+        "blocks_corrupted": device.blocks_corrupted,
+        "frames": protocol.parser.frames,
+        "checksum_errors": protocol.parser.checksum_errors,
+        "frames_per_s": protocol.parser.frames / args.seconds,
+        "decode_us_per_frame": statistics.fmean(parse_times) * 1e6 if parse_times else None,
+        # From the last byte written to the decoded fields, excluding the state write
+        "decode_latency_ms_p50": percentile(0.50),
+        "decode_latency_ms_p95": percentile(0.95),
+        "decode_latency_ms_p99": percentile(0.99),
+    }
+
+
+def print_report(title, results):
+    print(title)
+    for key, value in results.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"  {key:28} {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=20000, help="blocks for the offline run")
+    parser.add_argument("--chunk", type=int, default=64, help="bytes per read in the offline run")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="share of blocks to corrupt")
+    parser.add_argument("--replay", help="raw capture file to use for the offline run")
+    parser.add_argument("--live", action="store_true", help="also run end to end over a pty")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--baud", type=int, default=19200)
+    parser.add_argument("--rate", type=float, default=10, help="blocks per second in the live run")
+    parser.add_argument("--threaded", action="store_true", help="read the port in a reader thread in the live run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    field_table = load_field_table()
+    source = ReplaySource(args.replay) if args.replay else BatteryMonitorModel(seed=args.seed)
+    results = {"offline": run_offline(build_stream(source, args.blocks, args.corrupt, args.seed), args.chunk, field_table)}
+    if args.live:
+        results["live"] = asyncio.run(run_live(args, field_table))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for name, result in results.items():
+            print_report(name, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""Decode VE.Direct serial logs and frame captures into columns.
+
+    python tools/vedirect_decode.py serial.log --csv serial.csv
+    python tools/vedirect_decode.py capture.vecap --npz capture.npz
+    python tools/vedirect_decode.py serial.log --parquet serial.parquet --pid 0xA389
+
+Raw logs are memory-mapped and processed in windows of whole blocks with
+NumPy: block boundaries, checksums and field lines are found with array
+operations over the bytes, and each field is decoded column-wise, running
+the integration's decoder from Victronusb.json once per distinct raw
+value. HEX records are cut out of the stream first, like the
+integration's parser does, also where they interrupt a field. Frame captures written by the start_capture service get a
+``time`` column (Unix seconds).
+
+Needs NumPy; Parquet output also needs pyarrow.
+"""
+import argparse
+import csv
+import mmap
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from vedirect_sim import PACKAGE_DIR, load_integration_module  # noqa: E402
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+capture = load_integration_module("capture")
+definitions = load_integration_module("definitions")
+vedirect = load_integration_module("vedirect")
+
+# Like the integration's parser, a line starting with this closes a block
+CHECKSUM_PREFIX = b"\nChecksum\t"
+NEWLINE = ord("\n")
+CR = ord("\r")
+HEX_START = ord(":")
+
+# Bytes per window; a window is cut after the last complete block in it
+WINDOW = 16 * 1024 * 1024
+# Longest label and value allowed by the VE.Direct text protocol
+MAX_LABEL = 8
+MAX_VALUE = 33
+
+# Keeps the first n bytes of a little endian uint64, by n
+_LABEL_MASKS = np.array([(1 << (8 * n)) - 1 for n in range(MAX_LABEL + 1)], dtype=np.uint64) if np else None
+
+
+def find_all(data, pattern):
+    """Return the offsets of every occurrence of ``pattern`` in a uint8 array."""
+    count = len(data) - len(pattern) + 1
+    if count <= 0:
+        return np.empty(0, dtype=np.int64)
+    candidates = np.flatnonzero(data[:count] == pattern[0])
+    for offset in range(1, len(pattern)):
+        candidates = candidates[data[candidates + offset] == pattern[offset]]
+    return candidates
+
+
+def sliding(data, width):
+    """A ``(len(data), width)`` view whose row ``i`` is ``data[i:i + width]``; needs ``width`` bytes of padding."""
+    return np.lib.stride_tricks.as_strided(data, shape=(len(data) - width, width), strides=(1, 1), writeable=False)
+
+
+def gather(padded, starts, lengths, width):
+    """Cut ``padded[start:start + length]`` for every pair into a fixed-width bytes array."""
+    cells = sliding(padded, width)[starts]
+    cells[np.arange(width) >= lengths[:, None]] = 0
+    return cells.view(f"S{width}").ravel()
+
+
+def unique_bytes(values):
+    """``np.unique`` for a bytes array, on integers when the values fit in 8 bytes."""
+    width = values.dtype.itemsize
+    if width > 8:
+        return np.unique(values, return_inverse=True)
+    words = np.zeros((len(values), 8), dtype=np.uint8)
+    words[:, :width] = values.view(np.uint8).reshape(-1, width)
+    _, first, inverse = np.unique(words.view("<u8").ravel(), return_index=True, return_inverse=True)
+    return values[first], inverse
+
+
+class RawColumns:
+    """Raw field values of consecutive frames: per label, row numbers and values."""
+
+    def __init__(self):
+        self.rows = 0
+        self.pieces = {}
+        self.times = None
+
+    def add(self, label, rows, values):
+        self.pieces.setdefault(label, []).append((rows, values))
+
+    def column(self, label):
+        pieces = self.pieces.get(label)
+        if not pieces:
+            return None, None
+        return np.concatenate([rows for rows, _ in pieces]), np.concatenate([values for _, values in pieces])
+
+
+def cut_hex_records(data):
+    """Cut the HEX records out of ``data``, like the parser does.
+
+    A record runs from a colon up to and including the next newline. A
+    colon right after ``Checksum\t`` is a block's checksum byte instead,
+    also when the label only joins up once a record inside it is cut, so
+    records are cut and colons re-checked until that settles. Returns the
+    remaining bytes and the offset of each of them in ``data``, or ``data``
+    and None when there are no records.
+    """
+    colons = np.flatnonzero(data == HEX_START)
+    if not len(colons):
+        return data, None
+    newlines = np.flatnonzero(data == NEWLINE)
+    record_ends = np.append(newlines + 1, len(data))[np.searchsorted(newlines, colons)]
+    prefix = np.frombuffer(CHECKSUM_PREFIX, dtype=np.uint8)
+    records = np.ones(len(colons), dtype=bool)
+    while True:
+        # Bytes inside at least one record; records may overlap
+        depth = np.bincount(colons[records], minlength=len(data) + 1)
+        depth -= np.bincount(record_ends[records], minlength=len(data) + 1)
+        kept = np.flatnonzero(np.cumsum(depth[:-1]) == 0)
+        remaining = data[kept]
+
+        # Where each record's colon would be once the records are cut; of
+        # colons that end up in the same place only the first is a candidate
+        at = np.searchsorted(kept, colons[records])
+        checksum = (at >= len(prefix)) & (np.diff(at, prepend=-1) > 0)
+        if len(remaining) >= len(prefix):
+            windows = np.lib.stride_tricks.sliding_window_view(remaining, len(prefix))
+            checksum[checksum] = (windows[at[checksum] - len(prefix)] == prefix).all(axis=1)
+        else:
+            checksum[:] = False
+        if not checksum.any():
+            return remaining, kept
+        records[np.flatnonzero(records)[checksum]] = False
+
+
+def _scan_window(data, columns, stats):
+    """Extract the fields of the complete blocks in ``data``; return the bytes consumed."""
+    data, offsets = cut_hex_records(data)
+    marks = find_all(data, CHECKSUM_PREFIX)
+    ends = marks + len(CHECKSUM_PREFIX) + 1
+    ends = ends[ends <= len(data)]
+    if not len(ends):
+        return 0
+    data = data[:ends[-1]]
+
+    # Windows start where the last one ended, after a block; like in the
+    # parser, the bytes up to the next block's checksum all belong to it
+    newlines = np.flatnonzero(data == NEWLINE)
+    starts = np.concatenate(([0], ends[:-1]))
+    stats["blocks"] += len(starts)
+
+    # A block is valid when its bytes, checksum included, add up to 0 mod 256
+    sums = np.add.reduceat(data, starts, dtype=np.uint64)
+    valid = sums % 256 == 0
+    rows = np.cumsum(valid) - 1 + columns.rows
+
+    # Field lines of valid blocks: a line starts after a newline or where
+    # a block starts, the label runs to the tab and the value up to the
+    # next newline, without the carriage return
+    lines = np.union1d(newlines + 1, starts)
+    block = np.searchsorted(ends, lines, side="right")
+    keep = block < len(ends)
+    lines, block = lines[keep], block[keep]
+    keep = valid[block]
+    lines, block = lines[keep], block[keep]
+
+    tabs = np.flatnonzero(data == ord("\t"))
+    tab = tabs[np.minimum(np.searchsorted(tabs, lines), len(tabs) - 1)]
+    next_newline = np.searchsorted(newlines, lines)
+    line_end = np.where(
+        next_newline < len(newlines), newlines[np.minimum(next_newline, len(newlines) - 1)], len(data)
+    )
+    line_end -= data[np.maximum(line_end - 1, 0)] == CR
+
+    label_length = tab - lines
+    value_length = line_end - tab - 1
+    keep = (label_length > 0) & (label_length <= MAX_LABEL) & (value_length >= 0) & (value_length <= MAX_VALUE)
+    lines, block, tab = lines[keep], block[keep], tab[keep]
+    label_length, value_length = label_length[keep], value_length[keep]
+
+    # Labels as integers, grouped with one stable sort so rows stay in order
+    padded = np.zeros(len(data) + MAX_VALUE + 8, dtype=np.uint8)
+    padded[:len(data)] = data
+    keys = sliding(padded, 8)[lines].view("<u8").ravel() & _LABEL_MASKS[label_length]
+    order = np.argsort(keys, kind="stable")
+    bounds = np.flatnonzero(np.diff(keys[order])) + 1
+    for group in np.split(order, bounds) if len(order) else ():
+        label = int(keys[group[0]]).to_bytes(8, "little").rstrip(b"\0")
+        lengths = value_length[group]
+        values = gather(padded, tab[group] + 1, lengths, max(1, int(lengths.max())))
+        columns.add(label, rows[block[group]], values)
+
+    stats["valid"] += int(np.count_nonzero(valid))
+    columns.rows = int(rows[-1]) + 1
+    # Records after the last block are left for the next window
+    return len(data) if offsets is None else int(offsets[len(data) - 1]) + 1
+
+
+def scan_raw(path, stats):
+    """Read a raw serial log window by window."""
+    columns = RawColumns()
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        data = np.frombuffer(mapped, dtype=np.uint8)
+        offset = 0
+        while offset < len(data):
+            consumed = _scan_window(data[offset:offset + WINDOW], columns, stats)
+            if not consumed:
+                if offset + WINDOW >= len(data):
+                    break
+                # No complete block in a whole window; skip it
+                consumed = WINDOW
+            offset += consumed
+        stats["bytes"] = len(data)
+        del data
+    return columns
+
+
+def scan_capture(path, stats):
+    """Read a frame capture; its frames were validated when they were captured."""
+    wall, monotonic = capture.read_capture_start(path)
+    columns = RawColumns()
+    pieces = {}
+    times = []
+    for row, (when, frame) in enumerate(capture.read_capture(path)):
+        times.append(wall + when - monotonic)
+        for label, value in frame.items():
+            rows, values = pieces.setdefault(label, ([], []))
+            rows.append(row)
+            values.append(value)
+    for label, (rows, values) in pieces.items():
+        columns.add(label, np.array(rows, dtype=np.int64), np.array(values))
+    columns.rows = stats["blocks"] = stats["valid"] = len(times)
+    columns.times = np.array(times)
+    stats["bytes"] = os.path.getsize(path)
+    return columns
+
+
+def decode_column(field, rows, raw_values, row_count):
+    """Decode one field column, once per distinct raw value; None/NaN where missing or invalid."""
+    distinct, inverse = unique_bytes(raw_values)
+    decoded = []
+    for value in distinct:
+        try:
+            decoded.append(field.decode(bytes(value)))
+        except ValueError:
+            decoded.append(None)
+
+    if all(value is None or isinstance(value, (int, float)) for value in decoded):
+        lookup = np.array([np.nan if value is None else value for value in decoded], dtype=np.float64)
+        column = np.full(row_count, np.nan)
+    else:
+        lookup = np.array(decoded, dtype=object)
+        column = np.full(row_count, None, dtype=object)
+    column[rows] = lookup[inverse.ravel()]
+    return column
+
+
+def decode_columns(columns, registry, pid=None):
+    """Decode every defined field of the product with ``pid``, or of the PID in the data."""
+    if pid is None:
+        _, pids = columns.column(vedirect.LABEL_PID)
+        pid = bytes(pids[0]) if pids is not None and len(pids) else b""
+    field_table = registry.table_for(pid)
+
+    table = {}
+    if columns.times is not None:
+        table["time"] = columns.times
+    for raw_label, field in field_table.items():
+        rows, raw_values = columns.column(raw_label)
+        if rows is not None:
+            table[field.label] = decode_column(field, rows, raw_values, columns.rows)
+    return table
+
+
+def _csv_value(value):
+    if value is None or value != value:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def write_csv(path, table):
+    names = list(table)
+    with open(path, "w", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(names)
+        for row in zip(*(table[name].tolist() for name in names)):
+            writer.writerow([_csv_value(value) for value in row])
+
+
+def write_npz(path, table):
+    np.savez_compressed(path, **table)
+
+
+def write_parquet(path, table):
+    columns = {name: pyarrow.array(column, from_pandas=True) for name, column in table.items()}
+    pyarrow.parquet.write_table(pyarrow.table(columns), path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="raw serial log or .vecap frame capture")
+    parser.add_argument("--csv", help="write the columns to a CSV file")
+    parser.add_argument("--npz", help="write the columns to a NumPy .npz file")
+    parser.add_argument("--parquet", help="write the columns to a Parquet file (needs pyarrow)")
+    parser.add_argument("--pid", help="product ID whose field definitions to use, e.g. 0xA389")
+    parser.add_argument("--definitions", default=os.path.join(PACKAGE_DIR, "Victronusb.json"))
+    args = parser.parse_args()
+
+    if np is None:
+        sys.exit("vedirect_decode.py needs NumPy: pip install numpy")
+    if args.parquet and pyarrow is None:
+        sys.exit("Parquet output needs pyarrow: pip install pyarrow")
+
+    registry = definitions.read_registry(args.definitions)
+    stats = {"bytes": 0, "blocks": 0, "valid": 0}
+
+    started = time.perf_counter()
+    with open(args.input, "rb") as file:
+        is_capture = file.read(len(capture.MAGIC)) == capture.MAGIC
+    columns = scan_capture(args.input, stats) if is_capture else scan_raw(args.input, stats)
+    table = decode_columns(columns, registry, args.pid.encode() if args.pid else None)
+    elapsed = time.perf_counter() - started
+
+    if args.csv:
+        write_csv(args.csv, table)
+    if args.npz:
+        write_npz(args.npz, table)
+    if args.parquet:
+        write_parquet(args.parquet, table)
+
+    print(
+        f"{stats['bytes'] / 1e6:.1f} MB, {stats['blocks']} blocks, {stats['valid']} valid, "
+        f"{len(table)} columns in {elapsed:.2f} s ({stats['bytes'] / 1e6 / elapsed if elapsed else 0:.0f} MB/s)",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""Fake VE.Direct device on a Linux pty.
+
+Emulates a BMV-style battery monitor (or replays a raw capture) on a
+pseudo terminal, so the integration, the benchmark and manual tests can
+open it like a real /dev/ttyUSBx:
+
+    python tools/vedirect_sim.py --rate 1 --corrupt 0.01
+    python tools/vedirect_sim.py --replay capture.bin --rate 10
+    python tools/vedirect_sim.py --tcp 2000
+
+With ``--tcp`` the pty is also served on a TCP port, like ser2net does
+for a remote serial port, for testing ``tcp://`` and ``socket://`` URLs.
+
+Output is paced at the configured baud rate, blocks can be corrupted on
+purpose and HEX get/set requests are answered from a small register map.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import random
+import sys
+import time
+import tty
+import types
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "custom_components", "victronusb")
+
+
+def load_integration_module(name):
+    """Import ``victronusb.<name>`` without running the package __init__.
+
+    The framing, definition and HEX modules do not need Home Assistant, so
+    the tools can use them on any machine.
+    """
+    if "victronusb" not in sys.modules:
+        package = types.ModuleType("victronusb")
+        package.__path__ = [PACKAGE_DIR]
+        sys.modules["victronusb"] = package
+    return importlib.import_module(f"victronusb.{name}")
+
+
+vedirect = load_integration_module("vedirect")
+hexproto = load_integration_module("hexproto")
+capture = load_integration_module("capture")
+
+HISTORY_FIELDS = [
+    (b"H1", b"-50102"), (b"H2", b"-2040"), (b"H3", b"-2040"), (b"H4", b"11"),
+    (b"H5", b"0"), (b"H6", b"-1083010"), (b"H7", b"11866"), (b"H8", b"14510"),
+    (b"H9", b"165046"), (b"H10", b"26"), (b"H11", b"0"), (b"H12", b"0"),
+    (b"H15", b"0"), (b"H16", b"0"), (b"H17", b"2161"), (b"H18", b"2640"),
+]
+
+DEFAULT_REGISTERS = {
+    0x1000: (200).to_bytes(2, "little"),  # battery capacity, Ah
+}
+
+
+def encode_block(fields):
+    """Encode ``[(label, value), ...]`` as one text block with a valid checksum."""
+    payload = b"".join(b"\r\n" + label + b"\t" + value for label, value in fields) + b"\r\nChecksum\t"
+    return payload + bytes([vedirect.block_checksum(payload)])
+
+
+class BatteryMonitorModel:
+    """Generates a plausible BMV text stream, main and history blocks alternating."""
+
+    def __init__(self, pid=b"0x203", serial=None, sequence=False, seed=None):
+        self._pid = pid
+        self._serial = serial
+        self._sequence = sequence
+        self._random = random.Random(seed)
+        self._count = 0
+        self._voltage = 12800
+        self._current = -1500
+
+    def next_block(self):
+        """Return ``(sequence number, block bytes)``."""
+        self._count += 1
+        seq = self._count
+        if seq % 2 == 0:
+            fields = list(HISTORY_FIELDS)
+        else:
+            self._voltage += self._random.randint(-5, 5)
+            self._current += self._random.randint(-50, 50)
+            fields = [(b"PID", self._pid)]
+            if self._serial:
+                fields.append((b"SER#", self._serial))
+            fields += [
+                (b"V", b"%d" % self._voltage),
+                (b"I", b"%d" % self._current),
+                (b"P", b"%d" % (self._voltage * self._current // 1000000)),
+                (b"CE", b"-2040"),
+                (b"SOC", b"987"),
+                (b"TTG", b"-1"),
+                (b"Alarm", b"OFF"),
+                (b"Relay", b"OFF"),
+                (b"AR", b"0"),
+                (b"BMV", b"712 Smart"),
+                (b"FW", b"0413"),
+            ]
+        if self._sequence:
+            fields.append((b"SEQ", b"%d" % seq))
+        return seq, encode_block(fields)
+
+
+class ReplaySource:
+    """Replays a capture, one text block per step, looping at the end.
+
+    Takes either raw serial bytes or a frame capture written by the
+    integration's start_capture service.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            data = file.read()
+        if data.startswith(capture.MAGIC):
+            self._blocks = [encode_block(frame.items()) for _, frame in capture.read_capture(path)]
+            self._index = 0
+            return
+
+        marker = b"Checksum\t"
+        self._blocks = []
+        start = 0
+        while True:
+            pos = data.find(marker, start)
+            if pos < 0 or pos + len(marker) >= len(data):
+                break
+            end = pos + len(marker) + 1
+            self._blocks.append(data[start:end])
+            start = end
+        if not self._blocks:
+            raise ValueError(f"No text blocks found in {path}")
+        self._index = 0
+
+    def next_block(self):
+        block = self._blocks[self._index % len(self._blocks)]
+        self._index += 1
+        return self._index, block
+
+
+def corrupt(block, rng):
+    """Flip one bit or drop one byte of a block."""
+    data = bytearray(block)
+    pos = rng.randrange(len(data))
+    if rng.random() < 0.5:
+        data[pos] ^= 1 << rng.randrange(8)
+    else:
+        del data[pos]
+    return bytes(data)
+
+
+class FakeVEDirectDevice:
+    """Serve a block source on a pty at a given baud rate and frame rate.
+
+    ``sent`` maps sequence numbers to the monotonic time the last byte of
+    that block was written, for latency measurements.
+    """
+
+    def __init__(self, source, baudrate=19200, rate=1.0, corrupt_rate=0.0, chunk=16, registers=None, seed=None):
+        self.source = source
+        self.baudrate = baudrate
+        self.rate = rate
+        self.corrupt_rate = corrupt_rate
+        self.chunk = chunk
+        self.registers = dict(DEFAULT_REGISTERS if registers is None else registers)
+        self.sent = {}
+        self.blocks_sent = 0
+        self.blocks_corrupted = 0
+        self._rng = random.Random(seed)
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.port = os.ttyname(self._slave)
+        self._requests = bytearray()
+        self._task = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        loop.add_reader(self._master, self._read_requests)
+        self._task = loop.create_task(self._run())
+
+    async def stop(self):
+        asyncio.get_running_loop().remove_reader(self._master)
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        os.close(self._master)
+        os.close(self._slave)
+
+    def _write(self, data):
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self._master, view)
+            except BlockingIOError:
+                # Nobody reading; drop like a real UART would
+                return
+            view = view[written:]
+
+    async def _run(self):
+        byte_time = 10 / self.baudrate  # start + 8 data + stop bit
+        interval = 1 / self.rate if self.rate else 0
+        loop = asyncio.get_running_loop()
+        next_block = loop.time()
+
+        while True:
+            seq, block = self.source.next_block()
+            if self.corrupt_rate and self._rng.random() < self.corrupt_rate:
+                block = corrupt(block, self._rng)
+                self.blocks_corrupted += 1
+
+            for start in range(0, len(block), self.chunk):
+                piece = block[start:start + self.chunk]
+                self._write(piece)
+                if start + self.chunk >= len(block):
+                    self.sent[seq] = time.monotonic()
+                await asyncio.sleep(len(piece) * byte_time)
+            self.blocks_sent += 1
+
+            next_block += interval
+            await asyncio.sleep(max(0, next_block - loop.time()))
+
+    def _read_requests(self):
+        try:
+            self._requests += os.read(self._master, 4096)
+        except BlockingIOError:
+            return
+        while True:
+            end = self._requests.find(b"\n")
+            if end < 0:
+                break
+            record = bytes(self._requests[:end + 1])
+            del self._requests[:end + 1]
+            start = record.find(b":")
+            if start >= 0:
+                self._answer(record[start:])
+
+    def _answer(self, record):
+        try:
+            command, payload = hexproto.decode_record(record)
+        except ValueError:
+            self._write(hexproto.encode_record(hexproto.RSP_ERROR, b"\xaa\xaa"))
+            return
+
+        if command == hexproto.CMD_PING:
+            self._write(hexproto.encode_record(hexproto.RSP_PING, b"\x13\x41"))
+        elif command in (hexproto.CMD_GET, hexproto.CMD_SET) and len(payload) >= 3:
+            register = int.from_bytes(payload[:2], "little")
+            if command == hexproto.CMD_SET and register in self.registers:
+                self.registers[register] = payload[3:]
+            value = self.registers.get(register)
+            if value is None:
+                reply = payload[:2] + bytes([hexproto.FLAG_UNKNOWN_ID])
+            else:
+                reply = payload[:2] + b"\x00" + value
+            self._write(hexproto.encode_record(command, reply))
+        else:
+            self._write(hexproto.encode_record(hexproto.RSP_UNKNOWN, bytes([command])))
+
+
+async def serve_tcp(device, host, port):
+    """Relay the device's pty to TCP clients, raw, like ser2net."""
+    loop = asyncio.get_running_loop()
+
+    async def relay(reader, writer):
+        fd = os.open(device.port, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        loop.add_reader(fd, lambda: writer.write(os.read(fd, 4096)))
+        try:
+            while data := await reader.read(4096):
+                os.write(fd, data)
+        except ConnectionError:
+            pass
+        finally:
+            loop.remove_reader(fd)
+            os.close(fd)
+            writer.close()
+
+    return await asyncio.start_server(relay, host, port)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baud", type=int, default=19200)
+    parser.add_argument("--rate", type=float, default=1.0, help="blocks per second, 0 for back to back")
+    parser.add_argument("--corrupt", type=float, default=0.0, help="share of blocks to corrupt")
+    parser.add_argument("--pid", default="0x203")
+    parser.add_argument("--serial", help="SER# to report")
+    parser.add_argument("--replay", help="raw capture file to replay instead of the model")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--tcp", type=int, metavar="PORT", help="also serve the device on this TCP port")
+    parser.add_argument("--host", default="127.0.0.1", help="address for --tcp")
+    args = parser.parse_args()
+
+    if args.replay:
+        source = ReplaySource(args.replay)
+    else:
+        source = BatteryMonitorModel(args.pid.encode(), args.serial.encode() if args.serial else None, seed=args.seed)
+
+    async def run():
+        device = FakeVEDirectDevice(source, args.baud, args.rate, args.corrupt, seed=args.seed)
+        print(device.port, flush=True)
+        async with device:
+            if args.tcp:
+                server = await serve_tcp(device, args.host, args.tcp)
+                print(f"tcp://{args.host}:{args.tcp}", flush=True)
+                async with server:
+                    await server.serve_forever()
+            else:
+                await asyncio.Event().wait()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()